@@ -0,0 +1,202 @@
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from core.storage.base import PRIMARY_KEYS, RESULT_COLUMNS, OWNER_COLUMNS
+
+# --- In-Memory Database Stand-in ---
+# Implements the small part of the Supabase client the workers use (table
+# select/upsert/update with eq/in_ filters, limit and exact counts, and the claim_owners,
+# apply_owner_updates, attach_owner_radar_ids and upsert_owners functions from migrations/)
+# on plain dicts, so the benchmarks measure the workers rather than a remote
+# database. It also timestamps claims and writes to derive per-record latency.
+
+
+def _lease_epoch(value):
+    # Claims store epoch seconds; leases extended through the table API arrive as ISO timestamps, as in Postgres
+    return datetime.fromisoformat(value).timestamp() if isinstance(value, str) else value
+
+
+class Response:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class _Query:
+    def __init__(self, database, table):
+        self._database = database
+        self._table = table
+        self._operation = None
+        self._payload = None
+        self._columns = None
+        self._filters = []
+        self._limit = None
+        self._count = None
+
+    def select(self, columns="*", count=None):
+        self._operation = "select"
+        self._columns = None if columns == "*" else [column.strip() for column in columns.split(",")]
+        self._count = count
+        return self
+
+    def upsert(self, records, on_conflict=None):
+        self._operation = "upsert"
+        self._payload = records if isinstance(records, list) else [records]
+        return self
+
+    def update(self, data):
+        self._operation = "update"
+        self._payload = data
+        return self
+
+    def eq(self, column, value):
+        self._filters.append((column, {value}))
+        return self
+
+    def in_(self, column, values):
+        self._filters.append((column, set(values)))
+        return self
+
+    def limit(self, size):
+        self._limit = size
+        return self
+
+    def execute(self):
+        rows = self._database._execute(self._table, self._operation, self._payload, self._columns, self._filters)
+        count = len(rows) if self._count else None
+        return Response(rows if self._limit is None else rows[:self._limit], count)
+
+
+class _Rpc:
+    def __init__(self, database, name, params):
+        self._database = database
+        self._name = name
+        self._params = params
+
+    def execute(self):
+        return Response(getattr(self._database, f"_rpc_{self._name}")(**self._params))
+
+
+class LocalDatabase:
+    """A thread-safe, in-memory stand-in for the Supabase client behind `SupabaseStorage`."""
+
+    def __init__(self):
+        self.tables = {name: {} for name in PRIMARY_KEYS}
+        self.claimed_at = {} # person_key -> first claim time
+        self.written_at = {} # (table, key) -> last write time
+        self.status_changed_at = {} # person_key -> time processing_status last changed
+        self._by_status = defaultdict(dict) # processing_status -> {person_key: None}, in insertion order
+        self._lock = threading.Lock()
+
+    def table(self, name):
+        return _Query(self, name)
+
+    def rpc(self, name, params):
+        return _Rpc(self, name, params)
+
+    def seed(self, table, records):
+        """Inserts rows directly, without recording them as writes."""
+        with self._lock:
+            for record in records:
+                self._store(table, dict(record), record_write=False)
+
+    # --- Internals (caller holds the lock) ---
+
+    def _store(self, table, row, record_write=True):
+        key = row[PRIMARY_KEYS[table]]
+        existing = self.tables[table].get(key)
+        if table == "owners":
+            old_status = existing.get("processing_status") if existing else None
+            new_status = row.get("processing_status", old_status)
+            if old_status != new_status:
+                self._by_status[old_status].pop(key, None)
+                self._by_status[new_status][key] = None
+                if record_write and existing is not None:
+                    self.status_changed_at[key] = time.monotonic()
+        if existing is None:
+            self.tables[table][key] = row
+        else:
+            existing.update(row)
+        if record_write:
+            self.written_at[(table, key)] = time.monotonic()
+
+    def _matches(self, row, filters):
+        return all(row.get(column) in values for column, values in filters)
+
+    def _execute(self, table, operation, payload, columns, filters):
+        with self._lock:
+            if operation == "upsert":
+                for record in payload:
+                    self._store(table, dict(record))
+                return payload
+
+            key_column = PRIMARY_KEYS[table]
+            key_filter = next((values for column, values in filters if column == key_column), None)
+            if key_filter is not None:
+                candidates = [self.tables[table][key] for key in key_filter if key in self.tables[table]]
+            else:
+                candidates = list(self.tables[table].values())
+            rows = [row for row in candidates if self._matches(row, filters)]
+
+            if operation == "update":
+                for row in rows:
+                    self._store(table, {**row, **payload})
+                return [dict(row) for row in rows]
+            if columns is None:
+                return [dict(row) for row in rows]
+            return [{column: row.get(column) for column in columns} for row in rows]
+
+    # --- Database functions (see migrations/) ---
+
+    def _rpc_claim_owners(self, p_statuses, p_worker_id, p_limit, p_lease_seconds):
+        now = time.time()
+        claimed = []
+        with self._lock:
+            for status in p_statuses:
+                for key in self._by_status[status]:
+                    if len(claimed) >= p_limit:
+                        break
+                    row = self.tables["owners"][key]
+                    if row.get("lease_expires_at") is None or _lease_epoch(row["lease_expires_at"]) < now:
+                        row["claimed_by"] = p_worker_id
+                        row["lease_expires_at"] = now + p_lease_seconds
+                        self.claimed_at.setdefault(key, time.monotonic())
+                        claimed.append(dict(row))
+        return claimed
+
+    def _rpc_apply_owner_updates(self, p_worker_id, p_updates):
+        applied = []
+        with self._lock:
+            for item in p_updates:
+                row = self.tables["owners"].get(item["person_key"])
+                if row is None:
+                    continue
+                if p_worker_id is not None and row.get("claimed_by") != p_worker_id:
+                    continue
+                if p_worker_id is None and row.get("processing_status") != item.get("expected_status"):
+                    continue
+                update = {column: item[column] for column in RESULT_COLUMNS if column in item}
+                self._store("owners", {**row, **update, "claimed_by": None, "lease_expires_at": None})
+                applied.append(item["person_key"])
+        return applied
+
+    def _rpc_upsert_owners(self, p_records, p_statuses):
+        written = []
+        with self._lock:
+            for record in p_records:
+                row = self.tables["owners"].get(record["person_key"])
+                if row is not None and row.get("processing_status") not in p_statuses:
+                    continue
+                self._store("owners", {column: record.get(column) for column in OWNER_COLUMNS})
+                written.append(record["person_key"])
+        return written
+
+    def _rpc_attach_owner_radar_ids(self, p_links):
+        with self._lock:
+            for link in p_links:
+                row = self.tables["owners"].get(link["person_key"])
+                if row is not None:
+                    row["radar_ids"] = sorted(set(row.get("radar_ids") or []) | set(link["radar_ids"]))
+        return None
@@ -0,0 +1,158 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+# Allow running as `python benchmarks/mail_address_benchmark.py` from the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.address_parser import parse_mail_address, parse_mail_addresses, clear_address_cache
+
+# --- Mail Address Parser Benchmark ---
+# Checks that the batch parser (`parse_mail_addresses`) gives exactly the same
+# output as the reference parser (`parse_mail_address`) on the sample persons,
+# a set of hand-written edge cases and random fuzz strings, then times both on a
+# synthetic workload where addresses repeat the way they do in real lists.
+
+SAMPLE_PERSONS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                   "sample_responses", "all_persons_for_list_1087906.json")
+
+EDGE_CASE_ADDRESSES = [
+    "2 EDMUND H NICHOLS RD, NORTH ATTLEBORO, MA 02760",
+    "8 COTLEY ST, BERKLEY MA 02779",
+    "8 COTLEY ST,BERKLEY,MA 02779",
+    "8 COTLEY ST, BERKLEY,, MA 02779",
+    "8 COTLEY ST, BERKLEY , MA 02779",
+    "8 COTLEY ST, BERKLEY ,MA 02779",
+    "8 COTLEY ST,  BERKLEY,  MA   02779  ",
+    "  8 COTLEY ST  , BERKLEY, MA 02779",
+    "8 COTLEY ST, BERKLEY, MA 02779-1234",
+    "8 COTLEY ST, BERKLEY, MA 0277O",
+    "8 COTLEY ST, BERKLEY, ma 02779",
+    "8 COTLEY ST, BERKLEY, M A 02779",
+    "8 COTLEY ST, BERKLEY, MA",
+    "8 COTLEY ST, BERKLEY",
+    "8 COTLEY ST, MA 02779",
+    "8 COTLEY ST, , MA 02779",
+    "8 COTLEY ST, 02779",
+    "8 COTLEY ST,",
+    "8 COTLEY ST, ",
+    "8 COTLEY ST",
+    ",BERKLEY MA 02779",
+    ", , ,",
+    ",",
+    " ",
+    "PO BOX 12, BERKLEY, MA 02779",
+    "UNIT 4, 8 COTLEY ST, BERKLEY, MA 02779",
+    "8 COTLEY ST, BERKLEY,\tMA 02779",
+    "8 COTLEY ST, BERKLEY\t, MA 02779",
+    "8 COTLEY ST, BERKLEY, MA\t02779",
+    "8 COTLEY ST, BERKLEY\n, MA 02779",
+    "8 COTLEY ST, BERKLEY, MA 02779\n",
+    "8 COTLEY ST, BERKLEY, MA 02779",
+    "8 COTLEY ST, BERKLEY, MA 0277²",
+    "8 COTLEY ST, BERKLEY, MÁ 02779",
+    "8 COTLEY ST, SAN JOSÉ, CA 95112",
+    "8 COTLEY ST, BERKLEY, MA 02779,",
+    "8 COTLEY ST, BERKLEY, , MA 02779",
+]
+
+EDGE_CASE_MAIL_ADDRESSES = [
+    None,
+    [],
+    "8 COTLEY ST, BERKLEY, MA 02779",
+    {"Address": "8 COTLEY ST, BERKLEY, MA 02779"},
+    [None],
+    ["8 COTLEY ST, BERKLEY, MA 02779"],
+    [{}],
+    [{"RadarID": "P9AA93A0"}],
+    [{"Address": None}],
+    [{"Address": ""}],
+    [{"Address": "8 COTLEY ST, BERKLEY, MA 02779"}, {"Address": "1 MAIN ST, BOSTON, MA 02101"}],
+] + [[{"Address": address}] for address in EDGE_CASE_ADDRESSES]
+
+FUZZ_ALPHABET = "AB 1,\t ²-."
+
+CITIES = ["NORTH ATTLEBORO", "BERKLEY", "BOSTON", "TAUNTON", "FALL RIVER", "NEW BEDFORD", "PROVIDENCE"]
+STREETS = ["EDMUND H NICHOLS RD", "COTLEY ST", "MAIN ST", "ELM AVE", "PLEASANT ST", "COUNTY RD"]
+STATES = ["MA", "RI", "NH", "CT"]
+
+
+def load_sample_mail_addresses():
+    with open(SAMPLE_PERSONS_PATH) as f:
+        persons = json.load(f)
+    return [person.get("MailAddress") for person in persons]
+
+
+def fuzz_mail_addresses(count, rng):
+    return [[{"Address": "".join(rng.choice(FUZZ_ALPHABET) for _ in range(rng.randint(0, 16)))}]
+            for _ in range(count)]
+
+
+def check_correctness(mail_address_lists):
+    """Returns the inputs where the batch parser disagrees with the reference parser."""
+    clear_address_cache()
+    expected = [parse_mail_address(value) for value in mail_address_lists]
+    # Run the batch twice so both the parsing and the cached path are compared
+    mismatches = []
+    for _ in range(2):
+        for value, want, got in zip(mail_address_lists, expected, parse_mail_addresses(mail_address_lists)):
+            if want != got:
+                mismatches.append((value, want, got))
+    return mismatches
+
+
+def build_workload(records, distinct, rng):
+    """Builds `records` MailAddress values drawn from `distinct` synthetic addresses."""
+    pool = []
+    for _ in range(distinct):
+        separator = ", " if rng.random() < 0.8 else " "
+        pool.append(f"{rng.randint(1, 9999)} {rng.choice(STREETS)}, {rng.choice(CITIES)}"
+                    f"{separator}{rng.choice(STATES)} {rng.randint(1000, 99999):05d}")
+    return [[{"Address": rng.choice(pool)}] for _ in range(records)]
+
+
+def time_it(func, *args):
+    started_at = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - started_at
+
+
+def run_benchmark(records, distinct, fuzz, seed):
+    rng = random.Random(seed)
+
+    sample_inputs = load_sample_mail_addresses()
+    correctness_inputs = sample_inputs + EDGE_CASE_MAIL_ADDRESSES + fuzz_mail_addresses(fuzz, rng)
+    mismatches = check_correctness(correctness_inputs)
+    print(f"Correctness: {len(correctness_inputs)} inputs ({len(sample_inputs)} samples, "
+          f"{len(EDGE_CASE_MAIL_ADDRESSES)} edge cases, {fuzz} fuzz), {len(mismatches)} mismatches")
+    for value, want, got in mismatches[:10]:
+        print(f"  -! {value!r}: expected {want}, got {got}")
+    if mismatches:
+        return 1
+
+    workload = build_workload(records, distinct, rng)
+    reference_seconds = time_it(lambda values: [parse_mail_address(value) for value in values], workload)
+    clear_address_cache()
+    cold_seconds = time_it(parse_mail_addresses, workload)
+    warm_seconds = time_it(parse_mail_addresses, workload)
+
+    print(f"Workload: {records} records, {distinct} distinct addresses")
+    print(f"  parse_mail_address (reference): {records / reference_seconds:,.0f} records/sec")
+    print(f"  parse_mail_addresses (cold):    {records / cold_seconds:,.0f} records/sec "
+          f"({reference_seconds / cold_seconds:.1f}x)")
+    print(f"  parse_mail_addresses (warm):    {records / warm_seconds:,.0f} records/sec "
+          f"({reference_seconds / warm_seconds:.1f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Correctness and speed check for the mail address parsers.")
+    parser.add_argument("--records", type=int, default=200000, help="Records in the timed workload.")
+    parser.add_argument("--distinct", type=int, default=20000, help="Distinct addresses in the timed workload.")
+    parser.add_argument("--fuzz", type=int, default=20000, help="Random strings added to the correctness check.")
+    parser.add_argument("--seed", type=int, default=1087906, help="Random seed for the fuzz strings and workload.")
+    args = parser.parse_args()
+    sys.exit(run_benchmark(args.records, args.distinct, args.fuzz, args.seed))
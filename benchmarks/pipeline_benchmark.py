@@ -0,0 +1,317 @@
+import argparse
+import contextlib
+import json
+import math
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+# Allow running as `python benchmarks/pipeline_benchmark.py` from the repo root
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# --- Per-Stage Throughput Benchmark ---
+# Drives the real ingest, enrichment and verification workers against the
+# local vendor simulator (simulator/vendor_simulator.py) and an in-memory
+# database stand-in (benchmarks/local_database.py) at several dataset sizes.
+#
+# Every (stage, mode, size) case runs in its own subprocess so its peak RSS is
+# its own. A case reports throughput, per-record latency percentiles and peak
+# RSS. Per-record latency runs from the moment a record reaches the stage
+# (its property details are requested, or its owner is claimed) until its
+# result is written to the database. Results are written as JSON. With
+# --baseline, each case is compared with an earlier results file and any
+# throughput drop beyond --regression-threshold fails the run.
+#
+# Unless --profile is given, the simulator runs without rate quotas or injected
+# failures, so the numbers reflect the workers and vendor latency alone.
+
+STAGE_MODES = {
+    "ingest": ["stream"],
+    "enrich": ["serial", "async", "bulk"],
+    "verify": ["serial", "bulk"],
+}
+DEFAULT_SIZES = [1000, 10000, 100000]
+DEFAULT_RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+
+# Simulator settings used unless --profile overrides them
+BENCHMARK_PROFILE_OVERRIDES = {"rate_per_sec": None, "error_rate": 0.0, "throttle_rate": 0.0, "bulk_job_seconds": 2}
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers. Returns None for an empty list."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _configure_environment(work_dir, simulator_url):
+    # Must run before anything imports config.py
+    os.environ.update({
+        "VENDOR_SIMULATOR_URL": simulator_url,
+        "SUPABASE_URL": "", # Never open a real database connection from a benchmark
+        "PROPERTY_RADAR_LIST_ID": "benchmark",
+        "PDL_CACHE_ENABLED": "false",
+        "VERIFICATION_CACHE_ENABLED": "false",
+        "WAKEUP_ENABLED": "false",
+        "RESULT_JOURNAL_DIR": os.path.join(work_dir, "journal"),
+        "INGEST_CURSOR_PATH": os.path.join(work_dir, "ingest_cursor.json"),
+        "RATE_LIMIT_DIR": os.path.join(work_dir, "ratelimit"),
+    })
+    # The simulator enforces vendor quotas itself; keep the client-side limiter out of the way
+    for vendor in ("PROPERTY_RADAR", "PDL", "MILLIONVERIFIER", "NEVERBOUNCE"):
+        os.environ.setdefault(f"{vendor}_RATE_PER_SEC", "1000")
+        os.environ.setdefault(f"{vendor}_BURST", "1000")
+    os.environ.setdefault("VERIFICATION_BULK_POLL_INTERVAL", "0.5")
+    # Per-record log lines would otherwise dominate what is being measured
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+
+def _use_database(database):
+    """Points every module that holds the storage backend at `database`, through the Supabase backend."""
+    from core import database as core_database, work_queue
+    from core.storage.base import InstrumentedStorage
+    from core.storage.supabase_backend import SupabaseStorage
+    from workers import ingest_worker
+    storage = InstrumentedStorage(SupabaseStorage(database))
+    core_database.storage = storage
+    work_queue.storage = storage
+    ingest_worker.storage = storage
+
+
+def _seed_owners(database, stage, size):
+    owners = []
+    for index in range(size):
+        owner = {
+            "person_key": f"b{index}",
+            "radar_id": f"B{index:07X}",
+            "radar_ids": [f"B{index:07X}"],
+            "first_name": f"FIRST{index % 997}",
+            "last_name": f"LAST{index}",
+            "mail_street_address": f"{1 + index % 999} MAIN ST",
+            "mail_city": "TAUNTON",
+            "mail_state": "MA",
+            "mail_zip_code": "02780",
+            "claimed_by": None,
+            "lease_expires_at": None,
+        }
+        if stage == "enrich":
+            owner["processing_status"] = "pending_enrichment"
+        elif index % 2 == 0:
+            owner["processing_status"] = "pending_verification"
+            owner["original_email"] = f"owner{index}@example.com"
+        else:
+            owner["processing_status"] = "pending_post_enrichment_verification"
+            owner["enriched_emails"] = [f"person{index}.{n}@example.com" for n in range(1 + index % 3)]
+        owners.append(owner)
+    database.seed("owners", owners)
+
+
+def run_case(stage, mode, size, profile_path=None, latency_scale=1.0):
+    """Runs one benchmark case in this process and returns its result dict."""
+    work_dir = tempfile.mkdtemp(prefix="pipeline-benchmark-")
+    port = _free_port()
+    _configure_environment(work_dir, f"http://127.0.0.1:{port}")
+
+    from simulator import vendor_simulator
+    from benchmarks.local_database import LocalDatabase
+
+    profiles = vendor_simulator.load_profiles(profile_path)
+    for profile in profiles.values():
+        if not profile_path:
+            profile.update(BENCHMARK_PROFILE_OVERRIDES)
+        profile["latency_ms"] = profile.get("latency_ms", 0) * latency_scale
+    server = vendor_simulator.serve("127.0.0.1", port, profiles, list_size=size)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    database = LocalDatabase()
+    _use_database(database)
+
+    from core.api_clients import property_radar_client
+    from workers.ingest_worker import run_ingestion_worker
+    from workers.enrichment_worker import run_enrichment_worker
+    from workers.verification_worker import run_verification_worker
+
+    started_at_by_key = {}
+    if stage == "ingest":
+        # A property's clock starts when its details are requested
+        get_property_details = property_radar_client.get_property_details
+
+        def timed_get_property_details(radar_id):
+            started_at_by_key.setdefault(radar_id, time.monotonic())
+            return get_property_details(radar_id)
+
+        property_radar_client.get_property_details = timed_get_property_details
+    else:
+        _seed_owners(database, stage, size)
+
+    started_at = time.monotonic()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        if stage == "ingest":
+            run_ingestion_worker(stream_all=True)
+        elif stage == "enrich":
+            run_enrichment_worker(mode=mode, exit_when_idle=True)
+        else:
+            run_verification_worker(mode=mode, exit_when_idle=True)
+    elapsed = time.monotonic() - started_at
+    server.shutdown()
+
+    if stage == "ingest":
+        finished_at_by_key = {key: at for (table, key), at in database.written_at.items() if table == "properties"}
+        owners = len(database.tables["owners"])
+    else:
+        started_at_by_key = database.claimed_at
+        finished_at_by_key = database.status_changed_at
+        owners = size
+    latencies = [finished_at_by_key[key] - started_at_by_key[key]
+                 for key in finished_at_by_key if key in started_at_by_key]
+
+    def ms(value):
+        return round(value * 1000, 2) if value is not None else None
+
+    return {
+        "stage": stage,
+        "mode": mode,
+        "size": size,
+        "records": len(latencies),
+        "owners": owners,
+        "elapsed_s": round(elapsed, 3),
+        "records_per_sec": round(len(latencies) / elapsed, 2) if elapsed > 0 else None,
+        "records_per_min": round(len(latencies) / elapsed * 60, 1) if elapsed > 0 else None,
+        "latency_p50_ms": ms(percentile(latencies, 0.50)),
+        "latency_p95_ms": ms(percentile(latencies, 0.95)),
+        "latency_p99_ms": ms(percentile(latencies, 0.99)),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "vendor_calls": server.RequestHandlerClass.simulator.stats(),
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _run_case_subprocess(stage, mode, size, args):
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        result_path = f.name
+    command = [sys.executable, os.path.abspath(__file__), "--run-case", stage, mode, str(size),
+               "--result-path", result_path, "--latency-scale", str(args.latency_scale)]
+    if args.profile:
+        command += ["--profile", args.profile]
+    try:
+        subprocess.run(command, check=True, timeout=args.timeout, cwd=REPO_ROOT)
+        with open(result_path) as f:
+            return json.load(f)
+    except subprocess.TimeoutExpired:
+        return {"stage": stage, "mode": mode, "size": size, "error": f"timed out after {args.timeout}s"}
+    except (subprocess.CalledProcessError, ValueError) as e:
+        return {"stage": stage, "mode": mode, "size": size, "error": str(e)}
+    finally:
+        os.remove(result_path)
+
+
+def compare_with_baseline(results, baseline_path, threshold):
+    """Prints throughput changes against a baseline file. Returns the cases that regressed."""
+    with open(baseline_path) as f:
+        baseline = {(r["stage"], r["mode"], r["size"]): r for r in json.load(f)["results"]}
+    regressions = []
+    print(f"\nCompared with {baseline_path}:")
+    for result in results:
+        key = (result["stage"], result["mode"], result["size"])
+        before = baseline.get(key, {}).get("records_per_sec")
+        after = result.get("records_per_sec")
+        if not before or after is None:
+            continue
+        change = (after - before) / before
+        flag = ""
+        if change < -threshold:
+            flag = "  <-- REGRESSION"
+            regressions.append(key)
+        print(f"  {key[0]:<7} {key[1]:<7} {key[2]:>7}: {before:>9.1f} -> {after:>9.1f} rec/s ({change:+.1%}){flag}")
+    return regressions
+
+
+def run_suite(args):
+    cases = [(stage, mode, size) for stage in args.stages for mode in STAGE_MODES[stage]
+             if not args.modes or mode in args.modes for size in args.sizes]
+    results = []
+    print(f"{'stage':<7} {'mode':<7} {'size':>7} {'rec/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'RSS MB':>8}")
+    for stage, mode, size in cases:
+        result = _run_case_subprocess(stage, mode, size, args)
+        results.append(result)
+        if "error" in result:
+            print(f"{stage:<7} {mode:<7} {size:>7}  -! {result['error']}")
+            continue
+        print(f"{stage:<7} {mode:<7} {size:>7} {result['records_per_sec']:>9.1f} {result['latency_p50_ms']:>9.1f} "
+              f"{result['latency_p95_ms']:>9.1f} {result['latency_p99_ms']:>9.1f} {result['peak_rss_mb']:>8.1f}")
+
+    report = {
+        "meta": {
+            "git_revision": _git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "latency_scale": args.latency_scale,
+            "profile": args.profile,
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        DEFAULT_RESULTS_DIR, f"pipeline-{report['meta']['git_revision'] or 'local'}-{int(time.time())}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.baseline and compare_with_baseline(results, args.baseline, args.regression_threshold):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput benchmark for the ingest, enrichment and verification workers.")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGE_MODES), default=list(STAGE_MODES))
+    parser.add_argument("--modes", nargs="+", help="Only run these worker modes (e.g. async bulk).")
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES,
+                        help="Dataset sizes: RadarIDs for ingest, owners for enrich/verify.")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiplies every simulated vendor latency.")
+    parser.add_argument("--profile", help="Simulator profile JSON; by default quotas and failure injection are off.")
+    parser.add_argument("--timeout", type=float, default=3600, help="Seconds before a single case is abandoned.")
+    parser.add_argument("--output", help="Where to write the JSON results (default: benchmarks/results/).")
+    parser.add_argument("--baseline", help="Earlier results file to compare throughput against.")
+    parser.add_argument("--regression-threshold", type=float, default=0.10,
+                        help="Fractional throughput drop against the baseline that counts as a regression.")
+    parser.add_argument("--run-case", nargs=3, metavar=("STAGE", "MODE", "SIZE"), help=argparse.SUPPRESS)
+    parser.add_argument("--result-path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        stage, mode, size = args.run_case
+        result = run_case(stage, mode, int(size), args.profile, args.latency_scale)
+        with open(args.result_path, "w") as f:
+            json.dump(result, f)
+        sys.exit(0)
+    sys.exit(run_suite(args))
@@ -4,9 +4,11 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
-# --- SUPABASE CONFIG ---
+# --- DATABASE CONFIG ---
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase") # "supabase" (hosted project) or "sqlite" (local file)
+SQLITE_DATABASE_PATH = os.getenv("SQLITE_DATABASE_PATH", ".data/pipeline.sqlite3") # Database file for the sqlite backend
 
 # --- PROPERTY RADAR CONFIG ---
 PROPERTY_RADAR_API_KEY = os.getenv("PROPERTY_RADAR_API_KEY")
@@ -15,14 +17,120 @@ PROPERTY_RADAR_LIST_ID = os.getenv("PROPERTY_RADAR_LIST_ID")
 # --- GENERAL SETTINGS ---
 # You can add other settings here, like batch sizes or log levels
 INGEST_BATCH_LIMIT = 4 # Example: How many records to pull from the list at once
+INGEST_PAGE_SIZE = int(os.getenv("INGEST_PAGE_SIZE", 1000)) # Page size when streaming a whole list (`ingest --all`)
+INGEST_CURSOR_PATH = os.getenv("INGEST_CURSOR_PATH", ".ingest_cursor.json") # Where the resumable list cursor is saved
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", 8)) # How many RadarIDs are processed in parallel
+INGEST_FLUSH_SIZE = int(os.getenv("INGEST_FLUSH_SIZE", 200)) # Buffered properties that trigger a bulk upsert
+INGEST_FLUSH_INTERVAL = float(os.getenv("INGEST_FLUSH_INTERVAL", 10)) # Seconds between bulk upserts when the buffer fills slowly
+INGEST_INCREMENTAL = os.getenv("INGEST_INCREMENTAL", "false").lower() == "true" # Skip fresh properties and unchanged rewrites
+INGEST_MAX_AGE_DAYS = float(os.getenv("INGEST_MAX_AGE_DAYS", 30)) # Properties fetched more recently than this are not re-bought
+MAIL_ADDRESS_CACHE_SIZE = int(os.getenv("MAIL_ADDRESS_CACHE_SIZE", 50000)) # Distinct mailing addresses kept parsed in memory
+PROPERTY_RADAR_RATE_PER_SEC = float(os.getenv("PROPERTY_RADAR_RATE_PER_SEC", 5)) # Sustained PropertyRadar requests per second
+PROPERTY_RADAR_BURST = int(os.getenv("PROPERTY_RADAR_BURST", 10)) # Requests allowed in a burst above the sustained rate
+PROPERTY_RADAR_DAILY_CREDITS = int(os.getenv("PROPERTY_RADAR_DAILY_CREDITS", 0)) # Purchases allowed per UTC day; 0 is no cap
 
 
 # --- PEOPLE DATA LABS CONFIG ---
 PDL_API_KEY = os.getenv("PDL_API_KEY")
+PDL_CACHE_ENABLED = os.getenv("PDL_CACHE_ENABLED", "true").lower() == "true" # Cache PDL answers on local disk
+PDL_CACHE_PATH = os.getenv("PDL_CACHE_PATH", ".cache/pdl_enrichment.sqlite3")
+PDL_CACHE_TTL = int(os.getenv("PDL_CACHE_TTL", 90 * 24 * 3600)) # Seconds a match is reused
+PDL_CACHE_NEGATIVE_TTL = int(os.getenv("PDL_CACHE_NEGATIVE_TTL", 7 * 24 * 3600)) # Seconds a "not found" is reused
+PDL_CACHE_MAX_ENTRIES = int(os.getenv("PDL_CACHE_MAX_ENTRIES", 200000)) # Least recently used entries are evicted beyond this
+PDL_RATE_PER_SEC = float(os.getenv("PDL_RATE_PER_SEC", 10)) # Sustained PDL requests per second, across all processes
+PDL_BURST = int(os.getenv("PDL_BURST", 20))
+PDL_DAILY_CREDITS = int(os.getenv("PDL_DAILY_CREDITS", 0)) # Person lookups allowed per UTC day; 0 is no cap
 
 # --- WORKER SETTINGS ---
 ENRICHMENT_BATCH_SIZE = 4 # How many records to process in one go
+ENRICHMENT_MODE = os.getenv("ENRICHMENT_MODE", "serial") # "serial", "async" or "bulk"
+ENRICHMENT_CONCURRENCY = int(os.getenv("ENRICHMENT_CONCURRENCY", 10)) # Initial PDL requests in flight (async mode)
+ENRICHMENT_MAX_CONCURRENCY = int(os.getenv("ENRICHMENT_MAX_CONCURRENCY", 50)) # Ceiling the async mode can grow to
+ENRICHMENT_LEASE_SECONDS = int(os.getenv("ENRICHMENT_LEASE_SECONDS", 600)) # How long a claimed batch is reserved for one worker
+VERIFICATION_LEASE_SECONDS = int(os.getenv("VERIFICATION_LEASE_SECONDS", 900))
+RESULT_FLUSH_SIZE = int(os.getenv("RESULT_FLUSH_SIZE", 100)) # Owner results written back per bulk call
+RESULT_FLUSH_INTERVAL = float(os.getenv("RESULT_FLUSH_INTERVAL", 5)) # Max seconds a result waits before write-back
+RESULT_JOURNAL_DIR = os.getenv("RESULT_JOURNAL_DIR", ".cache/journal") # Local journal of results not yet written back
+RAW_ARCHIVE_DIR = os.getenv("RAW_ARCHIVE_DIR", ".data/archive") # Compressed raw vendor payloads, kept for audits
+RAW_ARCHIVE_SEGMENT_MB = int(os.getenv("RAW_ARCHIVE_SEGMENT_MB", 64)) # Compressed size at which an archive segment is rotated
+RAW_ARCHIVE_FLUSH_SIZE = int(os.getenv("RAW_ARCHIVE_FLUSH_SIZE", 500)) # Payloads buffered per compressed block
+RAW_ARCHIVE_FLUSH_INTERVAL = float(os.getenv("RAW_ARCHIVE_FLUSH_INTERVAL", 30)) # Max seconds a payload stays buffered
+IDLE_MIN_SLEEP = float(os.getenv("IDLE_MIN_SLEEP", 0.5)) # First wait when a worker's queue is empty
+IDLE_MAX_SLEEP = float(os.getenv("IDLE_MAX_SLEEP", 300)) # Idle waits double up to this cap
+WAKEUP_ENABLED = os.getenv("WAKEUP_ENABLED", "true").lower() == "true" # Let upstream workers wake idle ones early
+WAKEUP_DIR = os.getenv("WAKEUP_DIR", ".cache/wakeup") # Where waiting workers bind their wake-up sockets
 
 # --- VERIFICATION SERVICES ---
 MILLIONVERIFIER_API_KEY = os.getenv("MILLIONVERIFIER_API_KEY")
-NEVERBOUNCE_API_KEY = os.getenv("NEVERBOUNCE_API_KEY")
\ No newline at end of file
+NEVERBOUNCE_API_KEY = os.getenv("NEVERBOUNCE_API_KEY")
+VERIFICATION_CACHE_ENABLED = os.getenv("VERIFICATION_CACHE_ENABLED", "true").lower() == "true" # Reuse verdicts per email
+VERIFICATION_CACHE_PATH = os.getenv("VERIFICATION_CACHE_PATH", ".cache/verification_verdicts.sqlite3")
+VERIFICATION_CACHE_TTL = int(os.getenv("VERIFICATION_CACHE_TTL", 30 * 24 * 3600)) # Seconds a verdict is reused
+VERIFICATION_CACHE_MAX_ENTRIES = int(os.getenv("VERIFICATION_CACHE_MAX_ENTRIES", 500000)) # LRU eviction beyond this
+VERIFICATION_MODE = os.getenv("VERIFICATION_MODE", "serial") # "serial" (per email) or "bulk" (vendor batch jobs)
+MILLIONVERIFIER_RATE_PER_SEC = float(os.getenv("MILLIONVERIFIER_RATE_PER_SEC", 10)) # Sustained requests per second, across all processes
+MILLIONVERIFIER_BURST = int(os.getenv("MILLIONVERIFIER_BURST", 20))
+MILLIONVERIFIER_DAILY_CREDITS = int(os.getenv("MILLIONVERIFIER_DAILY_CREDITS", 0)) # Emails checked per UTC day; 0 is no cap
+NEVERBOUNCE_RATE_PER_SEC = float(os.getenv("NEVERBOUNCE_RATE_PER_SEC", 10))
+NEVERBOUNCE_BURST = int(os.getenv("NEVERBOUNCE_BURST", 20))
+NEVERBOUNCE_DAILY_CREDITS = int(os.getenv("NEVERBOUNCE_DAILY_CREDITS", 0))
+VERIFICATION_BULK_BATCH_SIZE = int(os.getenv("VERIFICATION_BULK_BATCH_SIZE", 5000)) # Owners collected per bulk job
+VERIFICATION_BULK_POLL_INTERVAL = float(os.getenv("VERIFICATION_BULK_POLL_INTERVAL", 30)) # Seconds between job status checks
+VERIFICATION_BULK_TIMEOUT = float(os.getenv("VERIFICATION_BULK_TIMEOUT", 4 * 3600)) # Defer a batch whose jobs run longer than this
+VERIFICATION_BULK_JOB_MAX_AGE = float(os.getenv("VERIFICATION_BULK_JOB_MAX_AGE", 3 * 24 * 3600)) # Resubmit emails whose job is still uncollected after this
+MV_BULK_BASE_URL = os.getenv("MV_BULK_BASE_URL", "https://bulkapi.millionverifier.com/bulkapi/v2")
+
+# --- STREAMING PIPELINE (`main.py run-all`) ---
+PIPELINE_INGEST_CONCURRENCY = int(os.getenv("PIPELINE_INGEST_CONCURRENCY", INGEST_CONCURRENCY)) # RadarIDs fetched in parallel
+PIPELINE_ENRICH_CONCURRENCY = int(os.getenv("PIPELINE_ENRICH_CONCURRENCY", 8)) # Owners enriched in parallel
+PIPELINE_VERIFY_CONCURRENCY = int(os.getenv("PIPELINE_VERIFY_CONCURRENCY", 8)) # Owners verified in parallel
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", 500)) # Owners buffered between stages before upstream blocks
+
+# --- HTTP CLIENT SETTINGS ---
+# Shared by every vendor client through core/api_clients/http_session.py
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 16)) # Keep-alive connections kept per vendor
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 5)) # Seconds to establish a connection
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", 3)) # Retries on 429/5xx, timeouts and dropped connections
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", 0.5)) # First backoff ceiling in seconds, doubled per attempt
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", 30)) # Upper bound for any single backoff or Retry-After wait
+RATE_LIMIT_DIR = os.getenv("RATE_LIMIT_DIR", ".cache/ratelimit") # Vendor rate and credit state shared by every process on the host
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 5)) # Failed calls in a row that open a vendor's circuit
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", 30)) # Seconds an open circuit waits before a probe call
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", 0.2)) # Retries allowed per vendor, as a share of its calls
+RETRY_BUDGET_MIN_PER_SEC = float(os.getenv("RETRY_BUDGET_MIN_PER_SEC", 1)) # Retries always allowed per second, however few calls
+PROPERTY_RADAR_TIMEOUT = float(os.getenv("PROPERTY_RADAR_TIMEOUT", 20)) # Read timeouts, per vendor
+PDL_TIMEOUT = float(os.getenv("PDL_TIMEOUT", 25))
+MILLIONVERIFIER_TIMEOUT = float(os.getenv("MILLIONVERIFIER_TIMEOUT", 35))
+NEVERBOUNCE_TIMEOUT = int(os.getenv("NEVERBOUNCE_TIMEOUT", 30))
+
+# --- LOGGING & METRICS ---
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO") # DEBUG, INFO, WARNING or ERROR
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text") # "text" for people, "json" (one object per line) for log shippers
+METRICS_PORT = int(os.getenv("METRICS_PORT", 0)) # Serve /metrics (Prometheus) and /metrics.json on this port; 0 is off
+METRICS_SNAPSHOT_PATH = os.getenv("METRICS_SNAPSHOT_PATH") # Also rewrite a JSON snapshot of the metrics to this file
+METRICS_SNAPSHOT_INTERVAL = float(os.getenv("METRICS_SNAPSHOT_INTERVAL", 30)) # Seconds between snapshots
+METRICS_COLLECT_INTERVAL = float(os.getenv("METRICS_COLLECT_INTERVAL", 60)) # Seconds between queue depth samples
+
+# --- VENDOR SIMULATOR ---
+# Set VENDOR_SIMULATOR_URL to send every vendor call to the local simulator
+# (`python simulator/vendor_simulator.py`) instead of the paid APIs.
+VENDOR_SIMULATOR_URL = os.getenv("VENDOR_SIMULATOR_URL") # e.g. http://127.0.0.1:8765; unset means the live APIs
+SIMULATOR_HOST = os.getenv("SIMULATOR_HOST", "127.0.0.1")
+SIMULATOR_PORT = int(os.getenv("SIMULATOR_PORT", 8765))
+SIMULATOR_PROFILE_PATH = os.getenv("SIMULATOR_PROFILE_PATH") # JSON file overriding per-vendor latency/error/quota settings
+SIMULATOR_LIST_SIZE = int(os.getenv("SIMULATOR_LIST_SIZE", 10000)) # RadarIDs on every simulated list
+SIMULATOR_SEED = int(os.getenv("SIMULATOR_SEED", 1087906)) # Seed for the injected latency and failures
+
+if VENDOR_SIMULATOR_URL:
+    # The simulator accepts any key, so placeholders stop the clients refusing to run
+    PROPERTY_RADAR_API_KEY = PROPERTY_RADAR_API_KEY or "simulator"
+    PROPERTY_RADAR_LIST_ID = PROPERTY_RADAR_LIST_ID or "simulator"
+    PDL_API_KEY = PDL_API_KEY or "simulator"
+    MILLIONVERIFIER_API_KEY = MILLIONVERIFIER_API_KEY or "simulator"
+    NEVERBOUNCE_API_KEY = NEVERBOUNCE_API_KEY or "simulator"
+    MV_BULK_BASE_URL = f"{VENDOR_SIMULATOR_URL}/millionverifier/bulkapi/v2"
+    # Keep simulated answers out of the real caches
+    PDL_CACHE_PATH = os.path.join(".cache", "simulator", os.path.basename(PDL_CACHE_PATH))
+    VERIFICATION_CACHE_PATH = os.path.join(".cache", "simulator", os.path.basename(VERIFICATION_CACHE_PATH))
+    RAW_ARCHIVE_DIR = os.path.join(RAW_ARCHIVE_DIR, "simulator")
+    RATE_LIMIT_DIR = os.path.join(RATE_LIMIT_DIR, "simulator")
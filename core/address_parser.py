@@ -0,0 +1,138 @@
+import re
+from functools import lru_cache
+
+from config import MAIL_ADDRESS_CACHE_SIZE
+
+# --- Mailing Address Parsing ---
+# PropertyRadar returns owners' mailing addresses as one string, e.g.
+# "2 EDMUND H NICHOLS RD, NORTH ATTLEBORO, MA 02760". `parse_mail_address` is the
+# original reference parser. `parse_mail_addresses` is the batch version used by
+# ingestion: it parses each distinct address string once (addresses repeat a lot
+# across investors and shared households) and matches the common
+# "City, ST ZIP" / "City ST ZIP" tail with one precompiled pattern, falling back
+# to the reference parser for anything else. Both return identical results;
+# `benchmarks/mail_address_benchmark.py` checks that and compares their speed.
+
+_EMPTY_ADDRESS = {"street": None, "city": None, "state": None, "zip": None}
+
+# Matches the part after the street once stripped: an optional city, then a
+# letters-only state and an all-digits zip, separated by plain spaces
+_CITY_STATE_ZIP = re.compile(r"(?:(.*[^ ]) +)?([A-Za-z]+) +([0-9]+)")
+
+
+def parse_mail_address(mail_address_list):
+    """
+    Parses a complex 'MailAddress' field from the PropertyRadar person object.
+    It robustly handles different address formats (e.g., "City, ST ZIP" and "City ST ZIP")
+    and correctly removes trailing commas from the city name.
+    """
+    # Initial checks for valid input data structure
+    if not mail_address_list or not isinstance(mail_address_list, list):
+        return {"street": None, "city": None, "state": None, "zip": None}
+
+    first_address_obj = mail_address_list[0]
+    if not isinstance(first_address_obj, dict) or "Address" not in first_address_obj:
+        return {"street": None, "city": None, "state": None, "zip": None}
+
+    full_address = first_address_obj.get("Address", "")
+    if not full_address:
+        return {"street": None, "city": None, "state": None, "zip": None}
+
+    # Split the full address string by commas
+    parts = full_address.split(',')
+
+    # The first part is always assumed to be the street address
+    street = parts[0].strip()
+    city, state, zip_code = None, None, None
+
+    # Process the remaining parts of the address if they exist
+    if len(parts) > 1:
+        # Re-join everything after the street address to handle the rest as a single block.
+        # This makes the logic consistent for different comma placements.
+        city_state_zip_str = ",".join(parts[1:]).strip()
+
+        # We work backwards from the end of the string, which is generally more reliable.
+        # Find the last space, which typically separates the zip code.
+        last_space_index = city_state_zip_str.rfind(' ')
+
+        if last_space_index != -1:
+            # Assume everything after the last space is the zip code
+            zip_code_candidate = city_state_zip_str[last_space_index + 1:].strip()
+
+            # The part before the zip code contains the city and state
+            state_city_part = city_state_zip_str[:last_space_index].strip()
+
+            # Find the last space in the remaining part to separate state from city
+            second_last_space_index = state_city_part.rfind(' ')
+
+            if second_last_space_index != -1:
+                # Everything after this space is the state
+                state = state_city_part[second_last_space_index + 1:].strip()
+                # Everything before it is the city
+                city_raw = state_city_part[:second_last_space_index].strip()
+                city = city_raw.rstrip(',').strip()
+
+            else:
+                state = state_city_part.rstrip(',').strip()
+
+            # Assign the zip code if it looks valid (e.g., is a digit)
+            if zip_code_candidate.isdigit():
+                zip_code = zip_code_candidate
+
+    return {"street": street, "city": city, "state": state, "zip": zip_code}
+
+
+@lru_cache(maxsize=MAIL_ADDRESS_CACHE_SIZE)
+def _parse_address_string(full_address):
+    """Parses one non-empty address string into a (street, city, state, zip) tuple."""
+    street, has_comma, rest = full_address.partition(',')
+    street = street.strip()
+    if not has_comma:
+        return (street, None, None, None)
+
+    match = _CITY_STATE_ZIP.fullmatch(rest.strip())
+    if match is None:
+        parsed = parse_mail_address([{"Address": full_address}])
+        return (parsed["street"], parsed["city"], parsed["state"], parsed["zip"])
+
+    city, state, zip_code = match.groups()
+    if city is not None:
+        city = city.strip().rstrip(',').strip()
+    return (street, city, state, zip_code)
+
+
+def parse_mail_addresses(mail_address_lists):
+    """
+    Parses many 'MailAddress' fields at once.
+
+    Args:
+        mail_address_lists: An iterable of PropertyRadar 'MailAddress' values.
+
+    Returns:
+        A list with one {"street", "city", "state", "zip"} dict per input, in
+        order, identical to calling `parse_mail_address` on each value.
+    """
+    results = []
+    for mail_address_list in mail_address_lists:
+        if not mail_address_list or not isinstance(mail_address_list, list):
+            results.append(dict(_EMPTY_ADDRESS))
+            continue
+        first_address_obj = mail_address_list[0]
+        if not isinstance(first_address_obj, dict) or "Address" not in first_address_obj:
+            results.append(dict(_EMPTY_ADDRESS))
+            continue
+        full_address = first_address_obj.get("Address", "")
+        if not full_address:
+            results.append(dict(_EMPTY_ADDRESS))
+        elif not isinstance(full_address, str):
+            # Not something the cache can key on; let the reference parser deal with it
+            results.append(parse_mail_address(mail_address_list))
+        else:
+            street, city, state, zip_code = _parse_address_string(full_address)
+            results.append({"street": street, "city": city, "state": state, "zip": zip_code})
+    return results
+
+
+def clear_address_cache():
+    """Empties the parsed-address cache (used by the benchmark for cold runs)."""
+    _parse_address_string.cache_clear()
@@ -0,0 +1,213 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import (HTTP_POOL_SIZE, HTTP_CONNECT_TIMEOUT, HTTP_MAX_RETRIES,
+                    HTTP_BACKOFF_BASE, HTTP_BACKOFF_MAX)
+from core import metrics
+from core.logger import get_logger
+from core.rate_limiter import vendor_limiter
+from core.circuit_breaker import CircuitOpenError, vendor_breaker, vendor_retry_budget
+
+log = get_logger("http")
+
+# --- Shared HTTP Layer ---
+# Every vendor client goes through this module instead of calling bare
+# `requests.get`. Each vendor gets one pooled keep-alive session, so repeated
+# calls reuse TCP+TLS connections, and transient failures (429/5xx, dropped
+# connections, timeouts) are retried with jittered exponential backoff.
+# Callers still receive a plain `requests.Response` (or the final exception),
+# so the clients keep their existing `{"success": ..., "data": ...}` contract.
+# Every attempt first takes from the vendor's shared limiter (see
+# core/rate_limiter.py) and is recorded in core.metrics (latency, status, retries).
+# Calls to a vendor whose circuit is open fail at once, and retries are limited
+# by the vendor's retry budget (see core/circuit_breaker.py).
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(vendor):
+    """Returns the pooled keep-alive session for `vendor`, creating it on first use."""
+    with _sessions_lock:
+        session = _sessions.get(vendor)
+        if session is None:
+            session = requests.Session()
+            # Retries are handled below so Retry-After and jitter apply uniformly
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=0)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[vendor] = session
+        return session
+
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff: a random delay in [0, min(max, base * 2^attempt)]."""
+    return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * (2 ** attempt)))
+
+
+def retry_after_seconds(response):
+    """Parses a Retry-After header (seconds or HTTP-date). Returns None if absent or invalid."""
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def request(vendor, method, url, timeout=None, limiter=None, credits=1, **kwargs):
+    """
+    Sends an HTTP request through the vendor's pooled session, retrying transient failures.
+
+    Args:
+        vendor: Name of the vendor, used to pick the session (e.g. "pdl").
+        method: HTTP method.
+        url: Full request URL.
+        timeout: Read timeout in seconds; the connect timeout is HTTP_CONNECT_TIMEOUT.
+        limiter: Rate limiter to take from before every attempt. Defaults to the vendor's shared limiter.
+        credits: Credits the request spends from the vendor's daily budget, charged on the first attempt only.
+        **kwargs: Passed through to `requests.Session.request`.
+
+    Returns:
+        The final `requests.Response`. A retryable status is returned as-is once
+        the retries (or the retry budget) are exhausted so the caller's
+        `raise_for_status()` handles it.
+
+    Raises:
+        CircuitOpenError: If the vendor's circuit is open.
+        requests.exceptions.RequestException: If the last attempt failed to connect or timed out.
+    """
+    session = get_session(vendor)
+    request_timeout = (HTTP_CONNECT_TIMEOUT, timeout) if timeout else HTTP_CONNECT_TIMEOUT
+    limiter = limiter or vendor_limiter(vendor)
+    breaker = vendor_breaker(vendor)
+    retry_budget = vendor_retry_budget(vendor)
+    retry_budget.record_call()
+
+    for attempt in range(HTTP_MAX_RETRIES + 1):
+        breaker.before_call()
+        if limiter is not None:
+            limiter.acquire(credits=credits if attempt == 0 else 0)
+        started_at = time.monotonic()
+        try:
+            response = session.request(method, url, timeout=request_timeout, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as err:
+            reason = err.__class__.__name__
+            metrics.observe_vendor_call(vendor, time.monotonic() - started_at, reason)
+            breaker.record_failure()
+            if attempt == HTTP_MAX_RETRIES or not retry_budget.try_spend():
+                raise
+            delay = backoff_delay(attempt)
+            metrics.record_retry(vendor, reason)
+            log.warning("Vendor request failed, retrying",
+                        extra={"vendor": vendor, "reason": reason, "retry_in_s": round(delay, 1)})
+            time.sleep(delay)
+            continue
+        metrics.observe_vendor_call(vendor, time.monotonic() - started_at, response.status_code)
+        breaker.record_status(response.status_code)
+
+        if (response.status_code not in RETRYABLE_STATUSES or attempt == HTTP_MAX_RETRIES
+                or not retry_budget.try_spend()):
+            return response
+
+        retry_after = retry_after_seconds(response)
+        delay = min(HTTP_BACKOFF_MAX, retry_after) if retry_after is not None else backoff_delay(attempt)
+        metrics.record_retry(vendor, response.status_code)
+        log.warning("Vendor returned a retryable status, retrying",
+                    extra={"vendor": vendor, "status": response.status_code, "retry_in_s": round(delay, 1)})
+        response.close()
+        time.sleep(delay)
+
+
+def is_outage(err):
+    """
+    True if a failed call says the vendor is unavailable (open circuit, timeout,
+    dropped connection, 5xx or throttling after retries) rather than that the
+    request was bad. Work that failed this way should be deferred, not failed.
+    """
+    if isinstance(err, (CircuitOpenError, requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    response = getattr(err, "response", None)
+    return response is not None and response.status_code in RETRYABLE_STATUSES
+
+
+def response_body(response):
+    """Returns a response's decoded JSON body, or its text if it is not JSON. For the raw archive."""
+    try:
+        return response.json()
+    except ValueError:
+        return response.text
+
+
+def get(vendor, url, **kwargs):
+    """Shorthand for `request(vendor, "GET", url, **kwargs)`."""
+    return request(vendor, "GET", url, **kwargs)
+
+
+def _error_status(err, throttled_on):
+    """The HTTP status an SDK exception stands for: 429 for `throttled_on`, else its response's status, if any."""
+    if isinstance(err, throttled_on):
+        return 429
+    response = getattr(err, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def call_with_retry(vendor, func, *args, retry_on=(), throttled_on=(), credits=1, **kwargs):
+    """
+    Calls `func(*args, **kwargs)`, retrying with the same jittered backoff when it
+    raises one of the exception types in `retry_on`. Used for vendors whose SDK
+    owns its own HTTP session (NeverBounce). Every attempt takes from the vendor's
+    shared limiter, spending `credits` on the first, and calls are refused while
+    the vendor's circuit is open. Retries draw on the vendor's retry budget.
+    Exceptions in `throttled_on` are recorded as a 429. Throttling, 5xx errors
+    (an exception whose `response` has a retryable status), timeouts and dropped
+    connections count against the circuit breaker and are always retried; only
+    a call that returns counts as a success.
+    """
+    limiter = vendor_limiter(vendor)
+    breaker = vendor_breaker(vendor)
+    retry_budget = vendor_retry_budget(vendor)
+    retry_budget.record_call()
+    for attempt in range(HTTP_MAX_RETRIES + 1):
+        breaker.before_call()
+        if limiter is not None:
+            limiter.acquire(credits=credits if attempt == 0 else 0)
+        started_at = time.monotonic()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as err:
+            status = _error_status(err, throttled_on)
+            reason = status or err.__class__.__name__
+            metrics.observe_vendor_call(vendor, time.monotonic() - started_at, reason)
+            transient = (isinstance(err, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+                         or status in RETRYABLE_STATUSES)
+            # Any other error is a rejected request, which says nothing either way about the vendor's health
+            if transient:
+                breaker.record_failure()
+            if (not (transient or isinstance(err, retry_on)) or attempt == HTTP_MAX_RETRIES
+                    or not retry_budget.try_spend()):
+                raise
+            delay = backoff_delay(attempt)
+            metrics.record_retry(vendor, reason)
+            log.warning("Vendor call failed, retrying",
+                        extra={"vendor": vendor, "reason": err.__class__.__name__, "retry_in_s": round(delay, 1)})
+            time.sleep(delay)
+            continue
+        metrics.observe_vendor_call(vendor, time.monotonic() - started_at, "ok")
+        breaker.record_success()
+        return result
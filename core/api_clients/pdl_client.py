@@ -1,25 +1,87 @@
+import re
+import time
 import requests
+import httpx
 import json
-from config import PDL_API_KEY
+from config import (PDL_API_KEY, PDL_TIMEOUT, PDL_CACHE_ENABLED, PDL_CACHE_PATH, PDL_CACHE_TTL,
+                    PDL_CACHE_NEGATIVE_TTL, PDL_CACHE_MAX_ENTRIES, VENDOR_SIMULATOR_URL)
+from core.api_clients import http_session
+from core.rate_limiter import vendor_limiter
+from core.circuit_breaker import vendor_breaker
+from core.cache import DiskCache, make_cache_key
+from core.archive import RawArchive
+from core import metrics
+from core.logger import get_logger
 
-BASE_URL = "https://api.peopledatalabs.com/v5/person/enrich"
+log = get_logger("pdl")
+
+PDL_ROOT = f"{VENDOR_SIMULATOR_URL}/pdl" if VENDOR_SIMULATOR_URL else "https://api.peopledatalabs.com"
+BASE_URL = f"{PDL_ROOT}/v5/person/enrich"
+BULK_URL = f"{PDL_ROOT}/v5/person/bulk"
+BULK_MAX_REQUESTS = 100 # PDL accepts at most 100 requests per bulk call
 HEADERS = {
     "X-Api-Key": PDL_API_KEY,
     "Content-Type": "application/json"
 }
 
-def enrich_person(**kwargs):
+# Persistent cache of PDL matches, shared by the single, async and bulk paths.
+# Matches are kept for PDL_CACHE_TTL; "not found" answers for the shorter
+# PDL_CACHE_NEGATIVE_TTL, since PDL's coverage grows over time.
+enrichment_cache = DiskCache(PDL_CACHE_PATH, PDL_CACHE_TTL, PDL_CACHE_MAX_ENTRIES, name="pdl") if PDL_CACHE_ENABLED else None
+
+# Raw responses, indexed by person_key and the email queried (see core/archive.py).
+# Answers served from the cache are not archived again.
+archive = RawArchive("pdl")
+
+def _archive_enrichment(operation, params, body, status_code, person_key):
+    archive.record_call(operation, params, body, status_code, person_key=person_key, email=params.get("email"))
+
+def normalize_enrich_params(params):
     """
-    Enriches a person's profile using PDL with any available data points.
-    
-    Dynamically builds the parameters from the provided keyword arguments,
-    ignoring any keys with None or empty values.
+    Normalises enrichment params so trivially different spellings of the same
+    person share a cache entry: lowercased, whitespace collapsed, postal codes
+    cut to their first five digits and phone numbers reduced to digits.
+    """
+    normalized = {}
+    for key, value in params.items():
+        if isinstance(value, str):
+            value = " ".join(value.split()).lower()
+            if key == 'postal_code':
+                value = re.sub(r"\D", "", value)[:5]
+            elif key == 'phone':
+                value = re.sub(r"\D", "", value)
+                if len(value) == 11 and value.startswith("1"):
+                    value = value[1:]
+        normalized[key] = value
+    return normalized
 
-    Args:
-        **kwargs: A dictionary of person attributes (e.g., first_name, email, etc.).
+def _get_cached_result(params):
+    """Returns the cached result for these params, or None on a miss."""
+    if enrichment_cache is None:
+        return None
+    cached = enrichment_cache.get(make_cache_key(normalize_enrich_params(params)))
+    if cached is not None:
+        log.debug("Served from the enrichment cache")
+        cached["cached"] = True
+    return cached
 
-    Returns:
-        A dictionary with success status and data or an error message.
+def _cache_result(params, result):
+    """Caches matches and not-found answers. Errors are never cached."""
+    if enrichment_cache is None or not result.get("success"):
+        return
+    if result.get("status_code") == 200:
+        ttl = PDL_CACHE_TTL
+    elif result.get("status_code") == 404:
+        ttl = PDL_CACHE_NEGATIVE_TTL
+    else:
+        return
+    entry = {"success": True, "data": result.get("data"), "status_code": result["status_code"]}
+    enrichment_cache.set(make_cache_key(normalize_enrich_params(params)), entry, ttl=ttl)
+
+def build_enrich_params(**kwargs):
+    """
+    Builds the PDL query parameters from person attributes, ignoring any keys
+    with None or empty values. Returns an empty dict if nothing usable was given.
     """
     params = {}
     # Dynamically build the params dictionary, including only keys with valid values
@@ -29,31 +91,227 @@ def enrich_person(**kwargs):
 
     # PDL requires at least one identifier to attempt a match.
     if not params:
-        return {"success": False, "error": "No valid parameters provided for enrichment."}
+        return {}
 
     # Add a minimum likelihood to avoid low-quality matches
     params['min_likelihood'] = 3
+    return params
+
+def _parse_enrich_payload(data):
+    """Turns a decoded PDL enrich response body into the client's result dict."""
+    if data.get("status") == 200 and 'data' in data:
+        return {"success": True, "data": data['data'], "status_code": 200}
+    else:
+        # This can happen for validation errors (e.g., malformed email)
+        error_detail = data.get('error', {}).get('message', 'API returned a non-200 status')
+        log.error("PDL API error", extra={"error": error_detail})
+        return {"success": False, "error": error_detail, "data": data}
+
+def enrich_person(person_key=None, **kwargs):
+    """
+    Enriches a person's profile using PDL with any available data points.
+    
+    Dynamically builds the parameters from the provided keyword arguments,
+    ignoring any keys with None or empty values.
+
+    Args:
+        person_key: The owner being enriched. Only used to index the raw response in the archive.
+        **kwargs: A dictionary of person attributes (e.g., first_name, email, etc.).
+
+    Returns:
+        A dictionary with success status and data or an error message.
+    """
+    params = build_enrich_params(**kwargs)
+    if not params:
+        return {"success": False, "error": "No valid parameters provided for enrichment."}
+
+    log.debug("Enriching profile", extra={"params": list(params.keys())})
+    cached = _get_cached_result(params)
+    if cached is not None:
+        return cached
 
-    print(f"  -> Enriching profile with parameters: {list(params.keys())}")
     try:
-        response = requests.get(BASE_URL, headers=HEADERS, params=params, timeout=25)
+        response = http_session.get("pdl", BASE_URL, headers=HEADERS, params=params, timeout=PDL_TIMEOUT)
+        _archive_enrichment("enrich", params, http_session.response_body(response), response.status_code, person_key)
         
         if response.status_code == 404:
-            print("    -! Person not found in People Data Labs.")
-            return {"success": True, "data": None, "status_code": 404}
+            log.info("Person not found in People Data Labs")
+            result = {"success": True, "data": None, "status_code": 404}
+            _cache_result(params, result)
+            return result
             
         response.raise_for_status()
         
-        data = response.json()
-        
-        if data.get("status") == 200 and 'data' in data:
-            return {"success": True, "data": data['data'], "status_code": 200}
-        else:
-            # This can happen for validation errors (e.g., malformed email)
-            error_detail = data.get('error', {}).get('message', 'API returned a non-200 status')
-            print(f"    -! PDL API Error: {error_detail}")
-            return {"success": False, "error": error_detail, "data": data}
+        result = _parse_enrich_payload(response.json())
+        _cache_result(params, result)
+        return result
 
     except requests.exceptions.RequestException as err:
-        print(f"    -! ERROR calling PDL API: {err}")
-        return {"success": False, "error": str(err)}
\ No newline at end of file
+        log.error("PDL API request failed", extra={"error": str(err)})
+        return {"success": False, "error": str(err), "deferred": http_session.is_outage(err)}
+
+def _parse_bulk_item(item):
+    """Maps one entry of a bulk response onto the same shapes `enrich_person` returns."""
+    status = item.get("status")
+    if status == 404:
+        return {"success": True, "data": None, "status_code": 404}
+    if status == 200 and 'data' in item:
+        return {"success": True, "data": item['data'], "status_code": 200}
+    error_detail = (item.get('error') or {}).get('message', f'API returned status {status}')
+    # A throttled or failed item is PDL being unavailable, not a bad request
+    return {"success": False, "error": error_detail, "data": item,
+            "deferred": status in http_session.RETRYABLE_STATUSES}
+
+def bulk_enrich_people(people):
+    """
+    Enriches many people through PDL's bulk endpoint, up to 100 per call.
+
+    Args:
+        people: A dict mapping each person_key to the same keyword arguments
+            `enrich_person` accepts (e.g. the params built by the enrichment worker).
+
+    Returns:
+        A dict mapping every person_key to a result in the same shape
+        `enrich_person` would have returned for it. Not-found people get the
+        usual 404 result; if a whole bulk call fails, each of its people gets
+        that call's error. People PDL's daily credit budget has no room for
+        today get a deferred result.
+    """
+    results = {}
+    pending = []
+    for person_key, kwargs in people.items():
+        params = build_enrich_params(**kwargs)
+        if not params:
+            results[person_key] = {"success": False, "error": "No valid parameters provided for enrichment."}
+            continue
+        cached = _get_cached_result(params)
+        if cached is not None:
+            results[person_key] = cached
+        else:
+            pending.append((person_key, params))
+
+    limiter = vendor_limiter("pdl")
+    start = 0
+    while start < len(pending):
+        # Each chunk is sized to what is left of PDL's daily budget; whoever does not fit waits for the reset
+        available = limiter.credits_available()
+        size = BULK_MAX_REQUESTS if available is None else min(BULK_MAX_REQUESTS, available)
+        if size == 0:
+            log.warning("PDL daily credit budget used up. Deferring the rest of the batch.",
+                        extra={"profiles": len(pending) - start})
+            for person_key, _ in pending[start:]:
+                results[person_key] = {"success": False, "error": "PDL's daily credit budget is used up.",
+                                       "deferred": True}
+            break
+        chunk = pending[start:start + size]
+        start += size
+        body = {
+            "requests": [
+                {"params": params, "metadata": {"person_key": person_key}}
+                for person_key, params in chunk
+            ]
+        }
+        log.info("Bulk enriching profiles", extra={"profiles": len(chunk)})
+        try:
+            response = http_session.request("pdl", "POST", BULK_URL, headers=HEADERS, json=body, timeout=PDL_TIMEOUT,
+                                            credits=len(chunk))
+            response.raise_for_status()
+            items = response.json()
+        except (requests.exceptions.RequestException, ValueError) as err:
+            log.error("PDL bulk API request failed", extra={"error": str(err)})
+            deferred = http_session.is_outage(err)
+            for person_key, _ in chunk:
+                results[person_key] = {"success": False, "error": str(err), "deferred": deferred}
+            continue
+
+        if not isinstance(items, list):
+            log.error("PDL bulk API returned an unexpected body", extra={"body": str(items)[:200]})
+            for person_key, _ in chunk:
+                results[person_key] = {"success": False, "error": "Unexpected response body from the PDL bulk API."}
+            continue
+
+        # Responses come back in request order, so results are always keyed by the requested person.
+        # The echoed metadata is only a cross-check.
+        for (person_key, params), item in zip(chunk, items):
+            if not isinstance(item, dict):
+                results[person_key] = {"success": False, "error": "Unexpected item in the PDL bulk response."}
+                continue
+            item_key = (item.get("metadata") or {}).get("person_key", person_key)
+            _archive_enrichment("bulk_enrich", params, item, item.get("status"), person_key)
+            result = _parse_bulk_item(item)
+            if item_key == person_key:
+                _cache_result(params, result)
+            else:
+                log.warning("PDL bulk response metadata does not match the request",
+                            extra={"person_key": person_key, "metadata_person_key": item_key})
+            results[person_key] = result
+        for person_key, _ in chunk[len(items):]:
+            results[person_key] = {"success": False, "error": "No response returned for this person in the bulk call."}
+
+    return results
+
+async def enrich_person_async(client, person_key=None, **kwargs):
+    """
+    Async counterpart of `enrich_person` for use with an `httpx.AsyncClient`.
+
+    Returns the same result shapes as `enrich_person`. Throttled and server-error
+    responses are not retried here; instead the result carries `status_code`,
+    `retry_after` and `rate_limit_remaining` so the caller can adapt its concurrency.
+    While PDL's circuit is open no request is sent and a deferred result is returned.
+    """
+    params = build_enrich_params(**kwargs)
+    if not params:
+        return {"success": False, "error": "No valid parameters provided for enrichment."}
+
+    log.debug("Enriching profile", extra={"params": list(params.keys())})
+    cached = _get_cached_result(params)
+    if cached is not None:
+        return cached
+
+    breaker = vendor_breaker("pdl")
+    if not breaker.allow():
+        return {"success": False, "error": f"The pdl circuit is open. Retrying in {breaker.retry_in():.0f}s.",
+                "deferred": True}
+
+    await vendor_limiter("pdl").acquire_async()
+    started_at = time.monotonic()
+    try:
+        response = await client.get(BASE_URL, headers=HEADERS, params=params, timeout=PDL_TIMEOUT)
+    except httpx.HTTPError as err:
+        metrics.observe_vendor_call("pdl", time.monotonic() - started_at, err.__class__.__name__)
+        breaker.record_failure()
+        log.error("PDL API request failed", extra={"error": str(err)})
+        return {"success": False, "error": str(err), "deferred": True}
+    metrics.observe_vendor_call("pdl", time.monotonic() - started_at, response.status_code)
+    breaker.record_status(response.status_code)
+    _archive_enrichment("enrich", params, http_session.response_body(response), response.status_code, person_key)
+
+    remaining = response.headers.get("x-ratelimit-remaining")
+    rate_info = {"rate_limit_remaining": int(remaining) if remaining and remaining.isdigit() else None}
+
+    if response.status_code == 404:
+        log.info("Person not found in People Data Labs")
+        result = {"success": True, "data": None, "status_code": 404}
+        _cache_result(params, result)
+        return {**result, **rate_info}
+
+    if response.status_code >= 400:
+        error_detail = f"{response.status_code} Error from PDL for url: {response.url}"
+        log.error("PDL API request failed", extra={"error": error_detail})
+        return {
+            "success": False,
+            "error": error_detail,
+            "status_code": response.status_code,
+            "retry_after": http_session.retry_after_seconds(response),
+            "deferred": response.status_code in http_session.RETRYABLE_STATUSES,
+            **rate_info,
+        }
+
+    try:
+        result = _parse_enrich_payload(response.json())
+    except ValueError as err:
+        log.error("Could not decode the PDL response", extra={"error": str(err)})
+        return {"success": False, "error": str(err)}
+    _cache_result(params, result)
+    result.update(rate_info)
+    return result
@@ -1,53 +1,96 @@
 import requests
-from config import PROPERTY_RADAR_API_KEY
+from config import PROPERTY_RADAR_API_KEY, PROPERTY_RADAR_TIMEOUT, VENDOR_SIMULATOR_URL
+from core.api_clients import http_session
+from core.archive import RawArchive
+from core.logger import get_logger
 
-BASE_URL = "https://api.propertyradar.com/v1"
+log = get_logger("property_radar")
+
+BASE_URL = f"{VENDOR_SIMULATOR_URL}/propertyradar/v1" if VENDOR_SIMULATOR_URL else "https://api.propertyradar.com/v1"
 HEADERS = {
     "Authorization": f"Bearer {PROPERTY_RADAR_API_KEY}",
     "Content-Type": "application/json"
 }
 
-def get_radar_ids_from_list(list_id, limit=1):
-    """Fetches a batch of RadarID summaries from a given List ID."""
+# Raw responses, indexed by RadarID (see core/archive.py)
+archive = RawArchive("propertyradar")
+
+def get_radar_ids_from_list(list_id, limit=1, start=0):
+    """Fetches a batch of RadarID summaries from a given List ID, starting at offset `start`."""
     endpoint = f"{BASE_URL}/lists/{list_id}/items"
-    params = {"Start": 0, "Limit": limit}
-    print(f"Fetching up to {limit} RadarID summaries from list: {list_id}...")
+    params = {"Start": start, "Limit": limit}
+    log.info("Fetching RadarID summaries", extra={"list_id": list_id, "start": start, "limit": limit})
     try:
-        response = requests.get(endpoint, headers=HEADERS, params=params)
+        # Reading a list does not purchase records
+        response = http_session.get("propertyradar", endpoint, headers=HEADERS, params=params,
+                                    timeout=PROPERTY_RADAR_TIMEOUT, credits=0)
         response.raise_for_status()
         data = response.json()
+        archive.record_call("list_items", {"list_id": list_id, **params}, data, response.status_code,
+                            radar_id=[item.get("RadarID") for item in data.get('results') or []])
         return {"success": True, "data": data.get('results', [])}
     except requests.exceptions.RequestException as err:
-        print(f"--- API Error (get_radar_ids_from_list): {err}")
+        log.error("PropertyRadar list request failed", extra={"list_id": list_id, "error": str(err)})
         return {"success": False, "error": str(err)}
 
+def iter_list_pages(list_id, page_size=1000, start=0):
+    """
+    Walks an entire list page by page, yielding each page lazily.
+
+    Every yielded value follows the usual client contract, extended with the
+    offset the page was requested at and whether it was the final page:
+        {"success": True, "data": [...], "start": 2000, "is_last": False}
+
+    Iteration stops after the first failed request (the failed page is yielded
+    so the caller can keep its cursor) or after a page shorter than `page_size`.
+    """
+    while True:
+        page = get_radar_ids_from_list(list_id, limit=page_size, start=start)
+        page["start"] = start
+        if not page["success"]:
+            page["is_last"] = True
+            yield page
+            return
+
+        page["is_last"] = len(page["data"]) < page_size
+        yield page
+        if page["is_last"]:
+            return
+        start += len(page["data"])
+
 def get_property_details(radar_id):
     """Fetches the full property details for a single RadarID."""
     endpoint = f"{BASE_URL}/properties/{radar_id}"
     params = {"Purchase": 1, "Fields": "Overview"}
-    print(f"  -> Fetching PROPERTY details for RadarID: {radar_id}...")
+    log.debug("Fetching property details", extra={"radar_id": radar_id})
     try:
-        response = requests.get(endpoint, headers=HEADERS, params=params, timeout=20)
+        response = http_session.get("propertyradar", endpoint, headers=HEADERS, params=params,
+                                    timeout=PROPERTY_RADAR_TIMEOUT)
         response.raise_for_status()
         data = response.json()
+        archive.record_call("property_details", {"radar_id": radar_id, **params}, data, response.status_code,
+                            radar_id=radar_id)
         if isinstance(data, dict) and "results" in data and data["results"]:
             return {"success": True, "data": data["results"][0]}
         else:
             return {"success": False, "error": "Unexpected JSON structure", "data": data}
     except requests.exceptions.RequestException as err:
-        print(f"    -! ERROR fetching property details for {radar_id}: {err}")
+        log.error("Could not fetch property details", extra={"radar_id": radar_id, "error": str(err)})
         return {"success": False, "error": str(err)}
 
 def get_persons_for_property(radar_id):
     """Fetches the list of owners/persons for a single RadarID."""
     endpoint = f"{BASE_URL}/properties/{radar_id}/persons"
     params = {"Purchase": 1, "Fields": "default"}
-    print(f"  -> Fetching PERSONS for RadarID: {radar_id}...")
+    log.debug("Fetching persons", extra={"radar_id": radar_id})
     try:
-        response = requests.get(endpoint, headers=HEADERS, params=params, timeout=20)
+        response = http_session.get("propertyradar", endpoint, headers=HEADERS, params=params,
+                                    timeout=PROPERTY_RADAR_TIMEOUT)
         response.raise_for_status()
         data = response.json()
+        archive.record_call("persons", {"radar_id": radar_id, **params}, data, response.status_code,
+                            radar_id=radar_id)
         return {"success": True, "data": data.get("results")}
     except requests.exceptions.RequestException as err:
-        print(f"    -! ERROR fetching persons for {radar_id}: {err}")
+        log.error("Could not fetch persons", extra={"radar_id": radar_id, "error": str(err)})
         return {"success": False, "error": str(err)}
\ No newline at end of file
@@ -1,10 +1,28 @@
+import csv
+import io
+import time
 import requests
 import neverbounce_sdk
-from config import MILLIONVERIFIER_API_KEY, NEVERBOUNCE_API_KEY
+from neverbounce_sdk import utils as nb_utils
+from neverbounce_sdk.exceptions import ThrottleTriggered
+from config import (MILLIONVERIFIER_API_KEY, NEVERBOUNCE_API_KEY, MILLIONVERIFIER_TIMEOUT, NEVERBOUNCE_TIMEOUT,
+                    MV_BULK_BASE_URL, VERIFICATION_BULK_POLL_INTERVAL, VERIFICATION_BULK_TIMEOUT,
+                    VENDOR_SIMULATOR_URL)
+from core.api_clients import http_session
+from core.rate_limiter import vendor_limiter
+from core.archive import RawArchive
+from core.logger import get_logger
+
+log = get_logger("verifier")
+
+# Raw responses, indexed by email (see core/archive.py). Bulk job results are
+# archived as they were downloaded, indexed by every email in them.
+mv_archive = RawArchive("millionverifier")
+nb_archive = RawArchive("neverbounce")
 
 # --- MillionVerifier Client Logic ---
 
-MV_BASE_URL = "https://api.millionverifier.com/api/v3"
+MV_BASE_URL = f"{VENDOR_SIMULATOR_URL}/millionverifier/api/v3" if VENDOR_SIMULATOR_URL else "https://api.millionverifier.com/api/v3"
 
 def verify_millionverifier(email: str):
     """
@@ -19,23 +37,93 @@ def verify_millionverifier(email: str):
         "timeout": 30
     }
     try:
-        response = requests.get(MV_BASE_URL, params=params, timeout=35)
+        response = http_session.get("millionverifier", MV_BASE_URL, params=params, timeout=MILLIONVERIFIER_TIMEOUT)
+        mv_archive.record_call("verify", {"email": email}, http_session.response_body(response), response.status_code,
+                               email=email)
         response.raise_for_status()
         return {"success": True, "data": response.json()}
     except requests.exceptions.RequestException as err:
-        print(f"    -! MillionVerifier API Error: {err}")
+        log.error("MillionVerifier API error", extra={"error": str(err)})
+        return {"success": False, "error": str(err), "deferred": http_session.is_outage(err)}
+
+def submit_millionverifier_bulk(emails):
+    """Uploads a list of emails as a MillionVerifier bulk file. Returns the file_id in `data`."""
+    if not MILLIONVERIFIER_API_KEY:
+        return {"success": False, "error": "MillionVerifier API key is not configured."}
+
+    content = "\n".join(emails)
+    files = {"file_contents": ("emails.txt", content, "text/plain")}
+    try:
+        response = http_session.request("millionverifier", "POST", f"{MV_BULK_BASE_URL}/upload",
+                                        params={"key": MILLIONVERIFIER_API_KEY}, files=files,
+                                        timeout=MILLIONVERIFIER_TIMEOUT, credits=len(emails))
+        response.raise_for_status()
+        data = response.json()
+        mv_archive.record_call("bulk_upload", {"emails": len(emails)}, data, response.status_code)
+        if not data.get("file_id"):
+            return {"success": False, "error": data.get("error", "No file_id returned"), "data": data}
+        return {"success": True, "data": data}
+    except (requests.exceptions.RequestException, ValueError) as err:
+        log.error("MillionVerifier bulk API error", extra={"error": str(err)})
+        return {"success": False, "error": str(err), "deferred": http_session.is_outage(err)}
+
+def get_millionverifier_bulk_status(file_id):
+    """Fetches the processing status of a MillionVerifier bulk file."""
+    params = {"key": MILLIONVERIFIER_API_KEY, "file_id": file_id}
+    try:
+        response = http_session.get("millionverifier", f"{MV_BULK_BASE_URL}/fileinfo", params=params,
+                                    timeout=MILLIONVERIFIER_TIMEOUT, credits=0)
+        response.raise_for_status()
+        return {"success": True, "data": response.json()}
+    except (requests.exceptions.RequestException, ValueError) as err:
+        log.error("MillionVerifier bulk API error", extra={"error": str(err)})
         return {"success": False, "error": str(err)}
 
+def download_millionverifier_bulk_results(file_id):
+    """
+    Downloads the results of a finished MillionVerifier bulk file.
+    Returns `data` as {email: row}, where each row carries the same `result`
+    field the single-email API returns.
+    """
+    params = {"key": MILLIONVERIFIER_API_KEY, "file_id": file_id, "filter": "all"}
+    try:
+        response = http_session.get("millionverifier", f"{MV_BULK_BASE_URL}/download", params=params,
+                                    timeout=MILLIONVERIFIER_TIMEOUT, credits=0)
+        response.raise_for_status()
+    except requests.exceptions.RequestException as err:
+        log.error("MillionVerifier bulk API error", extra={"error": str(err)})
+        return {"success": False, "error": str(err), "deferred": http_session.is_outage(err)}
+
+    results = {}
+    for row in csv.DictReader(io.StringIO(response.text)):
+        email = (row.get("email") or "").strip()
+        if email:
+            results[email.lower()] = row
+    mv_archive.record_call("bulk_download", {"file_id": file_id}, response.text, response.status_code,
+                           email=list(results))
+    return {"success": True, "data": results}
+
 
 # --- NeverBounce Client Logic ---
 
-# Initialize the client once at the module level for efficiency
+# Initialize the client once at the module level for efficiency.
+# The SDK keeps its own keep-alive session, so only the retry policy is shared.
+NB_RETRYABLE_ERRORS = (ThrottleTriggered, requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+NB_THROTTLE_ERRORS = (ThrottleTriggered,)
+
+if VENDOR_SIMULATOR_URL:
+    # The SDK builds every endpoint from this module-level root
+    nb_utils.API_ROOT = f"{VENDOR_SIMULATOR_URL}/neverbounce"
+
 nb_client = None
 if NEVERBOUNCE_API_KEY:
     try:
-        nb_client = neverbounce_sdk.client(api_key=NEVERBOUNCE_API_KEY, timeout=30)
+        nb_client = neverbounce_sdk.client(api_key=NEVERBOUNCE_API_KEY, timeout=NEVERBOUNCE_TIMEOUT)
     except Exception as e:
-        print(f"FATAL: Failed to initialize NeverBounce client. Error: {e}")
+        log.critical("Failed to initialize the NeverBounce client", extra={"error": str(e)})
+
+def _nb_outage(err):
+    return http_session.is_outage(err) or isinstance(err, NB_THROTTLE_ERRORS)
 
 def verify_neverbounce(email: str):
     """
@@ -46,9 +134,211 @@ def verify_neverbounce(email: str):
 
     try:
         # The SDK returns a dictionary directly
-        result = nb_client.single_check(email)
+        result = http_session.call_with_retry("neverbounce", nb_client.single_check, email,
+                                             retry_on=NB_RETRYABLE_ERRORS, throttled_on=NB_THROTTLE_ERRORS)
+        nb_archive.record_call("verify", {"email": email}, result, email=email)
         return {"success": True, "data": result}
     except Exception as err:
         # The SDK can throw various errors, including API connection issues
-        print(f"    -! NeverBounce API Error: {err}")
-        return {"success": False, "error": str(err)}
\ No newline at end of file
+        log.error("NeverBounce API error", extra={"error": str(err)})
+        return {"success": False, "error": str(err), "deferred": _nb_outage(err)}
+
+def submit_neverbounce_bulk(emails):
+    """Creates and starts a NeverBounce bulk job through the SDK's jobs interface. Returns the job_id in `data`."""
+    if not nb_client:
+        return {"success": False, "error": "NeverBounce client is not initialized."}
+
+    job_input = [{"id": str(index), "email": email} for index, email in enumerate(emails)]
+    try:
+        job = http_session.call_with_retry("neverbounce", nb_client.jobs_create, job_input,
+                                           auto_parse=True, auto_start=True, credits=len(emails),
+                                           retry_on=NB_RETRYABLE_ERRORS, throttled_on=NB_THROTTLE_ERRORS)
+        nb_archive.record_call("bulk_create", {"emails": len(emails)}, job)
+        return {"success": True, "data": job}
+    except Exception as err:
+        log.error("NeverBounce bulk API error", extra={"error": str(err)})
+        return {"success": False, "error": str(err), "deferred": _nb_outage(err)}
+
+def get_neverbounce_bulk_status(job_id):
+    """Fetches the status of a NeverBounce bulk job."""
+    try:
+        status = http_session.call_with_retry("neverbounce", nb_client.jobs_status, job_id, credits=0,
+                                              retry_on=NB_RETRYABLE_ERRORS, throttled_on=NB_THROTTLE_ERRORS)
+        return {"success": True, "data": status}
+    except Exception as err:
+        log.error("NeverBounce bulk API error", extra={"error": str(err)})
+        return {"success": False, "error": str(err)}
+
+def download_neverbounce_bulk_results(job_id):
+    """
+    Reads every result of a finished NeverBounce bulk job.
+    Returns `data` as {email: verification}, where each verification carries
+    the same `result` field `single_check` returns.
+    """
+    results = {}
+    items = []
+    try:
+        # The SDK pages through the results itself; pace the download as one request
+        vendor_limiter("neverbounce").acquire(credits=0)
+        for item in nb_client.jobs_results(job_id):
+            items.append(item)
+            email = (item.get("data", {}).get("email") or "").strip()
+            if email:
+                results[email.lower()] = item.get("verification", {})
+    except Exception as err:
+        log.error("NeverBounce bulk API error", extra={"error": str(err)})
+        return {"success": False, "error": str(err), "deferred": _nb_outage(err)}
+    nb_archive.record_call("bulk_results", {"job_id": job_id}, items, email=list(results))
+    return {"success": True, "data": results}
+
+
+# --- Bulk Verification ---
+
+MV_BULK_DONE_STATUSES = ['finished']
+MV_BULK_FAILED_STATUSES = ['error', 'canceled']
+NB_BULK_DONE_STATUSES = ['complete']
+NB_BULK_FAILED_STATUSES = ['failed', 'under_review']
+
+def _poll_until_done(vendor, check_status, job_id, status_key, done_statuses, failed_statuses,
+                     poll_interval, timeout):
+    """
+    Polls a bulk job until it reaches a done or failed status, checking at least
+    once. Returns (error, timed_out): error is None once the job is done.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        status_response = check_status(job_id)
+        if status_response["success"]:
+            status = status_response["data"].get(status_key)
+            if status in done_statuses:
+                return None, False
+            if status in failed_statuses:
+                return f"{vendor} bulk job {job_id} ended with status '{status}'.", False
+            log.info("Bulk job still running",
+                     extra={"vendor": vendor, "job_id": job_id, "status": status, "next_check_s": poll_interval})
+        if time.monotonic() >= deadline:
+            return f"{vendor} bulk job {job_id} did not finish within {timeout:.0f}s.", True
+        time.sleep(poll_interval)
+
+def _fan_out(emails, vendor_results, error, deferred=False):
+    """
+    Maps a vendor's bulk results back to one single-check style response per email.
+    `deferred` marks the errors of a job that could not be submitted because the vendor was down.
+    """
+    responses = {}
+    for email in emails:
+        if error:
+            responses[email] = {"success": False, "error": error, "deferred": deferred}
+            continue
+        result = vendor_results.get(email.lower())
+        if result is None:
+            responses[email] = {"success": False, "error": "Email missing from bulk results."}
+        else:
+            responses[email] = {"success": True, "data": result, "bulk": True}
+    return responses
+
+def _within_budget(vendor, emails):
+    """Splits `emails` into those the vendor's daily credit budget can still pay for today and the rest."""
+    available = vendor_limiter(vendor).credits_available()
+    if available is None:
+        return emails, []
+    return emails[:available], emails[available:]
+
+# How each vendor's bulk jobs are submitted, polled and collected
+BULK_VENDORS = {
+    "millionverifier": {
+        "name": "MillionVerifier", "submit": submit_millionverifier_bulk, "job_id": "file_id",
+        "status": get_millionverifier_bulk_status, "status_key": "status",
+        "done": MV_BULK_DONE_STATUSES, "failed": MV_BULK_FAILED_STATUSES,
+        "download": download_millionverifier_bulk_results,
+    },
+    "neverbounce": {
+        "name": "NeverBounce", "submit": submit_neverbounce_bulk, "job_id": "job_id",
+        "status": get_neverbounce_bulk_status, "status_key": "job_status",
+        "done": NB_BULK_DONE_STATUSES, "failed": NB_BULK_FAILED_STATUSES,
+        "download": download_neverbounce_bulk_results,
+    },
+}
+
+def _collect_bulk_job(vendor, job_id, emails, poll_interval, timeout):
+    """
+    Waits for one bulk job and returns a response per email. If the job is still
+    running at `timeout`, or its results could not be downloaded because the
+    vendor was down, every response is deferred and carries the job's
+    `bulk_job_id`, so the job can be collected later without paying for it again.
+    """
+    spec = BULK_VENDORS[vendor]
+    error, pending = _poll_until_done(spec["name"], spec["status"], job_id, spec["status_key"], spec["done"],
+                                      spec["failed"], poll_interval, timeout)
+    vendor_results = {}
+    if not error:
+        download = spec["download"](job_id)
+        error, vendor_results = download.get("error"), download.get("data", {})
+        pending = download.get("deferred", False)
+    if pending:
+        log.warning("Bulk job not collected yet. Deferring its emails.",
+                    extra={"vendor": vendor, "job_id": job_id, "emails": len(emails)})
+        return {email: {"success": False, "error": error, "deferred": True, "bulk_job_id": job_id}
+                for email in emails}
+    return _fan_out(emails, vendor_results, error)
+
+def verify_bulk(mv_emails, nb_emails, poll_interval=VERIFICATION_BULK_POLL_INTERVAL, timeout=VERIFICATION_BULK_TIMEOUT,
+                running_jobs=None, on_submitted=None):
+    """
+    Verifies many emails at once through both vendors' bulk job APIs.
+
+    `mv_emails` go to MillionVerifier and `nb_emails` to NeverBounce, so an email
+    is only paid for at the vendors that still need to check it. A vendor with
+    no emails gets no job. All jobs are submitted before any is polled, so
+    they run side by side, and `timeout` bounds the wait for all of them.
+    Returns {"millionverifier": {email: response},
+    "neverbounce": {email: response}}, where every response has the same shape
+    as `verify_millionverifier` / `verify_neverbounce` would have returned for that email.
+
+    `running_jobs` maps each vendor to {email: job_id} for emails an earlier call
+    already submitted in a job that was not collected; that job is polled again
+    instead of submitting the emails twice. `on_submitted(vendor, job_id, emails)`
+    is called as soon as a new job is accepted, before it is polled, so the caller
+    can record it. Emails whose job is not collected by `timeout` get a deferred
+    error with the job's `bulk_job_id` (see _collect_bulk_job).
+    Emails beyond what a vendor's daily credit budget can pay for today are
+    not submitted and get a deferred error.
+    """
+    running_jobs = running_jobs or {}
+    requested = {"millionverifier": list(dict.fromkeys(mv_emails)), "neverbounce": list(dict.fromkeys(nb_emails))}
+    results = {}
+    jobs = []
+    for vendor, emails in requested.items():
+        spec = BULK_VENDORS[vendor]
+        running = running_jobs.get(vendor, {})
+        resumed = {}
+        for email in emails:
+            if email in running:
+                resumed.setdefault(running[email], []).append(email)
+        jobs.extend((vendor, job_id, job_emails) for job_id, job_emails in resumed.items())
+
+        new_emails, over_budget = _within_budget(vendor, [email for email in emails if email not in running])
+        results[vendor] = _fan_out(over_budget, {}, f"{spec['name']}'s daily credit budget is used up.",
+                                   deferred=True)
+        if over_budget:
+            log.warning("Daily credit budget used up. Deferring the emails that do not fit.",
+                        extra={"vendor": vendor, "emails": len(over_budget)})
+        if not new_emails:
+            continue
+
+        log.info("Submitting emails to the bulk verification API",
+                 extra={"vendor": vendor, "emails": len(new_emails), "resumed_jobs": len(resumed)})
+        job = spec["submit"](new_emails)
+        if not job["success"]:
+            results[vendor].update(_fan_out(new_emails, {}, job.get("error"), deferred=job.get("deferred", False)))
+            continue
+        job_id = job["data"][spec["job_id"]]
+        if on_submitted is not None:
+            on_submitted(vendor, job_id, new_emails)
+        jobs.append((vendor, job_id, new_emails))
+
+    deadline = time.monotonic() + timeout
+    for vendor, job_id, emails in jobs:
+        remaining = max(0.0, deadline - time.monotonic())
+        results[vendor].update(_collect_bulk_job(vendor, job_id, emails, poll_interval, remaining))
+    return results
@@ -0,0 +1,201 @@
+import argparse
+import atexit
+import glob
+import gzip
+import json
+import mmap
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from config import RAW_ARCHIVE_DIR, RAW_ARCHIVE_SEGMENT_MB, RAW_ARCHIVE_FLUSH_SIZE, RAW_ARCHIVE_FLUSH_INTERVAL
+
+# --- Raw Payload Archive ---
+# Full vendor responses are only needed when auditing or replaying a decision,
+# so they are kept out of the database in an append-only archive on disk. Every
+# API client writes to its own stream (RAW_ARCHIVE_DIR/<stream>/).
+#
+# A stream is a series of segments, gzip-compressed JSONL files that are rotated
+# once they reach RAW_ARCHIVE_SEGMENT_MB. Each process writes its own segments,
+# so no file has two writers. Records are buffered and every flush appends one
+# gzip member (a block that decompresses on its own), which `zcat` reads back as
+# one stream. Next to each segment, a sidecar `.idx` file lists every record's
+# index keys (radar_id, person_key, email) with the offset and length of its
+# block and its line in that block. A lookup reads the small index files, then
+# decompresses only the matching blocks out of the memory-mapped segments.
+
+INDEX_FIELDS = ("radar_id", "person_key", "email")
+
+
+def _index_value(field, value):
+    value = str(value).strip()
+    return value.lower() if field == "email" else value
+
+
+def _index_prefix(field, value):
+    # Index lines are JSON arrays that start with the field and value, so a lookup can skip lines without parsing them
+    return json.dumps([field, _index_value(field, value)])[:-1] + ","
+
+
+class RawArchive:
+    """
+    Append-only, segmented archive of raw payloads for one stream. Safe to share
+    between threads. Buffered records are written once `flush_size` are pending,
+    `flush_interval` seconds after the last flush, and when the process exits.
+    """
+
+    def __init__(self, stream, directory=RAW_ARCHIVE_DIR, segment_bytes=RAW_ARCHIVE_SEGMENT_MB * 1024 * 1024,
+                 flush_size=RAW_ARCHIVE_FLUSH_SIZE, flush_interval=RAW_ARCHIVE_FLUSH_INTERVAL):
+        self.stream = stream
+        self.directory = os.path.join(directory, stream)
+        self.segment_bytes = segment_bytes
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._segment = None
+        self._segment_size = 0
+        self._segment_count = 0
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        # Whatever is still buffered when the process exits is written out
+        atexit.register(self.flush)
+
+    # --- Writing ---
+
+    def append(self, record, **keys):
+        """
+        Buffers one JSON-serialisable record. `keys` are the values to index it
+        under: any of INDEX_FIELDS, each a single value or a list of values.
+        """
+        index = set()
+        for field, values in keys.items():
+            if field not in INDEX_FIELDS:
+                raise ValueError(f"Cannot index archive records by '{field}'. Use one of {INDEX_FIELDS}.")
+            if values is None:
+                continue
+            if isinstance(values, (str, int)):
+                values = [values]
+            index.update((field, _index_value(field, value)) for value in values if value)
+
+        line = json.dumps(record, separators=(",", ":"), default=str)
+        with self._lock:
+            self._pending.append((line, sorted(index)))
+            should_flush = (
+                len(self._pending) >= self.flush_size
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+        if should_flush:
+            self.flush()
+
+    def record_call(self, operation, request=None, response=None, status_code=None, **keys):
+        """Archives one vendor call: what was asked, the raw answer and when. `keys` are as in `append()`."""
+        self.append({
+            "at": datetime.now(timezone.utc).isoformat(),
+            "operation": operation,
+            "request": request,
+            "status_code": status_code,
+            "response": response,
+        }, **keys)
+
+    def _segment_for(self, size):
+        # Caller must hold the lock
+        if self._segment is None or (self._segment_size and self._segment_size + size > self.segment_bytes):
+            os.makedirs(self.directory, exist_ok=True)
+            self._segment_count += 1
+            started = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+            self._segment = os.path.join(self.directory,
+                                         f"{self.stream}-{started}-{os.getpid()}-{self._segment_count:04d}.jsonl.gz")
+            self._segment_size = 0
+        return self._segment
+
+    def flush(self):
+        """Appends every buffered record to the current segment as one compressed block, and indexes them."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            self._last_flush = time.monotonic()
+            if not pending:
+                return
+            block = gzip.compress(("\n".join(line for line, _ in pending) + "\n").encode("utf-8"))
+            segment = self._segment_for(len(block))
+            offset = self._segment_size
+            with open(segment, "ab") as f:
+                f.write(block)
+            self._segment_size += len(block)
+            # The block is on disk before it is indexed, so the index never points past the data
+            with open(segment + ".idx", "a") as f:
+                for number, (_, index) in enumerate(pending):
+                    for field, value in index:
+                        f.write(json.dumps([field, value, offset, len(block), number]) + "\n")
+
+    # --- Reading ---
+
+    def segments(self):
+        """Returns the stream's segment paths, oldest first."""
+        return sorted(glob.glob(os.path.join(self.directory, f"{self.stream}-*.jsonl.gz")))
+
+    def _index_hits(self, field, value):
+        """Returns the (segment, offset, length, line) of every record indexed under `field` = `value`."""
+        prefix = _index_prefix(field, value)
+        hits = set()
+        for segment in self.segments():
+            try:
+                with open(segment + ".idx") as f:
+                    for line in f:
+                        if line.startswith(prefix):
+                            _, _, offset, length, number = json.loads(line)
+                            hits.add((segment, offset, length, number))
+            except FileNotFoundError:
+                continue
+        return hits
+
+    def find(self, **fields):
+        """
+        Yields every archived record indexed under all of `fields`
+        (e.g. person_key="...", email="..."), oldest first.
+        """
+        if not fields:
+            raise ValueError(f"find() needs at least one of {INDEX_FIELDS}.")
+        if any(field not in INDEX_FIELDS for field in fields):
+            raise ValueError(f"Archive records are only indexed by {INDEX_FIELDS}.")
+        self.flush()
+
+        hits = None
+        for field, value in fields.items():
+            found = self._index_hits(field, value)
+            hits = found if hits is None else hits & found
+
+        blocks = {}
+        for segment, offset, length, number in sorted(hits):
+            blocks.setdefault(segment, {}).setdefault((offset, length), []).append(number)
+
+        for segment, segment_blocks in blocks.items():
+            with open(segment, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                for (offset, length), numbers in segment_blocks.items():
+                    lines = gzip.decompress(view[offset:offset + length]).splitlines()
+                    for number in numbers:
+                        yield json.loads(lines[number])
+
+    def iter_records(self):
+        """Yields every archived record in the stream, oldest segment first. For replays of a whole stream."""
+        self.flush()
+        for segment in self.segments():
+            with gzip.open(segment, "rt", encoding="utf-8") as f:
+                for line in f:
+                    yield json.loads(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Look up archived raw vendor responses.")
+    parser.add_argument("stream", help="The archive stream: propertyradar, pdl, millionverifier or neverbounce.")
+    parser.add_argument("--radar-id", help="Records for this RadarID.")
+    parser.add_argument("--person-key", help="Records for this owner.")
+    parser.add_argument("--email", help="Records for this email address.")
+    args = parser.parse_args()
+
+    lookup = {field: value for field, value in
+              (("radar_id", args.radar_id), ("person_key", args.person_key), ("email", args.email)) if value}
+    if not lookup:
+        parser.error("Give at least one of --radar-id, --person-key or --email.")
+    for found in RawArchive(args.stream).find(**lookup):
+        print(json.dumps(found, indent=2))
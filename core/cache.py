@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+def make_cache_key(data):
+    """Builds a stable cache key from any JSON-serialisable value."""
+    encoded = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """
+    A small persistent key/value cache backed by a local SQLite file.
+
+    Values are stored as JSON with a per-entry expiry. Reads refresh an entry's
+    last-access time, and once the cache grows past `max_entries` the least
+    recently used entries are evicted. Hit and miss counters are kept for the
+    lifetime of the process. Safe to share between threads.
+    """
+
+    EVICT_EVERY = 100 # Check the size bound once per this many writes
+
+    def __init__(self, path, ttl, max_entries, name="cache"):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+        with self._lock:
+            self._evict()
+
+    def get(self, key):
+        """Returns the cached value for `key`, or None if it is missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            if row[1] <= now:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        """Stores `value` under `key` for `ttl` seconds (defaults to the cache's TTL)."""
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        encoded = json.dumps(value)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, encoded, expires_at, now),
+            )
+            self._writes += 1
+            if self._writes % self.EVICT_EVERY == 0:
+                self._evict()
+
+    def delete(self, key):
+        """Removes `key` from the cache if present."""
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def _evict(self):
+        # Caller must hold the lock
+        self._conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+        count = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY last_access ASC LIMIT ?)",
+                (excess,),
+            )
+
+    def stats(self):
+        """Returns the hit/miss counters and current size."""
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "name": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+            "size": size,
+        }
@@ -0,0 +1,151 @@
+import threading
+import time
+
+import requests
+
+from config import CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT, RETRY_BUDGET_RATIO, RETRY_BUDGET_MIN_PER_SEC
+from core import metrics
+from core.logger import get_logger
+
+log = get_logger("circuit_breaker")
+
+# --- Vendor Health ---
+# When a vendor degrades, every call would otherwise wait out its full timeout
+# and every retry would pile more load onto it. Each vendor gets a circuit
+# breaker: after CIRCUIT_FAILURE_THRESHOLD failed calls in a row (timeouts,
+# dropped connections, 5xx) it opens and calls fail at once with
+# CircuitOpenError. After CIRCUIT_RESET_TIMEOUT one probe call is let through
+# (half-open); its outcome closes the circuit or opens it again. Each vendor
+# also gets a retry budget, so retries stay a bounded share of its traffic.
+# Both are per process. Workers treat an open circuit as an outage and defer
+# the owners it affects instead of failing them.
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised instead of calling a vendor whose circuit is open."""
+
+
+class CircuitBreaker:
+    """A closed / open / half-open circuit breaker for one vendor. Safe to share between threads."""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_timeout=CIRCUIT_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Returns True if a call may go ahead now. In the half-open state only one probe at a time is allowed."""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == self.OPEN:
+                if now - self._opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probe_started_at = None
+            if self.state == self.HALF_OPEN:
+                # A probe that never reported back frees its slot after another reset_timeout
+                if self._probe_started_at is not None and now - self._probe_started_at < self.reset_timeout:
+                    return False
+                self._probe_started_at = now
+            return True
+
+    def before_call(self):
+        """Raises CircuitOpenError if the call may not go ahead."""
+        if not self.allow():
+            raise CircuitOpenError(f"The {self.name} circuit is open after repeated failures. "
+                                   f"Retrying in {self.retry_in():.0f}s.")
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                log.info("Vendor recovered, circuit closed", extra={"vendor": self.name})
+                metrics.registry.set_gauge("vendor_circuit_open", 0, vendor=self.name)
+            self.state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self._failures >= self.failure_threshold):
+                if self.state == self.CLOSED:
+                    log.warning("Vendor keeps failing, circuit opened",
+                                extra={"vendor": self.name, "failures": self._failures,
+                                       "retry_in_s": self.reset_timeout})
+                    metrics.registry.set_gauge("vendor_circuit_open", 1, vendor=self.name)
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def record_status(self, status_code):
+        """Records an HTTP response: a 5xx is a failure, anything else shows the vendor is up."""
+        if status_code >= 500:
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def retry_in(self):
+        """Seconds until the next call will be let through; 0 unless the circuit is open."""
+        with self._lock:
+            if self.state != self.OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+
+class RetryBudget:
+    """
+    Caps retries at `ratio` of a vendor's calls, plus `minimum_per_second` so a
+    quiet vendor can still be retried. Every call deposits `ratio` of a retry
+    and every retry spends one, up to `capacity` saved. Safe to share between threads.
+    """
+
+    def __init__(self, name, ratio=RETRY_BUDGET_RATIO, minimum_per_second=RETRY_BUDGET_MIN_PER_SEC, capacity=10):
+        self.name = name
+        self.ratio = ratio
+        self.minimum_per_second = minimum_per_second
+        self.capacity = capacity
+        self._balance = float(capacity)
+        self._refilled_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record_call(self):
+        with self._lock:
+            self._balance = min(self.capacity, self._balance + self.ratio)
+
+    def try_spend(self):
+        """Takes one retry from the budget. Returns False, without retrying, once it is used up."""
+        with self._lock:
+            now = time.monotonic()
+            self._balance = min(self.capacity, self._balance + (now - self._refilled_at) * self.minimum_per_second)
+            self._refilled_at = now
+            if self._balance >= 1:
+                self._balance -= 1
+                return True
+        metrics.registry.inc("vendor_retry_budget_exhausted_total", vendor=self.name)
+        return False
+
+
+_breakers = {}
+_budgets = {}
+_registry_lock = threading.Lock()
+
+
+def vendor_breaker(vendor):
+    """Returns the circuit breaker for `vendor`, creating it on first use."""
+    with _registry_lock:
+        if vendor not in _breakers:
+            _breakers[vendor] = CircuitBreaker(vendor)
+        return _breakers[vendor]
+
+
+def vendor_retry_budget(vendor):
+    """Returns the retry budget for `vendor`, creating it on first use."""
+    with _registry_lock:
+        if vendor not in _budgets:
+            _budgets[vendor] = RetryBudget(vendor)
+        return _budgets[vendor]
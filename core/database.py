@@ -1,14 +1,34 @@
-from supabase import create_client, Client
-from config import SUPABASE_URL, SUPABASE_KEY
+from config import SUPABASE_URL, SUPABASE_KEY, STORAGE_BACKEND, SQLITE_DATABASE_PATH
+from core.storage.base import InstrumentedStorage
+from core.logger import get_logger
 
-# Initialize Supabase client
-# The 'if' statement handles cases where credentials might be missing
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY) if SUPABASE_URL and SUPABASE_KEY else None
+log = get_logger("database")
+
+
+def create_storage(backend=STORAGE_BACKEND):
+    """
+    Builds the storage backend named in STORAGE_BACKEND ("supabase" or "sqlite").
+    Returns None if the Supabase credentials are missing.
+    """
+    if backend == "sqlite":
+        from core.storage.sqlite_backend import SQLiteStorage
+        return InstrumentedStorage(SQLiteStorage(SQLITE_DATABASE_PATH))
+    if backend != "supabase":
+        raise ValueError(f"Unknown STORAGE_BACKEND '{backend}'. Use 'supabase' or 'sqlite'.")
+    # The 'if' statement handles cases where credentials might be missing
+    if not (SUPABASE_URL and SUPABASE_KEY):
+        return None
+    from core.storage.supabase_backend import SupabaseStorage
+    return InstrumentedStorage(SupabaseStorage.connect(SUPABASE_URL, SUPABASE_KEY))
+
+
+# Initialize the storage backend shared by every worker
+storage = create_storage()
 
 def check_db_connection():
-    """Checks if the Supabase client was successfully initialized."""
-    if not supabase:
-        print("FATAL ERROR: Supabase URL or Key is missing. Cannot connect to the database.")
+    """Checks if the storage backend was successfully initialized."""
+    if not storage:
+        log.critical("Supabase URL or Key is missing. Cannot connect to the database.")
         return False
-    print("Database client initialized successfully.")
-    return True
\ No newline at end of file
+    log.info("Database client initialized successfully.", extra={"backend": storage.name})
+    return True
@@ -0,0 +1,77 @@
+import json
+import logging
+import sys
+import threading
+from datetime import datetime, timezone
+
+from config import LOG_LEVEL, LOG_FORMAT
+
+# --- Structured Logging ---
+# Every module logs through `get_logger(name)` instead of `print`. Context goes
+# in `extra` (e.g. `log.info("Enriching owner", extra={"person_key": key})`),
+# so it can be filtered on rather than parsed out of the message. With
+# LOG_FORMAT="json" each line is one JSON object; the default "text" format
+# appends the fields as key=value pairs. Only the pipeline's own loggers
+# (under "fency.") are configured, so chatty libraries keep their defaults.
+
+ROOT_LOGGER = "fency"
+
+# Attributes every LogRecord has; anything else on a record came from `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+_configured = False
+_configure_lock = threading.Lock()
+
+
+def _fields(record):
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, message and any `extra` fields."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(_fields(record))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines with the `extra` fields appended as key=value pairs."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s: %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        fields = _fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+def _configure():
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+        root = logging.getLogger(ROOT_LOGGER)
+        root.addHandler(handler)
+        root.setLevel(LOG_LEVEL.upper())
+        root.propagate = False
+        _configured = True
+
+
+def get_logger(name):
+    """Returns the pipeline logger for `name` (e.g. "ingest"), configuring output on first use."""
+    _configure()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
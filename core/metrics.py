@@ -0,0 +1,235 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import METRICS_PORT, METRICS_SNAPSHOT_PATH, METRICS_SNAPSHOT_INTERVAL, METRICS_COLLECT_INTERVAL
+from core.logger import get_logger
+
+log = get_logger("metrics")
+
+# --- Metrics ---
+# A small in-process registry of counters, gauges and histograms. The API
+# clients record every vendor call here (latency, status, retries, 429s), the
+# database call sites time their queries, and the workers count the records
+# each stage processes. `start_exporter()` publishes the registry as a
+# Prometheus text endpoint (METRICS_PORT, at /metrics, with a JSON view at
+# /metrics.json) and/or a JSON snapshot file rewritten every
+# METRICS_SNAPSHOT_INTERVAL seconds. Each process keeps its own metrics.
+
+# Upper bounds, in seconds, of the call latency histogram buckets
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+METRICS = {
+    "vendor_request_seconds": ("histogram", "Latency of each vendor API attempt, retries included."),
+    "vendor_requests_total": ("counter", "Vendor API attempts by HTTP status (or exception name)."),
+    "vendor_retries_total": ("counter", "Vendor API attempts that were retried, by reason."),
+    "vendor_throttled_total": ("counter", "Vendor API attempts rejected with 429 or a throttle error."),
+    "vendor_errors_total": ("counter", "Vendor API attempts that failed with a 5xx or a transport error."),
+    "database_call_seconds": ("histogram", "Latency of each database call, by operation."),
+    "database_errors_total": ("counter", "Database calls that raised, by operation."),
+    "records_processed_total": ("counter", "Records finished by each pipeline stage, by outcome."),
+    "owners_queue_depth": ("gauge", "Owners currently in each processing_status."),
+    "rate_limit_wait_seconds_total": ("counter", "Seconds spent waiting on the shared vendor limiter, by reason."),
+    "vendor_requests_today": ("gauge", "Vendor requests made today by every process on this host."),
+    "vendor_credits_used": ("gauge", "Vendor credits spent today by every process on this host."),
+    "vendor_credits_remaining": ("gauge", "Vendor credits left in today's budget, for vendors with a budget."),
+    "vendor_circuit_open": ("gauge", "1 while a vendor's circuit breaker is open, else 0."),
+    "vendor_retry_budget_exhausted_total": ("counter", "Retries skipped because the vendor's retry budget was used up."),
+}
+
+
+class MetricsRegistry:
+    """Thread-safe counters, gauges and fixed-bucket histograms keyed by name and labels."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def inc(self, name, amount=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[self._key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {"buckets": [0] * len(self.buckets), "count": 0, "sum": 0.0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram["buckets"][index] += 1
+                    break
+            histogram["count"] += 1
+            histogram["sum"] += value
+
+    def snapshot(self):
+        """Returns every metric as plain JSON-serialisable data."""
+        def entry(labels, **values):
+            return {"labels": dict(labels), **values}
+
+        with self._lock:
+            counters = [(name, entry(labels, value=value)) for (name, labels), value in self._counters.items()]
+            gauges = [(name, entry(labels, value=value)) for (name, labels), value in self._gauges.items()]
+            histograms = [(name, entry(labels, count=h["count"], sum=round(h["sum"], 6),
+                                       buckets=dict(zip(map(str, self.buckets), h["buckets"]))))
+                          for (name, labels), h in self._histograms.items()]
+
+        metrics = {}
+        for name, value in counters + gauges + histograms:
+            metrics.setdefault(name, []).append(value)
+        return {"timestamp": time.time(), "metrics": metrics}
+
+    def render_prometheus(self):
+        """Renders every metric in the Prometheus text exposition format."""
+        def label_text(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            escaped = (value.replace("\\", "\\\\").replace('"', '\\"') for _, value in pairs)
+            return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+        with self._lock:
+            series = {}
+            for (name, labels), value in self._counters.items():
+                series.setdefault(name, []).append(f"{name}{label_text(labels)} {value}")
+            for (name, labels), value in self._gauges.items():
+                series.setdefault(name, []).append(f"{name}{label_text(labels)} {value}")
+            for (name, labels), histogram in self._histograms.items():
+                lines = series.setdefault(name, [])
+                cumulative = 0
+                for bound, count in zip(self.buckets, histogram["buckets"]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{label_text(labels, [('le', str(bound))])} {cumulative}")
+                lines.append(f"{name}_bucket{label_text(labels, [('le', '+Inf')])} {histogram['count']}")
+                lines.append(f"{name}_sum{label_text(labels)} {histogram['sum']}")
+                lines.append(f"{name}_count{label_text(labels)} {histogram['count']}")
+
+        output = []
+        for name in sorted(series):
+            metric_type, help_text = METRICS.get(name, ("untyped", ""))
+            output.append(f"# HELP {name} {help_text}")
+            output.append(f"# TYPE {name} {metric_type}")
+            output.extend(series[name])
+        return "\n".join(output) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def observe_vendor_call(vendor, seconds, status):
+    """
+    Records one vendor API attempt. `status` is the HTTP status code, "ok" for
+    an SDK call that returned, or the exception name for a failed attempt.
+    """
+    registry.observe("vendor_request_seconds", seconds, vendor=vendor)
+    registry.inc("vendor_requests_total", vendor=vendor, status=status)
+    if status == 429:
+        registry.inc("vendor_throttled_total", vendor=vendor)
+    elif not isinstance(status, int) and status != "ok" or isinstance(status, int) and status >= 500:
+        registry.inc("vendor_errors_total", vendor=vendor)
+
+
+def record_retry(vendor, reason):
+    registry.inc("vendor_retries_total", vendor=vendor, reason=reason)
+
+
+def record_processed(stage, outcome, amount=1):
+    registry.inc("records_processed_total", amount, stage=stage, outcome=outcome)
+
+
+@contextmanager
+def time_database(operation):
+    """Times a database call, counting it as an error if it raises."""
+    started_at = time.monotonic()
+    try:
+        yield
+    except Exception:
+        registry.inc("database_errors_total", operation=operation)
+        raise
+    finally:
+        registry.observe("database_call_seconds", time.monotonic() - started_at, operation=operation)
+
+
+# --- Exporters ---
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body, content_type = json.dumps(registry.snapshot()).encode("utf-8"), "application/json"
+        elif self.path.startswith("/metrics"):
+            body, content_type = registry.render_prometheus().encode("utf-8"), "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def write_snapshot(path=METRICS_SNAPSHOT_PATH):
+    """Writes the current metrics to `path` as JSON, replacing the previous snapshot atomically."""
+    if not path:
+        return
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(registry.snapshot(), f)
+    os.replace(tmp_path, path)
+
+
+def _run_periodically(interval, func):
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                func()
+            except Exception as e:
+                log.warning("Metrics background task failed", extra={"task": func.__name__, "error": str(e)})
+    threading.Thread(target=loop, name=f"metrics-{func.__name__}", daemon=True).start()
+
+
+def start_exporter(collectors=()):
+    """
+    Starts whichever exporters are configured: the HTTP endpoint on METRICS_PORT
+    and the periodic snapshot file at METRICS_SNAPSHOT_PATH. `collectors` are
+    callables that refresh sampled gauges (e.g. queue depth); they run every
+    METRICS_COLLECT_INTERVAL seconds while an exporter is on. Returns True if
+    anything was started.
+    """
+    if not METRICS_PORT and not METRICS_SNAPSHOT_PATH:
+        return False
+
+    for collector in collectors:
+        _run_periodically(METRICS_COLLECT_INTERVAL, collector)
+    if METRICS_PORT:
+        server = ThreadingHTTPServer(("0.0.0.0", METRICS_PORT), _MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        log.info("Serving metrics", extra={"port": METRICS_PORT, "paths": "/metrics,/metrics.json"})
+    if METRICS_SNAPSHOT_PATH:
+        _run_periodically(METRICS_SNAPSHOT_INTERVAL, write_snapshot)
+        log.info("Writing metrics snapshots", extra={"path": METRICS_SNAPSHOT_PATH,
+                                                     "interval_s": METRICS_SNAPSHOT_INTERVAL})
+    return True
@@ -0,0 +1,306 @@
+import asyncio
+import fcntl
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from config import (RATE_LIMIT_DIR, PROPERTY_RADAR_RATE_PER_SEC, PROPERTY_RADAR_BURST, PROPERTY_RADAR_DAILY_CREDITS,
+                    PDL_RATE_PER_SEC, PDL_BURST, PDL_DAILY_CREDITS, MILLIONVERIFIER_RATE_PER_SEC,
+                    MILLIONVERIFIER_BURST, MILLIONVERIFIER_DAILY_CREDITS, NEVERBOUNCE_RATE_PER_SEC,
+                    NEVERBOUNCE_BURST, NEVERBOUNCE_DAILY_CREDITS)
+from core import metrics
+from core.logger import get_logger
+
+log = get_logger("rate_limiter")
+
+
+class TokenBucket:
+    """
+    A thread-safe token-bucket rate limiter.
+
+    Tokens refill continuously at `rate` per second up to `capacity` (the burst
+    size). Every API call takes one token with `acquire()`, blocking until one
+    is available, so any number of threads can share one vendor quota.
+    """
+
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError("TokenBucket rate must be positive.")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity else max(1, rate))
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._last_refill = now
+
+    def try_acquire(self, tokens=1):
+        """Takes `tokens` if they are available right now. Returns True on success."""
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1):
+        """Blocks until `tokens` are available, then takes them."""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+
+# --- Shared Vendor Limits ---
+# TokenBucket only paces the threads of one process. Every vendor call made
+# through core/api_clients instead takes from a SharedRateLimiter, whose state
+# lives in a small file per vendor (RATE_LIMIT_DIR/<vendor>.json) that every
+# process on the host updates under an exclusive file lock. So the rate, burst
+# and daily credit budget hold for all workers together, and the file doubles
+# as a live usage counter (`python -m core.rate_limiter` prints it).
+
+# Longest single sleep while waiting, so a paused worker re-checks the shared state regularly
+MAX_WAIT_SECONDS = 60
+
+VENDOR_LIMITS = {
+    # vendor: (requests per second, burst, credits per UTC day)
+    "propertyradar": (PROPERTY_RADAR_RATE_PER_SEC, PROPERTY_RADAR_BURST, PROPERTY_RADAR_DAILY_CREDITS),
+    "pdl": (PDL_RATE_PER_SEC, PDL_BURST, PDL_DAILY_CREDITS),
+    "millionverifier": (MILLIONVERIFIER_RATE_PER_SEC, MILLIONVERIFIER_BURST, MILLIONVERIFIER_DAILY_CREDITS),
+    "neverbounce": (NEVERBOUNCE_RATE_PER_SEC, NEVERBOUNCE_BURST, NEVERBOUNCE_DAILY_CREDITS),
+}
+
+
+def _seconds_until_tomorrow(now):
+    tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (tomorrow - now).total_seconds()
+
+
+class SharedRateLimiter:
+    """
+    A token bucket and daily credit budget for one vendor, shared by every
+    process on the host through a locked state file.
+
+    Every request takes one token; tokens refill at `rate` per second up to
+    `burst` (a rate of 0 means unlimited). A request also spends `credits` from
+    the `daily_credits` budget (0 means unlimited), which resets at midnight UTC.
+    Once the budget is spent, `acquire()` pauses the caller until it resets
+    rather than letting the request through. Safe to share between threads.
+    """
+
+    def __init__(self, vendor, rate, burst=None, daily_credits=0, directory=RATE_LIMIT_DIR):
+        self.vendor = vendor
+        self.rate = float(rate)
+        self.burst = float(burst if burst else max(1, self.rate))
+        self.daily_credits = int(daily_credits)
+        self.path = os.path.join(directory, f"{vendor}.json")
+        self._file = None
+        self._lock = threading.Lock()
+
+    def _open(self):
+        # Caller must hold the lock
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "a+")
+        return self._file
+
+    def _update(self, change):
+        """Runs `change(state, now)` on the shared state under the file lock and saves it. Returns its result."""
+        with self._lock:
+            f = self._open()
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                content = f.read()
+                state = json.loads(content) if content.strip() else {}
+                now = datetime.now(timezone.utc)
+                today = now.strftime("%Y-%m-%d")
+                if state.get("day") != today:
+                    state.update({"day": today, "credits_used": 0, "requests": 0})
+                result = change(state, now)
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state))
+                f.flush()
+                return result
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _take(self, credits):
+        """Takes a token and `credits` if both are available. Returns (None, 0), or the reason and seconds to wait."""
+        def change(state, now):
+            if self.daily_credits and state["credits_used"] + credits > self.daily_credits:
+                return "budget", _seconds_until_tomorrow(now)
+            if self.rate > 0:
+                timestamp = now.timestamp()
+                elapsed = max(0.0, timestamp - state.get("refilled_at", timestamp))
+                tokens = min(self.burst, state.get("tokens", self.burst) + elapsed * self.rate)
+                state["refilled_at"] = timestamp
+                if tokens < 1:
+                    state["tokens"] = tokens
+                    return "rate", (1 - tokens) / self.rate
+                state["tokens"] = tokens - 1
+            state["credits_used"] += credits
+            state["requests"] += 1
+            return None, 0
+        return self._update(change)
+
+    def _check(self, credits):
+        if self.daily_credits and credits > self.daily_credits:
+            raise ValueError(f"A {self.vendor} request for {credits} credits can never fit the daily budget "
+                             f"of {self.daily_credits}. Send smaller batches.")
+
+    def _on_wait(self, reason, wait, paused):
+        metrics.registry.inc("rate_limit_wait_seconds_total", wait, vendor=self.vendor, reason=reason)
+        if reason == "budget" and not paused:
+            log.warning("Daily credit budget used up. Pausing until it resets.",
+                        extra={"vendor": self.vendor, "daily_credits": self.daily_credits,
+                               "resumes_in_s": round(wait)})
+
+    def acquire(self, credits=1):
+        """Blocks until a request spending `credits` is allowed, then records it."""
+        self._check(credits)
+        paused = False
+        while True:
+            reason, wait = self._take(credits)
+            if reason is None:
+                return
+            wait = min(wait, MAX_WAIT_SECONDS)
+            self._on_wait(reason, wait, paused)
+            paused = paused or reason == "budget"
+            time.sleep(wait)
+
+    async def acquire_async(self, credits=1):
+        """`acquire()` for coroutines: waits with `asyncio.sleep` so the event loop keeps running."""
+        self._check(credits)
+        paused = False
+        while True:
+            reason, wait = self._take(credits)
+            if reason is None:
+                return
+            wait = min(wait, MAX_WAIT_SECONDS)
+            self._on_wait(reason, wait, paused)
+            paused = paused or reason == "budget"
+            await asyncio.sleep(wait)
+
+    def credits_available(self):
+        """
+        Credits that can still be spent today without pausing for the budget to
+        reset, or None without a budget. Bulk callers size their batches to fit
+        it, since a batch bigger than the budget could never be let through.
+        """
+        if not self.daily_credits:
+            return None
+        return self.usage()["credits_remaining"]
+
+    def budget_resets_in(self):
+        """Seconds until the daily budget resets if it is used up; 0 while credits remain or without a budget."""
+        if self.credits_available() != 0:
+            return 0.0
+        return _seconds_until_tomorrow(datetime.now(timezone.utc))
+
+    def usage(self):
+        """Returns today's host-wide usage: requests, credits used and, with a budget, credits remaining."""
+        state = self._update(lambda state, now: dict(state))
+        usage = {"vendor": self.vendor, "day": state["day"], "requests": state["requests"],
+                 "credits_used": state["credits_used"], "daily_credits": self.daily_credits or None}
+        if self.daily_credits:
+            usage["credits_remaining"] = max(0, self.daily_credits - state["credits_used"])
+        return usage
+
+
+_vendor_limiters = {}
+_vendor_limiters_lock = threading.Lock()
+
+
+def vendor_limiter(vendor):
+    """Returns the shared limiter for `vendor` from VENDOR_LIMITS, or None for a vendor without limits."""
+    with _vendor_limiters_lock:
+        if vendor not in _vendor_limiters and vendor in VENDOR_LIMITS:
+            rate, burst, daily_credits = VENDOR_LIMITS[vendor]
+            _vendor_limiters[vendor] = SharedRateLimiter(vendor, rate, burst, daily_credits)
+        return _vendor_limiters.get(vendor)
+
+
+def record_usage():
+    """Samples every vendor's host-wide usage for today into the `vendor_credits_*` gauges."""
+    for vendor in VENDOR_LIMITS:
+        usage = vendor_limiter(vendor).usage()
+        metrics.registry.set_gauge("vendor_requests_today", usage["requests"], vendor=vendor)
+        metrics.registry.set_gauge("vendor_credits_used", usage["credits_used"], vendor=vendor)
+        if "credits_remaining" in usage:
+            metrics.registry.set_gauge("vendor_credits_remaining", usage["credits_remaining"], vendor=vendor)
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    An asyncio concurrency limit that adapts to the vendor's feedback (AIMD).
+
+    Use it as `async with limiter:` around each request. The limit grows by one
+    after a full window of successful calls and is halved on every throttled
+    response (429). A low rate-limit-remaining header also caps the limit so we
+    slow down before the vendor starts rejecting requests.
+    """
+
+    def __init__(self, initial, minimum=1, maximum=None):
+        self.minimum = max(1, minimum)
+        self.maximum = maximum or initial
+        self.limit = min(max(initial, self.minimum), self.maximum)
+        self._in_flight = 0
+        self._successes = 0
+        self._condition = None
+        self._loop = None
+
+    def _get_condition(self):
+        # Created lazily so the limiter can be built outside the running event loop, and again for
+        # each new loop, since the worker keeps one limiter across batches that each run their own loop
+        loop = asyncio.get_running_loop()
+        if self._condition is None or self._loop is not loop:
+            self._condition = asyncio.Condition()
+            self._loop = loop
+        return self._condition
+
+    async def __aenter__(self):
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        condition = self._get_condition()
+        async with condition:
+            self._in_flight -= 1
+            condition.notify_all()
+
+    def on_success(self, rate_limit_remaining=None):
+        """Records a successful call; grows the limit by one after `limit` successes in a row."""
+        if rate_limit_remaining is not None and rate_limit_remaining < self.limit:
+            self.limit = max(self.minimum, rate_limit_remaining)
+            self._successes = 0
+            return
+        self._successes += 1
+        if self._successes >= self.limit and self.limit < self.maximum:
+            self.limit += 1
+            self._successes = 0
+
+    def on_throttle(self):
+        """Records a throttled call (429); halves the limit."""
+        self.limit = max(self.minimum, self.limit // 2)
+        self._successes = 0
+
+
+if __name__ == "__main__":
+    for vendor in VENDOR_LIMITS:
+        print(json.dumps(vendor_limiter(vendor).usage()))
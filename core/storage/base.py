@@ -0,0 +1,119 @@
+import abc
+import functools
+
+from core import metrics
+
+# --- Storage Interface ---
+# Every database operation the workers perform goes through a StorageBackend,
+# so the pipeline is not tied to one database. `core.database.storage` holds the
+# backend selected by STORAGE_BACKEND: Supabase (the hosted project, through
+# PostgREST and the functions in migrations/) or SQLite (a local file, for
+# single-host runs, development and benchmarks).
+
+PRIMARY_KEYS = {"properties": "radar_id", "owners": "person_key", "verification_results": "result_key",
+                "verification_jobs": "job_email_key"}
+
+# Columns apply_owner_updates() copies from each update (see migrations/002_apply_owner_updates.sql)
+RESULT_COLUMNS = ("processing_status", "enriched_emails", "millionverifier_response", "neverbounce_response",
+                  "millionverifier_status", "neverbounce_status")
+
+# Columns upsert_owners() writes: what the ingest worker knows about an owner (see migrations/006_upsert_owners.sql)
+OWNER_COLUMNS = ("person_key", "radar_id", "radar_ids", "first_name", "last_name", "entity_name", "person_type",
+                 "age", "gender", "occupation", "is_primary_contact", "ownership_role", "is_primary_residence",
+                 "original_phone", "original_email", "processing_status", "mail_street_address", "mail_city",
+                 "mail_state", "mail_zip_code")
+
+
+class StorageBackend(abc.ABC):
+    """
+    The operations the workers use. Rows are plain dicts keyed by column name;
+    `table` is one of the tables in PRIMARY_KEYS.
+    """
+
+    name = None
+
+    @abc.abstractmethod
+    def upsert(self, table, records):
+        """Inserts or updates `records` by primary key in one call. Columns a record omits keep their value."""
+
+    @abc.abstractmethod
+    def upsert_owners(self, records, statuses):
+        """
+        Writes the OWNER_COLUMNS of owner `records` in one call: owners that do
+        not exist yet are inserted, existing ones are only rewritten while their
+        processing_status is in `statuses`. Returns the set of person_keys written.
+        """
+
+    @abc.abstractmethod
+    def fetch(self, table, keys, columns):
+        """Returns the rows of `table` whose primary key is in `keys`, limited to `columns`."""
+
+    @abc.abstractmethod
+    def update(self, table, keys, data):
+        """Sets the columns in `data` on every row of `table` whose primary key is in `keys`."""
+
+    @abc.abstractmethod
+    def scan(self, table, columns, after_key=None, limit=500, not_null=None):
+        """
+        Returns up to `limit` rows of `table` in primary key order, starting after
+        `after_key`. With `not_null`, only rows where that column is set.
+        """
+
+    @abc.abstractmethod
+    def claim_owners(self, statuses, worker_id, limit, lease_seconds):
+        """
+        Atomically leases up to `limit` owners in one of `statuses` to `worker_id`,
+        skipping rows leased to other workers and reclaiming expired leases.
+        Returns the claimed rows.
+        """
+
+    @abc.abstractmethod
+    def update_owner(self, person_key, data, claimed_by=None, expected_status=None):
+        """
+        Updates one owner, but only while it is leased to `claimed_by` and/or
+        still in `expected_status` (whichever are given). Returns True if the
+        row matched and was written.
+        """
+
+    @abc.abstractmethod
+    def extend_leases(self, worker_id, person_keys, lease_seconds):
+        """
+        Pushes the leases `worker_id` holds on `person_keys` out to `lease_seconds`
+        from now, so no worker claims those owners again before then.
+        """
+
+    @abc.abstractmethod
+    def apply_owner_updates(self, worker_id, updates):
+        """
+        Applies a batch of results. Each update has a person_key, the
+        expected_status it was computed from and any of RESULT_COLUMNS. With a
+        `worker_id` a row is only written while that worker holds its lease;
+        with None, only while it is still in expected_status. Leases are
+        released. Returns the set of person_keys that were written.
+        """
+
+    @abc.abstractmethod
+    def attach_owner_radar_ids(self, links):
+        """Adds RadarIDs to owners' radar_ids. `links` is a list of {"person_key", "radar_ids"}."""
+
+    @abc.abstractmethod
+    def count_owners_by_status(self, statuses):
+        """Returns {status: number of owners in that processing_status}."""
+
+
+class InstrumentedStorage:
+    """Wraps a backend so every public call is timed in core.metrics under its method name."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def __getattr__(self, attribute):
+        value = getattr(self.backend, attribute)
+        if attribute.startswith("_") or not callable(value):
+            return value
+
+        @functools.wraps(value)
+        def timed(*args, **kwargs):
+            with metrics.time_database(attribute):
+                return value(*args, **kwargs)
+        return timed
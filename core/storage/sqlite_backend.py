@@ -0,0 +1,283 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from core.storage.base import StorageBackend, PRIMARY_KEYS, RESULT_COLUMNS, OWNER_COLUMNS
+
+# Mirrors the Supabase tables, including the columns added in migrations/.
+# List columns (radar_ids, enriched_emails) are stored as JSON text and leases
+# as epoch seconds. Columns a record brings that are not here are added on first use.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS properties (
+    radar_id TEXT PRIMARY KEY,
+    address TEXT, city TEXT, state TEXT, zip_code TEXT, county TEXT,
+    latitude REAL, longitude REAL,
+    last_transfer_rec_date TEXT, last_transfer_type TEXT, last_transfer_value REAL,
+    ptype TEXT, advanced_type TEXT, beds REAL, baths REAL, sqft REAL, lot_size_acres REAL, year_built INTEGER,
+    has_pool INTEGER, avm REAL, available_equity REAL,
+    is_same_mailing INTEGER, in_foreclosure INTEGER, in_tax_delinquency INTEGER, is_listed_for_sale INTEGER,
+    last_fetched_at TEXT,
+    content_hash TEXT
+);
+
+CREATE TABLE IF NOT EXISTS owners (
+    person_key TEXT PRIMARY KEY,
+    radar_id TEXT,
+    radar_ids TEXT,
+    first_name TEXT, last_name TEXT, entity_name TEXT, person_type TEXT,
+    age INTEGER, gender TEXT, occupation TEXT,
+    is_primary_contact INTEGER, ownership_role TEXT, is_primary_residence INTEGER,
+    original_phone TEXT, original_email TEXT,
+    mail_street_address TEXT, mail_city TEXT, mail_state TEXT, mail_zip_code TEXT,
+    processing_status TEXT,
+    enriched_emails TEXT,
+    millionverifier_response TEXT, neverbounce_response TEXT,
+    millionverifier_status TEXT, neverbounce_status TEXT,
+    claimed_by TEXT,
+    lease_expires_at REAL
+);
+
+CREATE TABLE IF NOT EXISTS verification_results (
+    result_key TEXT PRIMARY KEY,
+    person_key TEXT,
+    email TEXT,
+    vendor TEXT,
+    verdict TEXT,
+    sub_status TEXT,
+    cached INTEGER,
+    checked_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS verification_jobs (
+    job_email_key TEXT PRIMARY KEY,
+    vendor TEXT,
+    email TEXT,
+    job_id TEXT,
+    submitted_at TEXT,
+    settled_at TEXT
+);
+
+CREATE INDEX IF NOT EXISTS owners_status_lease_idx ON owners (processing_status, lease_expires_at);
+CREATE INDEX IF NOT EXISTS owners_claimed_by_idx ON owners (claimed_by);
+CREATE INDEX IF NOT EXISTS owners_radar_id_idx ON owners (radar_id);
+CREATE INDEX IF NOT EXISTS properties_radar_id_fetched_idx ON properties (radar_id, last_fetched_at);
+CREATE INDEX IF NOT EXISTS verification_results_person_key_idx ON verification_results (person_key);
+CREATE INDEX IF NOT EXISTS verification_results_email_idx ON verification_results (email);
+"""
+
+JSON_COLUMNS = {"radar_ids", "enriched_emails"}
+
+# SQLite caps the number of bound parameters per statement
+MAX_PARAMETERS = 900
+
+
+def _quote(identifier):
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _encode(value):
+    return json.dumps(value) if isinstance(value, (list, dict)) else value
+
+
+class SQLiteStorage(StorageBackend):
+    """
+    Storage in a local SQLite file in WAL mode, so readers never block the
+    writer. Lease and bulk operations run in `BEGIN IMMEDIATE` transactions,
+    which makes claims atomic across every worker process on the host that
+    opens the same file. Safe to share between threads.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._columns = {table: self._table_columns(table) for table in PRIMARY_KEYS}
+
+    # --- Internals (caller holds the lock) ---
+
+    def _table_columns(self, table):
+        return {row["name"] for row in self._conn.execute(f"PRAGMA table_info({_quote(table)})")}
+
+    def _ensure_columns(self, table, columns):
+        for column in columns:
+            if column not in self._columns[table]:
+                self._conn.execute(f"ALTER TABLE {_quote(table)} ADD COLUMN {_quote(column)}")
+                self._columns[table].add(column)
+
+    @contextmanager
+    def _transaction(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _decode(self, row):
+        record = dict(row)
+        for column in JSON_COLUMNS.intersection(record):
+            if record[column] is not None:
+                record[column] = json.loads(record[column])
+        return record
+
+    def _select(self, table, keys, columns="*"):
+        rows = []
+        keys = list(keys)
+        for start in range(0, len(keys), MAX_PARAMETERS):
+            chunk = keys[start:start + MAX_PARAMETERS]
+            placeholders = ", ".join("?" * len(chunk))
+            rows.extend(self._conn.execute(
+                f"SELECT {columns} FROM {_quote(table)} WHERE {_quote(PRIMARY_KEYS[table])} IN ({placeholders})",
+                chunk))
+        return [self._decode(row) for row in rows]
+
+    def _update(self, table, key, data, conditions=()):
+        """Updates one row by primary key, with extra (column, value) equality conditions. Returns True if it matched."""
+        assignments = ", ".join(f"{_quote(column)} = ?" for column in data)
+        where = " AND ".join(f"{_quote(column)} = ?" for column, _ in [(PRIMARY_KEYS[table], key), *conditions])
+        cursor = self._conn.execute(
+            f"UPDATE {_quote(table)} SET {assignments} WHERE {where}",
+            [_encode(value) for value in data.values()] + [key] + [value for _, value in conditions])
+        return cursor.rowcount > 0
+
+    # --- StorageBackend ---
+
+    def upsert(self, table, records):
+        if not records:
+            return
+        key_column = PRIMARY_KEYS[table]
+        # Records with the same columns share one statement
+        groups = {}
+        for record in records:
+            groups.setdefault(tuple(record), []).append(record)
+        with self._lock, self._transaction():
+            for columns, group in groups.items():
+                self._ensure_columns(table, columns)
+                updates = [column for column in columns if column != key_column]
+                sql = (f"INSERT INTO {_quote(table)} ({', '.join(map(_quote, columns))}) "
+                       f"VALUES ({', '.join('?' * len(columns))}) "
+                       f"ON CONFLICT({_quote(key_column)}) DO ")
+                sql += ("UPDATE SET " + ", ".join(f"{_quote(c)} = excluded.{_quote(c)}" for c in updates)
+                        if updates else "NOTHING")
+                self._conn.executemany(sql, [[_encode(record[column]) for column in columns] for record in group])
+
+    def upsert_owners(self, records, statuses):
+        statuses = list(statuses)
+        written = set()
+        with self._lock, self._transaction():
+            for record in records:
+                columns = [column for column in OWNER_COLUMNS if column in record]
+                updates = [column for column in columns if column != "person_key"]
+                cursor = self._conn.execute(
+                    f"INSERT INTO owners ({', '.join(map(_quote, columns))}) VALUES ({', '.join('?' * len(columns))})"
+                    f" ON CONFLICT(person_key) DO UPDATE SET"
+                    f" {', '.join(f'{_quote(c)} = excluded.{_quote(c)}' for c in updates)}"
+                    f" WHERE owners.processing_status IN ({', '.join('?' * len(statuses))})",
+                    [_encode(record[column]) for column in columns] + statuses)
+                if cursor.rowcount > 0:
+                    written.add(record["person_key"])
+        return written
+
+    def fetch(self, table, keys, columns):
+        with self._lock:
+            return self._select(table, keys, ", ".join(map(_quote, columns)))
+
+    def update(self, table, keys, data):
+        with self._lock, self._transaction():
+            self._ensure_columns(table, data)
+            for key in keys:
+                self._update(table, key, data)
+
+    def scan(self, table, columns, after_key=None, limit=500, not_null=None):
+        key_column = _quote(PRIMARY_KEYS[table])
+        conditions, parameters = [], []
+        if after_key is not None:
+            conditions.append(f"{key_column} > ?")
+            parameters.append(after_key)
+        if not_null is not None:
+            conditions.append(f"{_quote(not_null)} IS NOT NULL")
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(map(_quote, columns))} FROM {_quote(table)}{where} ORDER BY {key_column} LIMIT ?",
+                [*parameters, limit]).fetchall()
+        return [self._decode(row) for row in rows]
+
+    def claim_owners(self, statuses, worker_id, limit, lease_seconds):
+        statuses = list(statuses)
+        now = time.time()
+        with self._lock, self._transaction():
+            keys = [row["person_key"] for row in self._conn.execute(
+                f"SELECT person_key FROM owners"
+                f" WHERE processing_status IN ({', '.join('?' * len(statuses))})"
+                f" AND (lease_expires_at IS NULL OR lease_expires_at < ?)"
+                f" ORDER BY lease_expires_at LIMIT ?",
+                [*statuses, now, limit])]
+            self._conn.executemany(
+                "UPDATE owners SET claimed_by = ?, lease_expires_at = ? WHERE person_key = ?",
+                [(worker_id, now + lease_seconds, key) for key in keys])
+            return self._select("owners", keys)
+
+    def update_owner(self, person_key, data, claimed_by=None, expected_status=None):
+        conditions = []
+        if claimed_by is not None:
+            conditions.append(("claimed_by", claimed_by))
+        if expected_status is not None:
+            conditions.append(("processing_status", expected_status))
+        with self._lock, self._transaction():
+            self._ensure_columns("owners", data)
+            return self._update("owners", person_key, data, conditions)
+
+    def extend_leases(self, worker_id, person_keys, lease_seconds):
+        expires_at = time.time() + lease_seconds
+        with self._lock, self._transaction():
+            for person_key in person_keys:
+                self._update("owners", person_key, {"lease_expires_at": expires_at}, [("claimed_by", worker_id)])
+
+    def apply_owner_updates(self, worker_id, updates):
+        applied = set()
+        with self._lock, self._transaction():
+            for item in updates:
+                data = {column: item[column] for column in RESULT_COLUMNS if column in item}
+                data.update({"claimed_by": None, "lease_expires_at": None})
+                if worker_id is not None:
+                    condition = ("claimed_by", worker_id)
+                else:
+                    condition = ("processing_status", item.get("expected_status"))
+                if self._update("owners", item["person_key"], data, [condition]):
+                    applied.add(item["person_key"])
+        return applied
+
+    def attach_owner_radar_ids(self, links):
+        with self._lock, self._transaction():
+            current = {row["person_key"]: row["radar_ids"] or []
+                       for row in self._select("owners", [link["person_key"] for link in links], "person_key, radar_ids")}
+            for link in links:
+                if link["person_key"] in current:
+                    radar_ids = sorted(set(current[link["person_key"]]) | set(link["radar_ids"]))
+                    self._update("owners", link["person_key"], {"radar_ids": radar_ids})
+
+    def count_owners_by_status(self, statuses):
+        statuses = list(statuses)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT processing_status, COUNT(*) AS owners FROM owners"
+                f" WHERE processing_status IN ({', '.join('?' * len(statuses))})"
+                f" GROUP BY processing_status",
+                statuses).fetchall()
+        counts = dict.fromkeys(statuses, 0)
+        counts.update({row["processing_status"]: row["owners"] for row in rows})
+        return counts
@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta, timezone
+
+from supabase import create_client
+
+from core.storage.base import StorageBackend, PRIMARY_KEYS
+
+# Keeps PostgREST query strings a sane length for `in` filters
+IN_FILTER_CHUNK_SIZE = 200
+
+
+class SupabaseStorage(StorageBackend):
+    """
+    Storage on the hosted Supabase project. Plain reads and writes are PostgREST
+    query chains; the lease and bulk write operations call the database
+    functions in migrations/, so each is a single round-trip.
+    """
+
+    name = "supabase"
+
+    def __init__(self, client):
+        self.client = client
+
+    @classmethod
+    def connect(cls, url, key):
+        return cls(create_client(url, key))
+
+    def _chunks(self, keys):
+        keys = list(keys)
+        for start in range(0, len(keys), IN_FILTER_CHUNK_SIZE):
+            yield keys[start:start + IN_FILTER_CHUNK_SIZE]
+
+    def upsert(self, table, records):
+        if records:
+            self.client.table(table).upsert(records, on_conflict=PRIMARY_KEYS[table]).execute()
+
+    def upsert_owners(self, records, statuses):
+        if not records:
+            return set()
+        response = self.client.rpc("upsert_owners", {"p_records": records, "p_statuses": list(statuses)}).execute()
+        return {row if isinstance(row, str) else next(iter(row.values())) for row in (response.data or [])}
+
+    def fetch(self, table, keys, columns):
+        rows = []
+        for chunk in self._chunks(keys):
+            response = self.client.table(table) \
+                .select(", ".join(columns)) \
+                .in_(PRIMARY_KEYS[table], chunk) \
+                .execute()
+            rows.extend(response.data or [])
+        return rows
+
+    def update(self, table, keys, data):
+        for chunk in self._chunks(keys):
+            self.client.table(table) \
+                .update(data) \
+                .in_(PRIMARY_KEYS[table], chunk) \
+                .execute()
+
+    def scan(self, table, columns, after_key=None, limit=500, not_null=None):
+        key_column = PRIMARY_KEYS[table]
+        query = self.client.table(table) \
+            .select(", ".join(columns)) \
+            .order(key_column) \
+            .limit(limit)
+        if after_key is not None:
+            query = query.gt(key_column, after_key)
+        if not_null is not None:
+            query = query.not_.is_(not_null, "null")
+        return query.execute().data or []
+
+    def claim_owners(self, statuses, worker_id, limit, lease_seconds):
+        response = self.client.rpc("claim_owners", {
+            "p_statuses": list(statuses),
+            "p_worker_id": worker_id,
+            "p_limit": limit,
+            "p_lease_seconds": int(lease_seconds),
+        }).execute()
+        return response.data or []
+
+    def update_owner(self, person_key, data, claimed_by=None, expected_status=None):
+        query = self.client.table("owners") \
+            .update(data) \
+            .eq("person_key", person_key)
+        if claimed_by is not None:
+            query = query.eq("claimed_by", claimed_by)
+        if expected_status is not None:
+            query = query.eq("processing_status", expected_status)
+        # PostgREST returns the rows it updated
+        return bool(query.execute().data)
+
+    def extend_leases(self, worker_id, person_keys, lease_seconds):
+        expires_at = (datetime.now(timezone.utc) + timedelta(seconds=lease_seconds)).isoformat()
+        for chunk in self._chunks(person_keys):
+            self.client.table("owners") \
+                .update({"lease_expires_at": expires_at}) \
+                .in_("person_key", chunk) \
+                .eq("claimed_by", worker_id) \
+                .execute()
+
+    def apply_owner_updates(self, worker_id, updates):
+        response = self.client.rpc("apply_owner_updates", {"p_worker_id": worker_id, "p_updates": updates}).execute()
+        return {row if isinstance(row, str) else next(iter(row.values())) for row in (response.data or [])}
+
+    def attach_owner_radar_ids(self, links):
+        self.client.rpc("attach_owner_radar_ids", {"p_links": links}).execute()
+
+    def count_owners_by_status(self, statuses):
+        counts = {}
+        for status in statuses:
+            response = self.client.table("owners") \
+                .select("person_key", count="exact") \
+                .eq("processing_status", status) \
+                .limit(1) \
+                .execute()
+            counts[status] = response.count or 0
+        return counts
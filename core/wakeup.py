@@ -0,0 +1,110 @@
+import glob
+import os
+import select
+import socket
+import time
+
+from config import WAKEUP_ENABLED, WAKEUP_DIR, IDLE_MIN_SLEEP, IDLE_MAX_SLEEP
+from core.logger import get_logger
+
+log = get_logger("wakeup")
+
+# --- Idle Strategy & Wake-up Signals ---
+# When a worker's queue is empty it backs off exponentially from IDLE_MIN_SLEEP
+# up to IDLE_MAX_SLEEP instead of always sleeping five minutes. While waiting it
+# also listens on a local Unix datagram socket, so an upstream stage that has
+# just written new work (e.g. the ingest worker after upserting owners) can wake
+# it immediately with `notify()`. Each waiting process binds its own socket in
+# WAKEUP_DIR, named after the channel it listens on.
+
+
+class IdleBackoff:
+    """Exponential idle delay: doubles on every empty poll, resets once work is found."""
+
+    def __init__(self, minimum=IDLE_MIN_SLEEP, maximum=IDLE_MAX_SLEEP):
+        self.minimum = minimum
+        self.maximum = maximum
+        self._delay = minimum
+
+    def next_delay(self):
+        """Returns the delay to wait now and doubles it for the next empty poll."""
+        delay = self._delay
+        self._delay = min(self.maximum, self._delay * 2)
+        return delay
+
+    def reset(self):
+        self._delay = self.minimum
+
+
+class WakeupListener:
+    """Waits on a channel's wake-up socket. Falls back to a plain sleep when disabled."""
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.path = os.path.join(WAKEUP_DIR, f"{channel}-{os.getpid()}.sock")
+        self._sock = None
+
+    def _bind(self):
+        if self._sock is None:
+            os.makedirs(WAKEUP_DIR, exist_ok=True)
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self._sock.bind(self.path)
+            self._sock.setblocking(False)
+        return self._sock
+
+    def wait(self, timeout):
+        """Waits up to `timeout` seconds. Returns True if woken by a notification."""
+        if not WAKEUP_ENABLED:
+            time.sleep(timeout)
+            return False
+
+        sock = self._bind()
+        readable, _, _ = select.select([sock], [], [], timeout)
+        if not readable:
+            return False
+        # Drain every queued notification; one wake-up is enough
+        while True:
+            try:
+                sock.recv(64)
+            except BlockingIOError:
+                break
+        return True
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+def notify(channel):
+    """Wakes every worker currently waiting on `channel`. Never raises."""
+    if not WAKEUP_ENABLED:
+        return
+    sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    try:
+        for path in glob.glob(os.path.join(WAKEUP_DIR, f"{channel}-*.sock")):
+            try:
+                sender.sendto(b"1", path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # The listener exited without cleaning up
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            except OSError:
+                pass # Listener's buffer is full, so it already has a wake-up pending
+    finally:
+        sender.close()
+
+
+def idle_wait(backoff, listener, worker_name):
+    """Sleeps for the next backoff delay, returning early if a wake-up arrives."""
+    delay = backoff.next_delay()
+    log.info("No owners found, waiting for new work", extra={"worker": worker_name, "wait_s": round(delay, 1)})
+    if listener.wait(delay):
+        log.info("Woken up by an upstream worker", extra={"worker": worker_name})
+        backoff.reset()
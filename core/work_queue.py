@@ -0,0 +1,269 @@
+import fcntl
+import glob
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+
+from core.database import storage
+from core.storage.base import PRIMARY_KEYS
+from core import metrics
+from core.logger import get_logger
+from config import RESULT_FLUSH_SIZE, RESULT_FLUSH_INTERVAL, RESULT_JOURNAL_DIR
+
+log = get_logger("work_queue")
+
+# Identifies this process in the `claimed_by` column. Unique per process start,
+# so a restarted worker never mistakes an old lease for its own.
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+# Merged into every result write so the row is handed back to the queue
+RELEASE_LEASE = {"claimed_by": None, "lease_expires_at": None}
+
+# Every processing_status an owner moves through, sampled for the queue depth gauge
+OWNER_STATUSES = ('pending_enrichment', 'pending_verification', 'pending_post_enrichment_verification',
+                  'complete', 'failed_enrichment', 'failed_verification')
+
+
+def claim_owners(statuses, limit, lease_seconds):
+    """
+    Atomically claims up to `limit` owners in one of `statuses` for this worker.
+
+    Rows leased to other workers are skipped and rows whose lease has expired
+    are reclaimed (see migrations/001_owner_leases.sql). Returns the claimed owner rows.
+    """
+    return storage.claim_owners(statuses, WORKER_ID, limit, lease_seconds)
+
+
+def update_claimed_owner(person_key, update_data):
+    """
+    Writes a worker's result for a claimed owner and releases the lease.
+
+    The write only applies while this worker still holds the lease, so a worker
+    that stalled past its lease cannot overwrite the result of the worker that
+    reclaimed the row. Returns True if the row was written.
+    """
+    return storage.update_owner(person_key, {**update_data, **RELEASE_LEASE}, claimed_by=WORKER_ID)
+
+
+def defer_owners(stage, person_keys, delay_seconds):
+    """
+    Hands claimed owners back to the queue untouched, to be claimed again after
+    `delay_seconds`. For owners a vendor outage kept from being processed: their
+    status stays as it is, so they are retried rather than marked failed.
+    """
+    person_keys = list(person_keys)
+    if not person_keys:
+        return
+    storage.extend_leases(WORKER_ID, person_keys, delay_seconds)
+    metrics.record_processed(stage, "deferred", len(person_keys))
+    log.info("Deferred owners until the vendor recovers",
+             extra={"stage": stage, "owners": len(person_keys), "retry_in_s": round(delay_seconds)})
+
+
+def apply_owner_updates(entries, worker_id=WORKER_ID):
+    """
+    Applies a batch of results in one call (see migrations/002_apply_owner_updates.sql).
+    Returns the set of person_keys that were updated.
+    """
+    payload = [{**entry["update"], "person_key": entry["person_key"], "expected_status": entry["expected_status"]}
+               for entry in entries]
+    return storage.apply_owner_updates(worker_id, payload)
+
+
+def record_queue_depth():
+    """Samples how many owners are in each processing_status into the `owners_queue_depth` gauge."""
+    for status, count in storage.count_owners_by_status(OWNER_STATUSES).items():
+        metrics.registry.set_gauge("owners_queue_depth", count, processing_status=status)
+
+
+class ResultWriteBuffer:
+    """
+    Collects per-owner results and writes them back in bulk.
+
+    A flush happens once `flush_size` results are pending or `flush_interval`
+    seconds have passed, and whenever the worker calls `flush()` at the end of a
+    batch. Rows the bulk call did not apply are retried one at a time. Results
+    that still could not be written (the database was unreachable, say) stay in
+    the journal and are retried on the next flush; only results that were
+    written or rejected by the lease/status guard are dropped.
+
+    Every result is appended to a local journal (and fsynced) before it is
+    buffered, so results that were already paid for survive a crash between the
+    API call and the flush. Each process holds a lock on its own journal file;
+    `recover()` replays journals left behind by processes that died.
+
+    With the default `worker_id` a row is only written while this worker holds
+    its lease. With `worker_id=None` (for owners that were never claimed, as in
+    the streaming pipeline) a row is only written while it is still in the
+    status the result was computed from. `on_flushed`, if given, is called with
+    the entries that were applied after every flush.
+
+    A result can carry `related_rows` ({table: [rows]}), records derived from it
+    that live in other tables (such as `verification_results`). They are
+    journaled with the result and upserted before the owner rows are written.
+    """
+
+    def __init__(self, name, flush_size=RESULT_FLUSH_SIZE, flush_interval=RESULT_FLUSH_INTERVAL,
+                 worker_id=WORKER_ID, on_flushed=None):
+        self.name = name
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.worker_id = worker_id
+        self.on_flushed = on_flushed
+        self.journal_path = os.path.join(RESULT_JOURNAL_DIR, f"{name}-{WORKER_ID}.jsonl")
+        self._journal = None
+        self._pending = []
+        self._retry = [] # Entries a flush failed to write, retried by the next one
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def _open_journal(self):
+        # Caller must hold the lock
+        if self._journal is None:
+            os.makedirs(RESULT_JOURNAL_DIR, exist_ok=True)
+            self._journal = open(self.journal_path, "a+")
+            # Held for the life of the process, which is how recover() tells live journals from orphans
+            fcntl.flock(self._journal, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return self._journal
+
+    def add(self, person_key, update_data, expected_status, related_rows=None):
+        """Journals and buffers one owner's result, flushing if a threshold is hit."""
+        entry = {"person_key": person_key, "update": update_data, "expected_status": expected_status}
+        if related_rows:
+            entry["related_rows"] = related_rows
+        metrics.record_processed(self.name, update_data.get("processing_status", "unchanged"))
+        with self._lock:
+            journal = self._open_journal()
+            journal.write(json.dumps(entry) + "\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+            self._pending.append(entry)
+            should_flush = (
+                len(self._pending) >= self.flush_size
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        """Writes every buffered result. Returns the number of rows applied."""
+        with self._flush_lock:
+            with self._lock:
+                entries, self._pending = self._retry + self._pending, []
+                self._retry = []
+                self._last_flush = time.monotonic()
+            if not entries:
+                return 0
+
+            applied, failed = _write_entries(entries, worker_id=self.worker_id)
+            log.info("Wrote results to the database",
+                     extra={"stage": self.name, "applied": len(applied), "buffered": len(entries)})
+            if failed:
+                log.warning("Results could not be written, keeping them for the next flush",
+                            extra={"stage": self.name, "results": len(failed)})
+
+            with self._lock:
+                # Written and rejected results are settled; the journal keeps the failed ones and what was buffered since
+                self._retry = failed
+                if self._journal is not None:
+                    self._journal.seek(0)
+                    self._journal.truncate()
+                    for entry in self._retry + self._pending:
+                        self._journal.write(json.dumps(entry) + "\n")
+                    self._journal.flush()
+                    os.fsync(self._journal.fileno())
+
+            if self.on_flushed is not None:
+                self.on_flushed([entry for entry in entries if entry["person_key"] in applied])
+            return len(applied)
+
+    def recover(self):
+        """Replays journals left behind by crashed processes of this worker type."""
+        for path in glob.glob(os.path.join(RESULT_JOURNAL_DIR, f"{self.name}-*.jsonl")):
+            if path == self.journal_path:
+                continue
+            with open(path, "r+") as orphan:
+                try:
+                    fcntl.flock(orphan, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    continue # Still owned by a running worker
+                entries = [json.loads(line) for line in orphan if line.strip()]
+                failed = []
+                if entries:
+                    log.warning("Replaying unflushed results from a crashed worker",
+                                extra={"stage": self.name, "results": len(entries), "journal": path})
+                    # The crashed worker's lease is gone; apply only where the status has not moved on
+                    _, failed = _write_entries(entries, worker_id=None)
+                if failed:
+                    # Keep what could not be written for the next recovery
+                    log.warning("Some replayed results could not be written, keeping their journal",
+                                extra={"stage": self.name, "results": len(failed), "journal": path})
+                    orphan.seek(0)
+                    orphan.truncate()
+                    for entry in failed:
+                        orphan.write(json.dumps(entry) + "\n")
+                    orphan.flush()
+                    os.fsync(orphan.fileno())
+                    continue
+            os.remove(path)
+
+
+def _write_related_rows(entries):
+    """
+    Upserts the related rows of `entries`, one call per table. The last row wins
+    for a repeated key. Returns the set of tables whose upsert failed.
+    """
+    failed_tables = set()
+    tables = {}
+    for entry in entries:
+        for table, rows in entry.get("related_rows", {}).items():
+            key_column = PRIMARY_KEYS[table]
+            tables.setdefault(table, {}).update((row[key_column], row) for row in rows)
+    for table, rows in tables.items():
+        try:
+            storage.upsert(table, list(rows.values()))
+        except Exception as e:
+            failed_tables.add(table)
+            log.error("Failed to write related rows", extra={"table": table, "rows": len(rows), "error": str(e)})
+    return failed_tables
+
+
+def _write_entries(entries, worker_id):
+    """
+    Bulk-applies results, falling back to per-row writes for anything the bulk
+    call missed. Returns `(applied, failed)`: the set of person_keys that were
+    written, and the entries that could not be written and should be kept.
+    An entry the guard rejected (the lease was lost or the status moved on)
+    is in neither; it is settled and dropped.
+    """
+    failed_tables = _write_related_rows(entries)
+
+    applied = set()
+    try:
+        applied = apply_owner_updates(entries, worker_id=worker_id)
+    except Exception as e:
+        log.warning("Bulk result write failed, retrying row by row", extra={"error": str(e)})
+
+    failed = []
+    for entry in entries:
+        if entry["person_key"] not in applied:
+            try:
+                if worker_id is not None:
+                    written = update_claimed_owner(entry["person_key"], entry["update"])
+                else:
+                    written = storage.update_owner(entry["person_key"], {**entry["update"], **RELEASE_LEASE},
+                                                   expected_status=entry["expected_status"])
+            except Exception as e:
+                log.error("Failed to update owner status", extra={"person_key": entry["person_key"], "error": str(e)})
+                failed.append(entry)
+                continue
+            if written:
+                applied.add(entry["person_key"])
+        if failed_tables.intersection(entry.get("related_rows", {})):
+            # Kept for its related rows; on retry the guard turns the owner write into a no-op
+            failed.append(entry)
+    return applied, failed
@@ -9,6 +9,11 @@ sys.path.append('.')
 from workers.ingest_worker import run_ingestion_worker
 from workers.enrichment_worker import run_enrichment_worker
 from workers.verification_worker import run_verification_worker
+from workers.pipeline_worker import run_pipeline
+from core import metrics, work_queue, rate_limiter
+from core.logger import get_logger
+
+log = get_logger("main")
 
 def main():
     """Main entry point for the data pipeline CLI."""
@@ -17,25 +22,62 @@ def main():
     # Define the commands for the CLI
     parser.add_argument(
         "worker",
-        choices=['ingest', 'enrich', 'verify'],
-        help="The name of the worker to run."
+        choices=['ingest', 'enrich', 'verify', 'run-all'],
+        help="The name of the worker to run. 'run-all' streams the whole list through every stage in one process."
+    )
+    parser.add_argument(
+        "--all",
+        action="store_true",
+        help="(ingest only) Stream the whole list in pages, resuming from the saved cursor."
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="(ingest only) Skip properties fetched within INGEST_MAX_AGE_DAYS and don't rewrite unchanged ones."
+    )
+    parser.add_argument(
+        "--drain",
+        action="store_true",
+        help="(enrich/verify only) Exit once the queue is empty instead of waiting for more work."
+    )
+    parser.add_argument(
+        "--mode",
+        choices=['serial', 'async', 'bulk'],
+        help="Processing mode for enrich (serial/async/bulk) or verify (serial/bulk). "
+             "Defaults to ENRICHMENT_MODE / VERIFICATION_MODE from the config."
     )
     
     args = parser.parse_args()
 
-    print(f"--- Fency Outreach Pipeline: Starting '{args.worker}' worker ---")
+    log.info("Fency Outreach Pipeline: starting worker", extra={"worker": args.worker})
+    # Queue depth is sampled in the background for as long as an exporter is on
+    metrics.start_exporter(collectors=[work_queue.record_queue_depth, rate_limiter.record_usage])
 
     if args.worker == 'ingest':
-        run_ingestion_worker()
+        if args.incremental:
+            run_ingestion_worker(stream_all=args.all, incremental=True)
+        else:
+            run_ingestion_worker(stream_all=args.all)
     elif args.worker == 'enrich':
-        run_enrichment_worker()
+        if args.mode:
+            run_enrichment_worker(mode=args.mode, exit_when_idle=args.drain)
+        else:
+            run_enrichment_worker(exit_when_idle=args.drain)
     elif args.worker == 'verify':
-        run_verification_worker()
+        if args.mode == 'async':
+            parser.error("The verify worker supports --mode serial or bulk.")
+        if args.mode:
+            run_verification_worker(mode=args.mode, exit_when_idle=args.drain)
+        else:
+            run_verification_worker(exit_when_idle=args.drain)
+    elif args.worker == 'run-all':
+        run_pipeline()
     else:
-        print(f"Unknown worker: {args.worker}")
+        log.error("Unknown worker", extra={"worker": args.worker})
         sys.exit(1)
         
-    print(f"--- Worker '{args.worker}' finished or was stopped. ---")
+    metrics.write_snapshot()
+    log.info("Worker finished or was stopped", extra={"worker": args.worker})
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
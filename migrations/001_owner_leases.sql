@@ -0,0 +1,38 @@
+-- Lease-based work claiming for the enrichment and verification workers.
+--
+-- Instead of selecting rows by status (which lets two processes pick up the
+-- same owners), workers call claim_owners(), which marks a batch as leased to
+-- one worker in a single statement. Rows keep their processing_status, so the
+-- verification worker still knows which emails to check. A lease that is not
+-- released (the worker crashed) simply expires and the row becomes claimable again.
+
+ALTER TABLE owners
+    ADD COLUMN IF NOT EXISTS claimed_by text,
+    ADD COLUMN IF NOT EXISTS lease_expires_at timestamptz;
+
+CREATE INDEX IF NOT EXISTS owners_status_lease_idx
+    ON owners (processing_status, lease_expires_at);
+
+CREATE OR REPLACE FUNCTION claim_owners(
+    p_statuses text[],
+    p_worker_id text,
+    p_limit integer,
+    p_lease_seconds integer
+)
+RETURNS SETOF owners
+LANGUAGE sql
+AS $$
+    UPDATE owners AS o
+       SET claimed_by = p_worker_id,
+           lease_expires_at = now() + make_interval(secs => p_lease_seconds)
+     WHERE o.person_key IN (
+            SELECT person_key
+              FROM owners
+             WHERE processing_status = ANY (p_statuses)
+               AND (lease_expires_at IS NULL OR lease_expires_at < now())
+             ORDER BY lease_expires_at NULLS FIRST
+             LIMIT p_limit
+               FOR UPDATE SKIP LOCKED
+           )
+    RETURNING o.*;
+$$;
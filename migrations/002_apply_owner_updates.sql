@@ -0,0 +1,36 @@
+-- Bulk result write-back for the enrichment and verification workers.
+--
+-- apply_owner_updates() applies a whole batch of per-owner results in one
+-- round-trip. Each element of p_updates is an object with a person_key, the
+-- processing_status the owner was claimed in (expected_status) and any of the
+-- result columns below; columns missing from an element keep their current value.
+--
+-- With a worker id, a row is only updated while that worker still holds its
+-- lease. With a NULL worker id (replaying results journaled by a worker that
+-- crashed before flushing) the lease is ignored, but the row must still be in
+-- the status it was claimed in, so a newer result is never overwritten.
+-- Returns the person_keys that were updated.
+
+CREATE OR REPLACE FUNCTION apply_owner_updates(
+    p_worker_id text,
+    p_updates jsonb
+)
+RETURNS SETOF text
+LANGUAGE sql
+AS $$
+    UPDATE owners AS o
+       SET (processing_status, enriched_emails, millionverifier_response, neverbounce_response,
+            millionverifier_status, neverbounce_status) =
+           (SELECT r.processing_status, r.enriched_emails, r.millionverifier_response, r.neverbounce_response,
+                   r.millionverifier_status, r.neverbounce_status
+              FROM jsonb_populate_record(o, u.item) AS r),
+           claimed_by = NULL,
+           lease_expires_at = NULL
+      FROM jsonb_array_elements(p_updates) AS u(item)
+     WHERE o.person_key = u.item->>'person_key'
+       AND (
+            (p_worker_id IS NOT NULL AND o.claimed_by = p_worker_id)
+         OR (p_worker_id IS NULL AND o.processing_status = u.item->>'expected_status')
+       )
+    RETURNING o.person_key;
+$$;
@@ -0,0 +1,12 @@
+-- Incremental ingestion (`main.py ingest --incremental`).
+--
+-- content_hash stores a hash of the transformed property record, so the
+-- ingest worker can tell whether a refetched property actually changed and
+-- skip rewriting it when it did not. last_fetched_at is indexed together with
+-- radar_id for the batched freshness lookup.
+
+ALTER TABLE properties
+    ADD COLUMN IF NOT EXISTS content_hash text;
+
+CREATE INDEX IF NOT EXISTS properties_radar_id_fetched_idx
+    ON properties (radar_id, last_fetched_at);
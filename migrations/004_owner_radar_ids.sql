@@ -0,0 +1,31 @@
+-- One owner, many properties.
+--
+-- LLCs and investors own many properties in the same list. The ingest worker
+-- now writes each owner once per run and records every property it was seen
+-- on in radar_ids (radar_id stays the first property the owner was found on).
+-- attach_owner_radar_ids() adds RadarIDs to many owners in one round-trip
+-- without touching any other column, in particular processing_status.
+
+ALTER TABLE owners
+    ADD COLUMN IF NOT EXISTS radar_ids text[];
+
+UPDATE owners
+   SET radar_ids = ARRAY[radar_id]
+ WHERE radar_ids IS NULL
+   AND radar_id IS NOT NULL;
+
+CREATE OR REPLACE FUNCTION attach_owner_radar_ids(p_links jsonb)
+RETURNS void
+LANGUAGE sql
+AS $$
+    UPDATE owners AS o
+       SET radar_ids = (
+            SELECT array_agg(DISTINCT rid ORDER BY rid)
+              FROM unnest(
+                    coalesce(o.radar_ids, ARRAY[]::text[])
+                    || ARRAY(SELECT jsonb_array_elements_text(l.item->'radar_ids'))
+                   ) AS rid
+           )
+      FROM jsonb_array_elements(p_links) AS l(item)
+     WHERE o.person_key = l.item->>'person_key';
+$$;
@@ -0,0 +1,88 @@
+import argparse
+import json
+import sys
+
+# Run from the project root: python migrations/005_migrate_verification_logs.py
+sys.path.append('.')
+
+from core.archive import RawArchive
+from core.database import check_db_connection, storage
+from core.logger import get_logger
+from workers.verification_worker import summarize_verification, verification_result_row
+
+log = get_logger("migrate_verification_logs")
+
+# The migrated logs, indexed by person_key and email (see core/archive.py)
+verification_archive = RawArchive("verification")
+
+RAW_COLUMNS = {"millionverifier": "millionverifier_response", "neverbounce": "neverbounce_response"}
+
+
+def _parse_log(value):
+    """Decodes a stored verification log, which was JSON text (sometimes encoded twice) of {email: response}."""
+    while isinstance(value, str):
+        value = json.loads(value)
+    return value or {}
+
+
+def migrate_owner(owner):
+    """Archives one owner's raw verification logs and returns its `verification_results` rows."""
+    rows = []
+    for vendor, column in RAW_COLUMNS.items():
+        try:
+            responses = _parse_log(owner.get(column))
+        except ValueError:
+            log.warning("Unreadable verification log, skipped",
+                        extra={"person_key": owner["person_key"], "column": column})
+            continue
+        for email, response in responses.items():
+            verification_archive.append({"person_key": owner["person_key"], "email": email, "vendor": vendor,
+                                         "response": response},
+                                        person_key=owner["person_key"], email=email)
+            verdict, sub_status = summarize_verification(vendor, response)
+            rows.append(verification_result_row(owner["person_key"], email, vendor, verdict, sub_status,
+                                                bool(response.get("cached")), None))
+    return rows
+
+
+def migrate(page_size=500, keep_raw_columns=False):
+    """
+    Moves the raw verification logs on existing owner rows into the archive and
+    `verification_results`, a page at a time, then clears the raw columns.
+
+    The old worker always wrote both columns together, so pages are selected on
+    millionverifier_response. Safe to re-run: rows are keyed, and cleared owners
+    are no longer selected.
+    """
+    migrated_owners = migrated_checks = 0
+    after_key = None
+    while True:
+        owners = storage.scan("owners", ["person_key", *RAW_COLUMNS.values()], after_key=after_key,
+                              limit=page_size, not_null="millionverifier_response")
+        if not owners:
+            break
+        after_key = owners[-1]["person_key"]
+
+        rows = [row for owner in owners for row in migrate_owner(owner)]
+        # Raw payloads are on disk before anything is removed from the database
+        verification_archive.flush()
+        storage.upsert("verification_results", rows)
+        if not keep_raw_columns:
+            storage.update("owners", [owner["person_key"] for owner in owners],
+                           {column: None for column in RAW_COLUMNS.values()})
+
+        migrated_owners += len(owners)
+        migrated_checks += len(rows)
+        log.info("Migrated a page of verification logs", extra={"owners": migrated_owners, "checks": migrated_checks})
+
+    log.info("Verification log migration complete", extra={"owners": migrated_owners, "checks": migrated_checks})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move raw owner verification logs into verification_results")
+    parser.add_argument("--page-size", type=int, default=500, help="Owners read per page.")
+    parser.add_argument("--keep-raw-columns", action="store_true",
+                        help="Leave millionverifier_response and neverbounce_response in place after copying.")
+    args = parser.parse_args()
+    if check_db_connection():
+        migrate(page_size=args.page_size, keep_raw_columns=args.keep_raw_columns)
@@ -0,0 +1,27 @@
+-- Compact verification records.
+--
+-- The verification worker used to store every vendor's full raw response,
+-- for every email it tried, as JSON text in owners.millionverifier_response
+-- and owners.neverbounce_response. It now writes one small row per check to
+-- verification_results and keeps the raw responses in a compressed archive
+-- on disk (RAW_ARCHIVE_DIR). result_key is person_key:vendor:lowercased email,
+-- so writing the same check again updates the row instead of duplicating it.
+--
+-- Existing owner rows are moved over by migrations/005_migrate_verification_logs.py.
+
+CREATE TABLE IF NOT EXISTS verification_results (
+    result_key text PRIMARY KEY,
+    person_key text NOT NULL,
+    email text NOT NULL,
+    vendor text NOT NULL,
+    verdict text,
+    sub_status text,
+    cached boolean NOT NULL DEFAULT false,
+    checked_at timestamptz
+);
+
+CREATE INDEX IF NOT EXISTS verification_results_person_key_idx
+    ON verification_results (person_key);
+
+CREATE INDEX IF NOT EXISTS verification_results_email_idx
+    ON verification_results (email);
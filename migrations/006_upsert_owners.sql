@@ -0,0 +1,40 @@
+-- Guarded owner writes for the ingest worker.
+--
+-- The ingest worker looks up the owners it is about to write and only
+-- rewrites those still waiting to be enriched or verified. Between that
+-- lookup and its bulk write a downstream worker can claim and advance one
+-- of them, and a plain upsert would then move it back to pending_*.
+-- upsert_owners() writes a batch of owners in one round-trip: new owners are
+-- inserted, existing ones are only updated while their processing_status is
+-- still one of p_statuses. Columns other than the ingested ones (results,
+-- leases) are never touched. Returns the person_keys that were written.
+
+CREATE OR REPLACE FUNCTION upsert_owners(
+    p_records jsonb,
+    p_statuses text[]
+)
+RETURNS SETOF text
+LANGUAGE sql
+AS $$
+    INSERT INTO owners AS o (
+        person_key, radar_id, radar_ids, first_name, last_name, entity_name, person_type, age, gender, occupation,
+        is_primary_contact, ownership_role, is_primary_residence, original_phone, original_email,
+        processing_status, mail_street_address, mail_city, mail_state, mail_zip_code
+    )
+    SELECT r.person_key, r.radar_id, r.radar_ids, r.first_name, r.last_name, r.entity_name, r.person_type, r.age,
+           r.gender, r.occupation, r.is_primary_contact, r.ownership_role, r.is_primary_residence,
+           r.original_phone, r.original_email, r.processing_status, r.mail_street_address, r.mail_city,
+           r.mail_state, r.mail_zip_code
+      FROM jsonb_populate_recordset(NULL::owners, p_records) AS r
+    ON CONFLICT (person_key) DO UPDATE
+       SET (radar_id, radar_ids, first_name, last_name, entity_name, person_type, age, gender, occupation,
+            is_primary_contact, ownership_role, is_primary_residence, original_phone, original_email,
+            processing_status, mail_street_address, mail_city, mail_state, mail_zip_code) =
+           (EXCLUDED.radar_id, EXCLUDED.radar_ids, EXCLUDED.first_name, EXCLUDED.last_name, EXCLUDED.entity_name,
+            EXCLUDED.person_type, EXCLUDED.age, EXCLUDED.gender, EXCLUDED.occupation, EXCLUDED.is_primary_contact,
+            EXCLUDED.ownership_role, EXCLUDED.is_primary_residence, EXCLUDED.original_phone, EXCLUDED.original_email,
+            EXCLUDED.processing_status, EXCLUDED.mail_street_address, EXCLUDED.mail_city, EXCLUDED.mail_state,
+            EXCLUDED.mail_zip_code)
+     WHERE o.processing_status = ANY (p_statuses)
+    RETURNING o.person_key;
+$$;
@@ -0,0 +1,18 @@
+-- Submitted bulk verification jobs.
+--
+-- A bulk job is paid for when it is submitted. If it was still running when
+-- the worker stopped waiting (VERIFICATION_BULK_TIMEOUT), or the worker
+-- crashed, the job id used to be lost and the next claim of those owners
+-- bought the same emails again. The verification worker now records each
+-- submitted email here, keyed by vendor:lowercased email, and polls the
+-- recorded job again instead of resubmitting. settled_at is set once the
+-- job's results were collected (or the job failed).
+
+CREATE TABLE IF NOT EXISTS verification_jobs (
+    job_email_key text PRIMARY KEY,
+    vendor text NOT NULL,
+    email text NOT NULL,
+    job_id text NOT NULL,
+    submitted_at timestamptz NOT NULL,
+    settled_at timestamptz
+);
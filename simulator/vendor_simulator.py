@@ -0,0 +1,517 @@
+import argparse
+import csv
+import glob
+import hashlib
+import io
+import itertools
+import json
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+# Allow running as `python simulator/vendor_simulator.py` from the repo root
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from config import SIMULATOR_HOST, SIMULATOR_PORT, SIMULATOR_PROFILE_PATH, SIMULATOR_LIST_SIZE, SIMULATOR_SEED
+from core.rate_limiter import TokenBucket
+
+# --- Local Vendor Simulator ---
+# A stand-in for PropertyRadar, People Data Labs, MillionVerifier and
+# NeverBounce, so the workers can be load-tested without spending credits.
+# Start it, then run the workers with VENDOR_SIMULATOR_URL pointing at it.
+#
+# Property and person payloads are replayed from `sample_responses/` with
+# synthetic RadarIDs, PersonKeys, emails and addresses filled in; PDL matches
+# and verification verdicts are derived from a hash of the request, so the same
+# person or email always gets the same answer. Each vendor has a profile with a
+# log-normal latency, injected 5xx and 429 rates, a request rate quota (excess
+# requests get a 429 with Retry-After) and an optional credit budget (402 once
+# spent). GET /stats returns the per-vendor counters as JSON.
+
+SAMPLE_DIR = os.path.join(REPO_ROOT, "sample_responses")
+
+DEFAULT_PROFILES = {
+    "propertyradar": {"latency_ms": 150, "latency_sigma": 0.5, "error_rate": 0.005, "throttle_rate": 0.0,
+                      "rate_per_sec": 10, "burst": 20, "credits": None},
+    "pdl": {"latency_ms": 400, "latency_sigma": 0.6, "error_rate": 0.005, "throttle_rate": 0.0,
+            "rate_per_sec": 10, "burst": 10, "credits": None, "match_rate": 0.6},
+    "millionverifier": {"latency_ms": 900, "latency_sigma": 0.8, "error_rate": 0.005, "throttle_rate": 0.0,
+                        "rate_per_sec": 20, "burst": 20, "credits": None, "bulk_job_seconds": 10},
+    "neverbounce": {"latency_ms": 600, "latency_sigma": 0.7, "error_rate": 0.005, "throttle_rate": 0.0,
+                    "rate_per_sec": 20, "burst": 20, "credits": None, "bulk_job_seconds": 10},
+}
+
+# Verdicts by share of emails, as MillionVerifier names them, with the NeverBounce equivalent
+VERDICTS = [
+    (0.55, "ok", "valid"),
+    (0.10, "catch_all", "catchall"),
+    (0.10, "unknown", "unknown"),
+    (0.20, "invalid", "invalid"),
+    (0.05, "disposable", "disposable"),
+]
+
+STREETS = ["MAIN ST", "ELM AVE", "PLEASANT ST", "COUNTY RD", "COTLEY ST", "EDMUND H NICHOLS RD"]
+CITIES = [("NORTH ATTLEBORO", "02760"), ("BERKLEY", "02779"), ("TAUNTON", "02780"), ("FALL RIVER", "02720")]
+EMAIL_SHARE = 0.3 # Owners that come with an email from PropertyRadar and skip enrichment
+OWNER_REUSE = 0.9 # Distinct owners per RadarID; below 1 so some owners hold several properties
+
+
+def _stable_hash(*parts):
+    digest = hashlib.md5("|".join(str(part) for part in parts).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+def _fraction(*parts):
+    return _stable_hash(*parts) / 2 ** 64
+
+
+def load_profiles(path=None):
+    """Returns the default vendor profiles, overlaid with the JSON file at `path` if given."""
+    profiles = {vendor: dict(profile) for vendor, profile in DEFAULT_PROFILES.items()}
+    if path:
+        with open(path) as f:
+            for vendor, overrides in json.load(f).items():
+                profiles.setdefault(vendor, {}).update(overrides)
+    return profiles
+
+
+class VendorState:
+    """One vendor's profile, quota buckets and counters."""
+
+    def __init__(self, name, profile, rng):
+        self.name = name
+        self.profile = profile
+        self.rng = rng
+        rate = profile.get("rate_per_sec")
+        self.bucket = TokenBucket(rate, profile.get("burst")) if rate else None
+        self.counts = {"requests": 0, "ok": 0, "errors": 0, "throttled": 0, "quota_exceeded": 0, "credits_used": 0}
+        self._lock = threading.Lock()
+
+    def count(self, key, amount=1):
+        with self._lock:
+            self.counts[key] += amount
+
+    def latency(self):
+        """Draws one response delay in seconds from the vendor's log-normal distribution."""
+        median = self.profile.get("latency_ms", 0) / 1000.0
+        return median * math.exp(self.profile.get("latency_sigma", 0) * self.rng.gauss(0, 1))
+
+    def admit(self, credits=1):
+        """
+        Decides whether a request goes through. Returns None to serve it, or the
+        failure to send instead: "throttled", "error" or "quota_exceeded".
+        """
+        self.count("requests")
+        if self.bucket is not None and not self.bucket.try_acquire():
+            self.count("throttled")
+            return "throttled"
+        if self.rng.random() < self.profile.get("throttle_rate", 0):
+            self.count("throttled")
+            return "throttled"
+        if self.rng.random() < self.profile.get("error_rate", 0):
+            self.count("errors")
+            return "error"
+        budget = self.profile.get("credits")
+        with self._lock:
+            if budget is not None and self.counts["credits_used"] + credits > budget:
+                self.counts["quota_exceeded"] += 1
+                return "quota_exceeded"
+            self.counts["credits_used"] += credits
+            self.counts["ok"] += 1
+        return None
+
+
+class SampleData:
+    """Replays and extends the payloads in `sample_responses/`."""
+
+    def __init__(self, list_size):
+        self.list_size = list_size
+        self.owner_pool = max(1, int(list_size * OWNER_REUSE))
+        self.properties = [json.dumps(p) for p in self._load_properties()]
+        self.persons = [json.dumps(p) for p in self._load_persons()]
+
+    def _load_properties(self):
+        properties = []
+        with open(os.path.join(SAMPLE_DIR, "full_details_for_list_1087906.json")) as f:
+            for response in json.load(f):
+                properties.extend(response.get("results", []))
+        for path in sorted(glob.glob(os.path.join(SAMPLE_DIR, "property_details_for_list_1087906", "*.json"))):
+            with open(path) as f:
+                for response in json.load(f):
+                    properties.extend(response.get("results", []))
+        return properties
+
+    def _load_persons(self):
+        with open(os.path.join(SAMPLE_DIR, "all_persons_for_list_1087906.json")) as f:
+            return json.load(f)
+
+    def radar_id(self, index):
+        return f"S{index:07X}"
+
+    def list_items(self, start, limit):
+        stop = min(self.list_size, start + limit)
+        return [{"RadarID": self.radar_id(index)} for index in range(start, stop)]
+
+    def property(self, radar_id):
+        record = json.loads(self.properties[_stable_hash(radar_id) % len(self.properties)])
+        record["RadarID"] = radar_id
+        return record
+
+    def persons_for(self, radar_id):
+        seed = _stable_hash(radar_id, "persons")
+        persons = []
+        for offset in range(1 + seed % 2):
+            owner_index = (seed // 2 + offset) % self.owner_pool
+            person = json.loads(self.persons[owner_index % len(self.persons)])
+            street = STREETS[owner_index % len(STREETS)]
+            city, zip_code = CITIES[owner_index % len(CITIES)]
+            address = f"{1 + owner_index % 999} {street}, {city}, MA {zip_code}"
+            person["PersonKey"] = f"s{owner_index}"
+            person["isPrimaryContact"] = 1 if offset == 0 else 0
+            person["MailAddress"] = [{"RadarID": radar_id, "Address": address}]
+            person["PrimaryResidence"] = [{"RadarID": radar_id, "Address": address}]
+            if _fraction(owner_index, "email") < EMAIL_SHARE:
+                person["Email"] = f"owner{owner_index}@example.com"
+            else:
+                person.pop("Email", None)
+            persons.append(person)
+        return persons
+
+
+def verdict(email):
+    """Returns the (MillionVerifier, NeverBounce) verdicts for an email, stable across calls."""
+    point = _fraction(email.lower(), "verdict")
+    for share, mv_result, nb_result in VERDICTS:
+        if point < share:
+            return mv_result, nb_result
+        point -= share
+    return VERDICTS[-1][1], VERDICTS[-1][2]
+
+
+def pdl_match(params, match_rate):
+    """Returns the PDL enrich payload and status for a set of query params."""
+    key = json.dumps({k: v for k, v in params.items() if k not in ("min_likelihood", "api_key")}, sort_keys=True)
+    if _fraction(key, "match") >= match_rate:
+        return 404, {"status": 404, "error": {"type": "not_found",
+                                              "message": "No records were found matching your request"}}
+    person_id = _stable_hash(key) % 10 ** 8
+    emails = [{"address": f"person{person_id}@example.com", "type": "personal"}]
+    if person_id % 3 == 0:
+        emails.append({"address": f"p{person_id}@work.example.com", "type": "work"})
+    if person_id % 7 == 0:
+        emails.append({"address": f"info{person_id}@example.com", "type": "personal"})
+    data = {
+        "id": f"sim{person_id}",
+        "full_name": f"{params.get('first_name', '')} {params.get('last_name', '')}".strip().lower() or None,
+        "emails": emails,
+    }
+    return 200, {"status": 200, "likelihood": 6 + person_id % 5, "data": data}
+
+
+class Simulator:
+    """Holds the vendor states, the replay data and the in-progress bulk jobs."""
+
+    def __init__(self, profiles, list_size, seed):
+        rng = random.Random(seed)
+        self.vendors = {name: VendorState(name, profile, random.Random(rng.random()))
+                        for name, profile in profiles.items()}
+        self.data = SampleData(list_size)
+        self.jobs = {}
+        self._job_ids = itertools.count(1000)
+        self._lock = threading.Lock()
+
+    def create_job(self, vendor, emails):
+        with self._lock:
+            job_id = next(self._job_ids)
+        self.jobs[job_id] = {"vendor": vendor, "emails": emails, "created_at": time.monotonic()}
+        return job_id
+
+    def job_done(self, job):
+        seconds = self.vendors[job["vendor"]].profile.get("bulk_job_seconds", 0)
+        return time.monotonic() - job["created_at"] >= seconds
+
+    def stats(self):
+        return {name: dict(state.counts) for name, state in self.vendors.items()}
+
+
+class SimulatorHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive, like the real APIs
+    simulator = None # Set by `serve()`
+
+    # --- Plumbing ---
+
+    def log_message(self, format, *args):
+        pass # One line per request would drown the workers' own output
+
+    def _send(self, status, body, content_type="application/json", headers=None):
+        payload = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _query(self):
+        return {key: values[0] for key, values in parse_qs(urlsplit(self.path).query).items()}
+
+    def _gate(self, vendor, credits=1):
+        """Applies the vendor's latency and failure injection. Returns True if a failure was already sent."""
+        state = self.simulator.vendors[vendor]
+        outcome = state.admit(credits)
+        delay = state.latency()
+        if outcome == "throttled":
+            time.sleep(delay / 10)
+            if vendor == "neverbounce":
+                # The NeverBounce API reports throttling in the body; the SDK turns it into ThrottleTriggered
+                self._send(200, {"status": "throttle_triggered", "message": "Too many requests in a short time."})
+            else:
+                self._send(429, {"error": "Too many requests"}, headers={"Retry-After": "1"})
+            return True
+        time.sleep(delay)
+        if outcome == "error":
+            self._send(503, {"error": "Simulated upstream failure"})
+            return True
+        if outcome == "quota_exceeded":
+            if vendor == "neverbounce":
+                self._send(200, {"status": "general_failure", "message": "Insufficient credits."})
+            else:
+                self._send(402, {"error": "Credit budget exhausted"})
+            return True
+        return False
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_POST(self):
+        self._route("POST")
+
+    def _route(self, method):
+        path = urlsplit(self.path).path.rstrip("/")
+        for route_method, pattern, handler in ROUTES:
+            match = pattern.fullmatch(path)
+            if route_method == method and match:
+                try:
+                    handler(self, *match.groups())
+                except Exception as e:
+                    self._send(500, {"error": f"Simulator error: {e}"})
+                return
+        self._send(404, {"error": f"No simulated endpoint for {method} {path}"})
+
+    # --- PropertyRadar ---
+
+    def list_items(self, list_id):
+        if self._gate("propertyradar"):
+            return
+        query = self._query()
+        items = self.simulator.data.list_items(int(query.get("Start", 0)), int(query.get("Limit", 1)))
+        self._send(200, {"results": items, "resultCount": len(items),
+                         "totalResultCount": self.simulator.data.list_size})
+
+    def property_details(self, radar_id):
+        if self._gate("propertyradar"):
+            return
+        self._send(200, {"results": [self.simulator.data.property(radar_id)], "resultCount": 1})
+
+    def property_persons(self, radar_id):
+        if self._gate("propertyradar"):
+            return
+        persons = self.simulator.data.persons_for(radar_id)
+        self._send(200, {"results": persons, "resultCount": len(persons)})
+
+    # --- People Data Labs ---
+
+    def pdl_enrich(self):
+        if self._gate("pdl"):
+            return
+        status, payload = pdl_match(self._query(), self.simulator.vendors["pdl"].profile.get("match_rate", 0.6))
+        self._send(status, payload, headers={"x-ratelimit-remaining": "100"})
+
+    def pdl_bulk(self):
+        requests = json.loads(self._read_body() or b"{}").get("requests", [])
+        if self._gate("pdl", credits=len(requests)):
+            return
+        match_rate = self.simulator.vendors["pdl"].profile.get("match_rate", 0.6)
+        items = []
+        for request in requests:
+            _, payload = pdl_match(request.get("params", {}), match_rate)
+            if "metadata" in request:
+                payload["metadata"] = request["metadata"]
+            items.append(payload)
+        self._send(200, items)
+
+    # --- MillionVerifier ---
+
+    def mv_single(self):
+        if self._gate("millionverifier"):
+            return
+        email = self._query().get("email", "")
+        mv_result, _ = verdict(email)
+        self._send(200, {"email": email, "result": mv_result, "quality": "good" if mv_result == "ok" else "bad",
+                         "free": False, "role": False, "credits": 1000000})
+
+    def mv_bulk_upload(self):
+        body = self._read_body()
+        message = BytesParser().parsebytes(
+            f"Content-Type: {self.headers.get('Content-Type')}\r\n\r\n".encode("utf-8") + body)
+        emails = []
+        for part in message.walk():
+            if part.get_param("name", header="content-disposition") == "file_contents":
+                content = part.get_payload(decode=True).decode("utf-8")
+                emails = [line.strip() for line in content.splitlines() if line.strip()]
+        if self._gate("millionverifier", credits=len(emails)):
+            return
+        file_id = self.simulator.create_job("millionverifier", emails)
+        self._send(200, {"file_id": file_id, "file_name": "emails.txt", "status": "in_progress",
+                         "total_rows": len(emails)})
+
+    def mv_bulk_fileinfo(self):
+        if self._gate("millionverifier", credits=0):
+            return
+        job = self.simulator.jobs.get(int(self._query().get("file_id", 0)))
+        if job is None:
+            self._send(200, {"error": "File not found"})
+            return
+        status = "finished" if self.simulator.job_done(job) else "in_progress"
+        self._send(200, {"file_id": self._query()["file_id"], "status": status, "total_rows": len(job["emails"])})
+
+    def mv_bulk_download(self):
+        if self._gate("millionverifier", credits=0):
+            return
+        job = self.simulator.jobs.get(int(self._query().get("file_id", 0)))
+        if job is None or not self.simulator.job_done(job):
+            self._send(200, {"error": "File is not ready"})
+            return
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(["email", "quality", "result", "free", "role"])
+        for email in job["emails"]:
+            mv_result, _ = verdict(email)
+            writer.writerow([email, "good" if mv_result == "ok" else "bad", mv_result, "no", "no"])
+        self._send(200, output.getvalue().encode("utf-8"), content_type="text/csv")
+
+    # --- NeverBounce ---
+
+    def nb_single(self):
+        if self._gate("neverbounce"):
+            return
+        _, nb_result = verdict(self._query().get("email", ""))
+        self._send(200, {"status": "success", "result": nb_result, "flags": ["has_dns"], "suggested_correction": "",
+                         "execution_time": 300})
+
+    def nb_jobs_create(self):
+        job_input = json.loads(self._read_body() or b"{}").get("input", [])
+        if self._gate("neverbounce", credits=len(job_input)):
+            return
+        job_id = self.simulator.create_job("neverbounce", job_input)
+        self._send(200, {"status": "success", "job_id": job_id, "execution_time": 100})
+
+    def nb_jobs_status(self):
+        if self._gate("neverbounce", credits=0):
+            return
+        job = self.simulator.jobs.get(int(self._query().get("job_id", 0)))
+        if job is None:
+            self._send(200, {"status": "general_failure", "message": "Job not found."})
+            return
+        done = self.simulator.job_done(job)
+        self._send(200, {"status": "success", "job_id": int(self._query()["job_id"]),
+                         "job_status": "complete" if done else "running",
+                         "total": {"records": len(job["emails"])}, "percent_complete": 100 if done else 50})
+
+    def nb_jobs_results(self):
+        if self._gate("neverbounce", credits=0):
+            return
+        query = self._query()
+        job = self.simulator.jobs.get(int(query.get("job_id", 0)))
+        if job is None or not self.simulator.job_done(job):
+            self._send(200, {"status": "general_failure", "message": "Job is not complete."})
+            return
+        page, per_page = int(query.get("page", 1)), int(query.get("items_per_page", 10))
+        rows = job["emails"][(page - 1) * per_page:page * per_page]
+        results = []
+        for row in rows:
+            _, nb_result = verdict(row.get("email", ""))
+            results.append({"data": row, "verification": {"result": nb_result, "flags": ["has_dns"]}})
+        self._send(200, {
+            "status": "success",
+            "total_results": len(job["emails"]),
+            "total_pages": max(1, math.ceil(len(job["emails"]) / per_page)),
+            "query": {"job_id": query["job_id"], "page": page, "items_per_page": per_page},
+            "results": results,
+        })
+
+    # --- Simulator ---
+
+    def stats(self):
+        self._send(200, self.simulator.stats())
+
+
+ROUTES = [
+    ("GET", re.compile(r"/propertyradar/v1/lists/([^/]+)/items"), SimulatorHandler.list_items),
+    ("GET", re.compile(r"/propertyradar/v1/properties/([^/]+)"), SimulatorHandler.property_details),
+    ("GET", re.compile(r"/propertyradar/v1/properties/([^/]+)/persons"), SimulatorHandler.property_persons),
+    ("GET", re.compile(r"/pdl/v5/person/enrich"), SimulatorHandler.pdl_enrich),
+    ("POST", re.compile(r"/pdl/v5/person/bulk"), SimulatorHandler.pdl_bulk),
+    ("GET", re.compile(r"/millionverifier/api/v3"), SimulatorHandler.mv_single),
+    ("POST", re.compile(r"/millionverifier/bulkapi/v2/upload"), SimulatorHandler.mv_bulk_upload),
+    ("GET", re.compile(r"/millionverifier/bulkapi/v2/fileinfo"), SimulatorHandler.mv_bulk_fileinfo),
+    ("GET", re.compile(r"/millionverifier/bulkapi/v2/download"), SimulatorHandler.mv_bulk_download),
+    ("GET", re.compile(r"/neverbounce/v[\d.]+/single/check"), SimulatorHandler.nb_single),
+    ("POST", re.compile(r"/neverbounce/v[\d.]+/jobs/create"), SimulatorHandler.nb_jobs_create),
+    ("GET", re.compile(r"/neverbounce/v[\d.]+/jobs/status"), SimulatorHandler.nb_jobs_status),
+    ("GET", re.compile(r"/neverbounce/v[\d.]+/jobs/results"), SimulatorHandler.nb_jobs_results),
+    ("GET", re.compile(r"/stats"), SimulatorHandler.stats),
+]
+
+
+def serve(host=SIMULATOR_HOST, port=SIMULATOR_PORT, profiles=None, list_size=SIMULATOR_LIST_SIZE,
+          seed=SIMULATOR_SEED):
+    """Builds the simulator server. Call `serve_forever()` on the result (or run it on a thread)."""
+    handler = type("BoundSimulatorHandler", (SimulatorHandler,),
+                   {"simulator": Simulator(profiles or load_profiles(), list_size, seed)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local simulator for the PropertyRadar, PDL and verification APIs.")
+    parser.add_argument("--host", default=SIMULATOR_HOST)
+    parser.add_argument("--port", type=int, default=SIMULATOR_PORT)
+    parser.add_argument("--profile", default=SIMULATOR_PROFILE_PATH,
+                        help="JSON file of per-vendor overrides, e.g. {\"pdl\": {\"throttle_rate\": 0.05}}.")
+    parser.add_argument("--list-size", type=int, default=SIMULATOR_LIST_SIZE, help="RadarIDs on every list.")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiplies every vendor's median latency.")
+    parser.add_argument("--error-rate", type=float, help="Overrides every vendor's 5xx rate.")
+    parser.add_argument("--throttle-rate", type=float, help="Overrides every vendor's random 429 rate.")
+    args = parser.parse_args()
+
+    profiles = load_profiles(args.profile)
+    for profile in profiles.values():
+        profile["latency_ms"] = profile.get("latency_ms", 0) * args.latency_scale
+        if args.error_rate is not None:
+            profile["error_rate"] = args.error_rate
+        if args.throttle_rate is not None:
+            profile["throttle_rate"] = args.throttle_rate
+
+    server = serve(args.host, args.port, profiles, args.list_size)
+    print(f"--- Vendor simulator listening on http://{args.host}:{args.port} ---")
+    print(f"    Run the workers with VENDOR_SIMULATOR_URL=http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n--- Vendor simulator stopped ---")
+        print(json.dumps(server.RequestHandlerClass.simulator.stats(), indent=2))
@@ -0,0 +1,79 @@
+import os
+import socket
+import sys
+import tempfile
+import threading
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# config.py reads the environment once, on first import, so the test settings
+# go in before any project module is imported. Every vendor call goes to the
+# local simulator and all local state lives in a throwaway directory.
+STATE_DIR = tempfile.mkdtemp(prefix="pipeline-tests-")
+SIMULATOR_PORT = _free_port()
+os.environ.update({
+    "VENDOR_SIMULATOR_URL": f"http://127.0.0.1:{SIMULATOR_PORT}",
+    "STORAGE_BACKEND": "sqlite",
+    "SQLITE_DATABASE_PATH": os.path.join(STATE_DIR, "pipeline.sqlite3"),
+    "RESULT_JOURNAL_DIR": os.path.join(STATE_DIR, "journal"),
+    "RAW_ARCHIVE_DIR": os.path.join(STATE_DIR, "archive"),
+    "RATE_LIMIT_DIR": os.path.join(STATE_DIR, "ratelimit"),
+    "PDL_CACHE_ENABLED": "false",
+    "VERIFICATION_CACHE_ENABLED": "false",
+    "VERIFICATION_BULK_POLL_INTERVAL": "0.1",
+    "WAKEUP_ENABLED": "false",
+    "METRICS_PORT": "0",
+})
+for vendor in ("PROPERTY_RADAR", "PDL", "MILLIONVERIFIER", "NEVERBOUNCE"):
+    os.environ[f"{vendor}_RATE_PER_SEC"] = "0" # The client-side limiter is not under test
+
+
+@pytest.fixture(scope="session")
+def simulator():
+    """The vendor simulator on SIMULATOR_PORT, with latency and failure injection off."""
+    from simulator import vendor_simulator
+
+    profiles = vendor_simulator.load_profiles()
+    for profile in profiles.values():
+        profile.update({"latency_ms": 0, "error_rate": 0, "throttle_rate": 0, "rate_per_sec": None,
+                        "bulk_job_seconds": 0})
+    server = vendor_simulator.serve("127.0.0.1", SIMULATOR_PORT, profiles)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.RequestHandlerClass.simulator
+    server.shutdown()
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    """A fresh SQLite database, used by every module that holds the storage backend."""
+    from core import database, work_queue
+    from core.storage.base import InstrumentedStorage
+    from core.storage.sqlite_backend import SQLiteStorage
+    from workers import ingest_worker, verification_worker
+
+    backend = InstrumentedStorage(SQLiteStorage(str(tmp_path / "pipeline.sqlite3")))
+    monkeypatch.setattr(database, "storage", backend)
+    monkeypatch.setattr(work_queue, "storage", backend)
+    monkeypatch.setattr(ingest_worker, "storage", backend)
+    monkeypatch.setattr(verification_worker, "storage", backend)
+    monkeypatch.setattr(work_queue, "RESULT_JOURNAL_DIR", str(tmp_path / "journal"))
+    return backend
+
+
+@pytest.fixture
+def seed_owner(storage):
+    """Adds an unleased owner to the test database."""
+    def seed(person_key, processing_status="pending_enrichment", **columns):
+        storage.upsert("owners", [{"person_key": person_key, "processing_status": processing_status,
+                                   "claimed_by": None, "lease_expires_at": None, **columns}])
+    return seed
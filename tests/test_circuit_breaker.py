@@ -0,0 +1,184 @@
+import pytest
+import requests
+
+from core import circuit_breaker
+from core.api_clients import http_session, pdl_client
+from core.circuit_breaker import CircuitBreaker, CircuitOpenError, RetryBudget
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Stands in for time.monotonic in the breaker and retry budget; advance it with `clock.now += seconds`."""
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", clock)
+    return clock
+
+
+# --- CircuitBreaker ---
+
+def test_breaker_opens_after_the_threshold_of_failures_in_a_row(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success() # A success resets the count
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert breaker.retry_in() == 30
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_breaker_lets_one_probe_through_after_the_reset_timeout(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 30
+
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow() # The probe is still out
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_a_failed_probe_opens_the_breaker_again(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert breaker.retry_in() == 30
+
+
+def test_a_probe_that_never_reports_back_frees_its_slot(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+
+    clock.now += 29
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.allow()
+
+
+def test_only_5xx_statuses_count_as_failures(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30)
+    breaker.record_status(404)
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_status(503)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+# --- RetryBudget ---
+
+def test_retry_budget_caps_retries_at_its_share_of_calls(clock):
+    budget = RetryBudget("test", ratio=0.5, minimum_per_second=0, capacity=2)
+    assert budget.try_spend()
+    assert budget.try_spend()
+    assert not budget.try_spend() # The saved retries are used up
+
+    budget.record_call()
+    assert not budget.try_spend() # Half a retry per call
+    budget.record_call()
+    assert budget.try_spend()
+
+
+def test_retry_budget_refills_at_the_minimum_rate_and_never_past_capacity(clock):
+    budget = RetryBudget("test", ratio=0.5, minimum_per_second=1, capacity=2)
+    assert budget.try_spend() and budget.try_spend()
+    assert not budget.try_spend()
+
+    clock.now += 1
+    assert budget.try_spend()
+
+    clock.now += 60
+    for _ in range(10):
+        budget.record_call()
+    assert budget.try_spend() and budget.try_spend()
+    assert not budget.try_spend()
+
+
+# --- SDK calls ---
+
+class ThrottledError(Exception):
+    pass
+
+
+def http_error(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    return requests.exceptions.HTTPError(f"{status_code} error", response=response)
+
+
+@pytest.fixture
+def sdk_breaker(clock, monkeypatch):
+    """The breaker and an ample retry budget used by call_with_retry, with no backoff sleeps."""
+    breaker = CircuitBreaker("test-sdk", failure_threshold=100, reset_timeout=30)
+    budget = RetryBudget("test-sdk", capacity=100)
+    monkeypatch.setattr(http_session, "vendor_breaker", lambda vendor: breaker)
+    monkeypatch.setattr(http_session, "vendor_retry_budget", lambda vendor: budget)
+    monkeypatch.setattr(http_session, "backoff_delay", lambda attempt: 0)
+    return breaker
+
+
+def failing_call(err, calls):
+    def call():
+        calls.append(err)
+        raise err
+    return call
+
+
+@pytest.mark.parametrize("err", [http_error(503), http_error(429), ThrottledError("slow down"),
+                                 requests.exceptions.Timeout("timed out")])
+def test_sdk_outage_errors_are_retried_and_count_as_failures(sdk_breaker, err):
+    calls = []
+    with pytest.raises(type(err)):
+        http_session.call_with_retry("test-sdk", failing_call(err, calls), throttled_on=(ThrottledError,))
+
+    assert len(calls) == http_session.HTTP_MAX_RETRIES + 1
+    assert sdk_breaker._failures == len(calls)
+
+
+def test_a_rejected_sdk_request_is_neither_retried_nor_a_success(sdk_breaker):
+    sdk_breaker.record_failure()
+    calls = []
+    with pytest.raises(requests.exceptions.HTTPError):
+        http_session.call_with_retry("test-sdk", failing_call(http_error(400), calls))
+
+    assert len(calls) == 1
+    assert sdk_breaker._failures == 1 # Not reset by the rejected call
+
+
+def test_a_returned_sdk_call_closes_the_breaker(sdk_breaker):
+    sdk_breaker.record_failure()
+    assert http_session.call_with_retry("test-sdk", lambda: "ok") == "ok"
+    assert sdk_breaker._failures == 0
+
+
+# --- PDL bulk items ---
+
+@pytest.mark.parametrize("status, deferred", [(429, True), (503, True), (400, False)])
+def test_throttled_and_failed_bulk_items_are_deferred(status, deferred):
+    result = pdl_client._parse_bulk_item({"status": status, "error": {"message": "nope"}})
+    assert result["success"] is False
+    assert result["deferred"] is deferred
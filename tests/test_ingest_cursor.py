@@ -0,0 +1,87 @@
+import itertools
+import json
+
+import pytest
+
+from core.api_clients import property_radar_client
+from workers import ingest_worker
+
+LIST_ID = "test-list"
+
+
+@pytest.fixture
+def cursor_path(tmp_path, monkeypatch):
+    path = tmp_path / "ingest_cursor.json"
+    monkeypatch.setattr(ingest_worker, "INGEST_CURSOR_PATH", str(path))
+    return path
+
+
+@pytest.fixture
+def list_pages(monkeypatch):
+    """`list_pages(pages)` serves the given lists of RadarIDs as the list's pages, with an optional failure."""
+    requested_at = []
+
+    def serve(pages, fail_at=None):
+        def iter_list_pages(list_id, page_size=1000, start=0):
+            offset = 0
+            for number, radar_ids in enumerate(pages):
+                if offset >= start:
+                    requested_at.append(offset)
+                    if number == fail_at:
+                        yield {"success": False, "error": "503 Server Error", "start": offset, "is_last": True}
+                        return
+                    yield {"success": True, "data": [{"RadarID": radar_id} for radar_id in radar_ids],
+                           "start": offset, "is_last": number == len(pages) - 1}
+                offset += len(radar_ids)
+        monkeypatch.setattr(property_radar_client, "iter_list_pages", iter_list_pages)
+        return requested_at
+    return serve
+
+
+def test_the_cursor_moves_only_once_a_page_is_done(cursor_path, list_pages):
+    list_pages([["R1", "R2"], ["R3", "R4"], ["R5"]])
+    pages = ingest_worker.iter_list_radar_id_pages(LIST_ID)
+
+    assert next(pages) == ["R1", "R2"]
+    assert not cursor_path.exists() # The caller has not finished the first page yet
+    assert next(pages) == ["R3", "R4"]
+    assert json.loads(cursor_path.read_text()) == {LIST_ID: 2}
+
+
+def test_an_interrupted_walk_resumes_at_the_first_unfinished_page(cursor_path, list_pages):
+    requested_at = list_pages([["R1", "R2"], ["R3", "R4"], ["R5"]])
+    pages = ingest_worker.iter_list_radar_id_pages(LIST_ID)
+    next(pages)
+    next(pages)
+    pages.close() # Interrupted while the second page was being processed
+
+    assert list(ingest_worker.iter_list_radar_id_pages(LIST_ID)) == [["R3", "R4"], ["R5"]]
+    assert requested_at[-2:] == [2, 4]
+    assert ingest_worker.load_list_cursor(LIST_ID) == 0 # Cleared at the end of the list
+
+
+def test_a_failed_page_keeps_the_cursor(cursor_path, list_pages):
+    list_pages([["R1", "R2"], ["R3", "R4"], ["R5"]], fail_at=1)
+
+    assert list(ingest_worker.iter_list_radar_id_pages(LIST_ID)) == [["R1", "R2"]]
+    assert ingest_worker.load_list_cursor(LIST_ID) == 2
+
+
+def test_cursors_of_other_lists_are_kept(cursor_path, list_pages):
+    ingest_worker.save_list_cursor("other-list", 500)
+    list_pages([["R1"]])
+
+    list(ingest_worker.iter_list_radar_id_pages(LIST_ID))
+
+    assert json.loads(cursor_path.read_text()) == {"other-list": 500}
+
+
+def test_pages_from_the_list_api_resume_at_the_cursor(cursor_path, simulator):
+    full_walk = list(itertools.islice(ingest_worker.iter_list_radar_id_pages(LIST_ID, page_size=5), 3))
+    ingest_worker.save_list_cursor(LIST_ID, 5)
+
+    resumed = ingest_worker.iter_list_radar_id_pages(LIST_ID, page_size=5)
+
+    assert next(resumed) == full_walk[1]
+    assert next(resumed) == full_walk[2]
+    assert ingest_worker.load_list_cursor(LIST_ID) == 10
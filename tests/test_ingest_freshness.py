@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from core.api_clients import property_radar_client
+from workers import ingest_worker
+
+
+@pytest.fixture
+def radar_ids(simulator):
+    items = property_radar_client.get_radar_ids_from_list("test-list", 3)["data"]
+    return [item["RadarID"] for item in items]
+
+
+def ingest(radar_ids):
+    write_buffer = ingest_worker.IngestWriteBuffer(max_records=1000, max_interval=3600)
+    outcomes = ingest_worker.process_radar_ids_concurrently(radar_ids, write_buffer, incremental=True)
+    write_buffer.flush()
+    return outcomes
+
+
+def age_properties(storage, radar_ids, days):
+    fetched_at = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+    storage.update("properties", radar_ids, {"last_fetched_at": fetched_at})
+
+
+def property_rows(storage, radar_ids):
+    return {row["radar_id"]: row for row in
+            storage.fetch("properties", radar_ids, ["radar_id", "address", "content_hash", "last_fetched_at"])}
+
+
+def test_recently_fetched_properties_are_not_bought_again(storage, simulator, radar_ids):
+    assert ingest(radar_ids) == {"new": 3}
+    propertyradar = simulator.vendors["propertyradar"]
+    requests_before = propertyradar.counts["requests"]
+
+    assert ingest(radar_ids) == {"skipped_fresh": 3}
+    assert propertyradar.counts["requests"] == requests_before
+
+
+def test_a_stale_property_with_unchanged_content_is_only_touched(storage, simulator, radar_ids):
+    ingest(radar_ids)
+    age_properties(storage, radar_ids, ingest_worker.INGEST_MAX_AGE_DAYS + 1)
+    # A column edited in the database shows whether the row was rewritten
+    storage.update("properties", radar_ids[:1], {"address": "edited"})
+    before = property_rows(storage, radar_ids)
+
+    assert ingest(radar_ids) == {"unchanged": 3}
+
+    after = property_rows(storage, radar_ids)
+    assert after[radar_ids[0]]["address"] == "edited"
+    assert all(after[key]["last_fetched_at"] > before[key]["last_fetched_at"] for key in radar_ids)
+
+
+def test_a_stale_property_whose_content_changed_is_rewritten(storage, simulator, radar_ids):
+    ingest(radar_ids)
+    content_hash = property_rows(storage, radar_ids)[radar_ids[0]]["content_hash"]
+    age_properties(storage, radar_ids, ingest_worker.INGEST_MAX_AGE_DAYS + 1)
+    storage.update("properties", radar_ids[:1], {"address": "edited", "content_hash": "an older hash"})
+
+    assert ingest(radar_ids) == {"refreshed": 1, "unchanged": 2}
+
+    row = property_rows(storage, radar_ids)[radar_ids[0]]
+    assert row["address"] != "edited"
+    assert row["content_hash"] == content_hash
+
+
+def test_the_content_hash_ignores_bookkeeping_fields():
+    record = {"radar_id": "R1", "address": "1 Main St", "beds": 3}
+    stamped = {**record, "last_fetched_at": "2026-01-01T00:00:00+00:00", "content_hash": "abc"}
+
+    assert ingest_worker.compute_record_hash(stamped) == ingest_worker.compute_record_hash(record)
+    assert ingest_worker.compute_record_hash({**record, "beds": 4}) != ingest_worker.compute_record_hash(record)
+
+
+@pytest.mark.parametrize("last_fetched_at, fresh", [
+    (datetime.now(timezone.utc).isoformat(), True),
+    (datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"), True),
+    (datetime.utcnow().isoformat(), True), # No time zone: taken as UTC
+    ((datetime.now(timezone.utc) - timedelta(days=365)).isoformat(), False),
+    ("not a timestamp", False),
+    (None, False),
+])
+def test_freshness_of_stored_timestamps(last_fetched_at, fresh):
+    assert ingest_worker._is_fresh({"last_fetched_at": last_fetched_at}) is fresh
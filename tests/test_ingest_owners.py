@@ -0,0 +1,116 @@
+import pytest
+
+from benchmarks.local_database import LocalDatabase
+from core.storage.sqlite_backend import SQLiteStorage
+from core.storage.supabase_backend import SupabaseStorage
+from workers import ingest_worker
+
+
+def property_record(radar_id):
+    return {"radar_id": radar_id, "address": f"{radar_id} Main St", "city": "Taunton", "state": "MA"}
+
+
+def owner_record(person_key, radar_id, processing_status="pending_enrichment", **columns):
+    return {"person_key": person_key, "radar_id": radar_id, "first_name": "Jane", "last_name": person_key,
+            "processing_status": processing_status, **columns}
+
+
+def owner_row(storage, person_key):
+    return storage.fetch("owners", [person_key], ["processing_status", "radar_id", "radar_ids", "first_name"])[0]
+
+
+@pytest.fixture
+def write_buffer(storage):
+    return ingest_worker.IngestWriteBuffer(max_records=1000, max_interval=3600)
+
+
+# --- Owner dedupe ---
+
+def test_an_owner_on_many_properties_is_written_once_with_all_of_them(storage, write_buffer):
+    for radar_id in ("R1", "R2", "R3"):
+        write_buffer.add(property_record(radar_id), [owner_record("llc", radar_id)])
+
+    assert write_buffer.flush() == (3, 1)
+    assert write_buffer.owner_index.duplicates == 2
+    row = owner_row(storage, "llc")
+    assert row["radar_id"] == "R1"
+    assert row["radar_ids"] == ["R1", "R2", "R3"]
+
+
+def test_later_sightings_in_the_run_only_attach_the_property(storage, write_buffer):
+    write_buffer.add(property_record("R1"), [owner_record("llc", "R1", first_name="Original")])
+    write_buffer.flush()
+
+    write_buffer.add(property_record("R2"), [owner_record("llc", "R2", first_name="Changed")])
+    assert write_buffer.flush() == (1, 0)
+
+    row = owner_row(storage, "llc")
+    assert row["first_name"] == "Original"
+    assert row["radar_ids"] == ["R1", "R2"]
+
+
+def test_an_owner_past_ingestion_is_never_rewritten(storage, seed_owner, write_buffer):
+    seed_owner("done", "complete", radar_id="R0", radar_ids=["R0"], first_name="Kept")
+
+    write_buffer.add(property_record("R1"), [owner_record("done", "R1", first_name="Changed")])
+    write_buffer.flush()
+
+    assert owner_row(storage, "done") == {"processing_status": "complete", "radar_id": "R0",
+                                          "radar_ids": ["R0", "R1"], "first_name": "Kept"}
+
+
+def test_an_owner_advanced_after_the_preload_is_not_reset(storage, seed_owner, write_buffer):
+    seed_owner("racing", "pending_enrichment", radar_id="R0", radar_ids=["R0"], first_name="Kept")
+    write_buffer.add(property_record("R1"), [owner_record("racing", "R1", first_name="Changed")])
+    write_buffer.owner_index.preload(["racing"])
+    # An enrichment worker finishes the owner between the preload and the write
+    storage.update("owners", ["racing"], {"processing_status": "pending_post_enrichment_verification"})
+
+    assert write_buffer.flush() == (1, 0)
+
+    assert owner_row(storage, "racing") == {"processing_status": "pending_post_enrichment_verification",
+                                            "radar_id": "R0", "radar_ids": ["R0", "R1"], "first_name": "Kept"}
+
+
+def test_an_owner_whose_write_failed_is_written_on_its_next_sighting(storage, write_buffer, monkeypatch):
+    def unavailable(records, statuses):
+        raise ConnectionError("database unreachable")
+
+    upsert_owners = storage.backend.upsert_owners
+    monkeypatch.setattr(storage.backend, "upsert_owners", unavailable)
+    write_buffer.add(property_record("R1"), [owner_record("p1", "R1")])
+    assert write_buffer.flush() == (1, 0)
+
+    monkeypatch.setattr(storage.backend, "upsert_owners", upsert_owners)
+    write_buffer.add(property_record("R2"), [owner_record("p1", "R2")])
+    assert write_buffer.flush() == (1, 1)
+    assert owner_row(storage, "p1")["radar_ids"] == ["R2"]
+
+
+# --- Guarded upsert in both backends ---
+
+@pytest.fixture(params=["sqlite", "supabase"])
+def backend(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteStorage(str(tmp_path / "pipeline.sqlite3"))
+    return SupabaseStorage(LocalDatabase())
+
+
+def test_upsert_owners_inserts_new_owners_and_only_rewrites_ingested_ones(backend):
+    backend.upsert("owners", [
+        {"person_key": "waiting", "processing_status": "pending_verification", "first_name": "Old"},
+        {"person_key": "done", "processing_status": "complete", "first_name": "Old",
+         "enriched_emails": ["jane@example.com"]},
+    ])
+    records = [owner_record(key, "R1", radar_ids=["R1"], first_name="New") for key in ("new", "waiting", "done")]
+
+    written = backend.upsert_owners(records, ingest_worker.INGESTION_STATUSES)
+
+    assert written == {"new", "waiting"}
+    rows = {row["person_key"]: row for row in
+            backend.fetch("owners", ["new", "waiting", "done"],
+                          ["person_key", "processing_status", "first_name", "enriched_emails"])}
+    assert rows["new"]["first_name"] == "New"
+    assert rows["waiting"]["processing_status"] == "pending_enrichment"
+    assert rows["done"] == {"person_key": "done", "processing_status": "complete", "first_name": "Old",
+                            "enriched_emails": ["jane@example.com"]}
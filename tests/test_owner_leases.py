@@ -0,0 +1,100 @@
+import multiprocessing
+
+import pytest
+
+from benchmarks.local_database import LocalDatabase
+from core.storage.sqlite_backend import SQLiteStorage
+from core.storage.supabase_backend import SupabaseStorage
+
+STATUSES = ["pending_verification", "pending_post_enrichment_verification"]
+
+
+@pytest.fixture(params=["sqlite", "supabase"])
+def backend(request, tmp_path):
+    """Each backend with ten owners waiting for verification and one past it."""
+    if request.param == "sqlite":
+        backend = SQLiteStorage(str(tmp_path / "pipeline.sqlite3"))
+    else:
+        backend = SupabaseStorage(LocalDatabase())
+    backend.upsert("owners", [{"person_key": f"p{number}", "processing_status": STATUSES[number % 2],
+                               "claimed_by": None, "lease_expires_at": None} for number in range(10)])
+    backend.upsert("owners", [{"person_key": "done", "processing_status": "complete",
+                               "claimed_by": None, "lease_expires_at": None}])
+    return backend
+
+
+def keys(rows):
+    return {row["person_key"] for row in rows}
+
+
+def test_workers_claim_disjoint_batches(backend):
+    first = backend.claim_owners(STATUSES, "worker-1", 4, 60)
+    second = backend.claim_owners(STATUSES, "worker-2", 4, 60)
+    third = backend.claim_owners(STATUSES, "worker-3", 4, 60)
+
+    assert (len(first), len(second), len(third)) == (4, 4, 2)
+    assert keys(first) | keys(second) | keys(third) == {f"p{number}" for number in range(10)}
+    assert all(row["claimed_by"] == "worker-1" for row in first)
+    assert backend.claim_owners(STATUSES, "worker-4", 4, 60) == []
+
+
+def test_only_the_requested_statuses_are_claimed(backend):
+    claimed = backend.claim_owners(["pending_verification"], "worker-1", 100, 60)
+    assert keys(claimed) == {f"p{number}" for number in range(0, 10, 2)}
+
+
+def test_an_expired_lease_is_claimed_again(backend):
+    stale = backend.claim_owners(STATUSES, "crashed-worker", 10, -1)
+
+    reclaimed = backend.claim_owners(STATUSES, "worker-2", 10, 60)
+
+    assert keys(reclaimed) == keys(stale)
+    assert backend.fetch("owners", ["p0"], ["claimed_by"]) == [{"claimed_by": "worker-2"}]
+
+
+def test_an_extended_lease_is_not_claimed_again(backend):
+    backend.claim_owners(STATUSES, "worker-1", 10, -1)
+    backend.extend_leases("worker-1", ["p0", "p1"], 60)
+
+    reclaimed = backend.claim_owners(STATUSES, "worker-2", 10, 60)
+
+    assert keys(reclaimed) == {f"p{number}" for number in range(2, 10)}
+
+
+def test_only_the_lease_holder_can_write(backend):
+    backend.claim_owners(STATUSES, "worker-1", 10, 60)
+
+    assert not backend.update_owner("p0", {"processing_status": "complete"}, claimed_by="worker-2")
+    assert backend.update_owner("p0", {"processing_status": "complete"}, claimed_by="worker-1")
+    assert backend.apply_owner_updates("worker-2", [{"person_key": "p1", "processing_status": "complete"}]) == set()
+    assert backend.apply_owner_updates("worker-1", [{"person_key": "p1", "processing_status": "complete"}]) == {"p1"}
+    assert backend.fetch("owners", ["p1"], ["processing_status", "claimed_by", "lease_expires_at"]) == [
+        {"processing_status": "complete", "claimed_by": None, "lease_expires_at": None}]
+
+
+def _claim_all(path, worker_id, results):
+    backend = SQLiteStorage(path)
+    claimed = []
+    while True:
+        batch = backend.claim_owners(STATUSES, worker_id, 3, 60)
+        if not batch:
+            break
+        claimed.extend(row["person_key"] for row in batch)
+    results.put(claimed)
+
+
+def test_processes_sharing_a_sqlite_file_never_claim_the_same_owner(tmp_path):
+    path = str(tmp_path / "pipeline.sqlite3")
+    SQLiteStorage(path).upsert("owners", [{"person_key": f"p{number:03}", "processing_status": "pending_verification"}
+                                          for number in range(300)])
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    processes = [context.Process(target=_claim_all, args=(path, f"worker-{number}", results)) for number in range(4)]
+    for process in processes:
+        process.start()
+    claimed = [key for _ in processes for key in results.get(timeout=60)]
+    for process in processes:
+        process.join()
+
+    assert len(claimed) == 300
+    assert len(set(claimed)) == 300
@@ -0,0 +1,79 @@
+import pytest
+
+from core.api_clients import pdl_client, http_session
+
+PEOPLE = {
+    "p1": {"first_name": "Jane", "last_name": "Doe", "street_address": "1 Main St", "locality": "Taunton",
+           "region": "MA", "postal_code": "02780"},
+    "p2": {"first_name": "John", "last_name": "Roe", "street_address": "2 Main St", "locality": "Taunton",
+           "region": "MA", "postal_code": "02780"},
+    "p3": {"first_name": "Ann", "last_name": "Poe", "street_address": "3 Main St", "locality": "Taunton",
+           "region": "MA", "postal_code": "02780"},
+}
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, body):
+        self.body = body
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.body
+
+
+@pytest.fixture
+def bulk_response(monkeypatch):
+    """Answers every PDL bulk call with the given body instead of calling the API."""
+    def answer_with(body):
+        monkeypatch.setattr(http_session, "request", lambda *args, **kwargs: FakeResponse(body))
+    return answer_with
+
+
+def test_every_requested_person_gets_a_result(simulator):
+    pdl = simulator.vendors["pdl"]
+    credits_before = pdl.counts["credits_used"]
+    people = {**PEOPLE, "empty": {}}
+
+    results = pdl_client.bulk_enrich_people(people)
+
+    assert set(results) == set(people)
+    assert results["empty"]["success"] is False # Nothing to look up, so nothing sent
+    assert all("status_code" in results[key] for key in PEOPLE)
+    assert pdl.counts["credits_used"] - credits_before == len(PEOPLE)
+
+
+def test_results_are_keyed_by_the_requested_person_not_the_metadata(bulk_response):
+    bulk_response([
+        {"status": 200, "data": {"full_name": "first"}, "metadata": {"person_key": "p2"}},
+        {"status": 404, "metadata": {"person_key": "p1"}},
+        {"status": 200, "data": {"full_name": "third"}},
+    ])
+
+    results = pdl_client.bulk_enrich_people(PEOPLE)
+
+    assert results["p1"]["data"] == {"full_name": "first"}
+    assert results["p2"]["status_code"] == 404
+    assert results["p3"]["data"] == {"full_name": "third"}
+
+
+def test_a_non_list_body_fails_the_whole_chunk(bulk_response):
+    bulk_response({"error": {"type": "invalid_request_error", "message": "Bad request"}})
+
+    results = pdl_client.bulk_enrich_people(PEOPLE)
+
+    assert set(results) == set(PEOPLE)
+    assert not any(result["success"] for result in results.values())
+
+
+def test_people_missing_from_a_short_response_get_an_error(bulk_response):
+    bulk_response([{"status": 200, "data": {"full_name": "first"}, "metadata": {"person_key": "p1"}}])
+
+    results = pdl_client.bulk_enrich_people(PEOPLE)
+
+    assert results["p1"]["success"] is True
+    assert results["p2"]["success"] is False
+    assert results["p3"]["success"] is False
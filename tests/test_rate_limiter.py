@@ -0,0 +1,132 @@
+import json
+import multiprocessing
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from core import rate_limiter
+from core.api_clients import pdl_client, verifier_client
+from core.rate_limiter import SharedRateLimiter
+
+PEOPLE = {
+    f"p{number}": {"first_name": "Jane", "last_name": f"Doe{number}", "street_address": f"{number} Main St",
+                   "locality": "Taunton", "region": "MA", "postal_code": "02780"}
+    for number in range(3)
+}
+
+
+@pytest.fixture
+def budget(tmp_path, monkeypatch):
+    """`budget(vendor, daily_credits)` gives the vendor a fresh shared limiter with that daily budget and no rate limit."""
+    def set_budget(vendor, daily_credits):
+        limiter = SharedRateLimiter(vendor, 0, daily_credits=daily_credits, directory=str(tmp_path))
+        monkeypatch.setitem(rate_limiter._vendor_limiters, vendor, limiter)
+        return limiter
+    return set_budget
+
+
+def _acquire_many(directory, count):
+    limiter = SharedRateLimiter("test", 0, directory=directory)
+    for _ in range(count):
+        limiter.acquire(credits=2)
+
+
+# --- SharedRateLimiter ---
+
+def test_processes_share_one_usage_count(tmp_path):
+    processes = [multiprocessing.get_context("fork").Process(target=_acquire_many, args=(str(tmp_path), 25))
+                 for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    usage = SharedRateLimiter("test", 0, directory=str(tmp_path)).usage()
+    assert usage["requests"] == 100
+    assert usage["credits_used"] == 200
+
+
+def test_the_daily_budget_is_shared_between_limiters(tmp_path):
+    first = SharedRateLimiter("test", 0, daily_credits=10, directory=str(tmp_path))
+    second = SharedRateLimiter("test", 0, daily_credits=10, directory=str(tmp_path))
+
+    first.acquire(credits=6)
+    assert second.credits_available() == 4
+    assert second.budget_resets_in() == 0
+    second.acquire(credits=4)
+
+    assert first.credits_available() == 0
+    assert 0 < first.budget_resets_in() <= 24 * 3600
+    assert first._take(1)[0] == "budget" # acquire() would now pause until midnight UTC
+    with pytest.raises(ValueError):
+        first.acquire(credits=11) # Could never fit
+
+
+def test_the_budget_resets_on_a_new_day(tmp_path):
+    yesterday = (datetime.now(timezone.utc) - timedelta(days=1)).strftime("%Y-%m-%d")
+    (tmp_path / "test.json").write_text(json.dumps({"day": yesterday, "credits_used": 10, "requests": 10}))
+
+    limiter = SharedRateLimiter("test", 0, daily_credits=10, directory=str(tmp_path))
+
+    assert limiter.credits_available() == 10
+    assert limiter.usage()["requests"] == 0
+
+
+def test_requests_beyond_the_burst_wait_for_tokens(tmp_path):
+    limiter = SharedRateLimiter("test", 1, burst=2, directory=str(tmp_path))
+    assert limiter._take(1) == (None, 0)
+    assert limiter._take(1) == (None, 0)
+
+    reason, wait = limiter._take(1)
+
+    assert reason == "rate"
+    assert 0 < wait <= 1
+
+
+def test_a_limiter_without_a_budget_has_no_credit_limit(tmp_path):
+    limiter = SharedRateLimiter("test", 0, directory=str(tmp_path))
+    limiter.acquire(credits=1000)
+    assert limiter.credits_available() is None
+    assert limiter.budget_resets_in() == 0
+
+
+# --- Bulk calls within the budget ---
+
+def test_bulk_enrichment_only_sends_what_the_budget_can_pay_for(simulator, budget):
+    pdl = simulator.vendors["pdl"]
+    credits_before = pdl.counts["credits_used"]
+    budget("pdl", 2)
+
+    results = pdl_client.bulk_enrich_people(PEOPLE)
+
+    assert pdl.counts["credits_used"] - credits_before == 2
+    sent = [key for key, result in results.items() if "status_code" in result]
+    deferred = [key for key, result in results.items() if result.get("deferred")]
+    assert len(sent) == 2
+    assert deferred == sorted(set(PEOPLE) - set(sent))
+
+
+def test_bulk_verification_defers_the_emails_over_budget(simulator, budget):
+    millionverifier = simulator.vendors["millionverifier"]
+    credits_before = millionverifier.counts["credits_used"]
+    budget("millionverifier", 1)
+    budget("neverbounce", 0)
+
+    results = verifier_client.verify_bulk(["first@example.com", "second@example.com"], [])
+
+    assert millionverifier.counts["credits_used"] - credits_before == 1
+    assert results["millionverifier"]["first@example.com"]["success"] is True
+    assert results["millionverifier"]["second@example.com"] == {
+        "success": False, "error": "MillionVerifier's daily credit budget is used up.", "deferred": True}
+
+
+def test_bulk_verification_with_no_budget_left_submits_nothing(simulator, budget):
+    millionverifier = simulator.vendors["millionverifier"]
+    requests_before = millionverifier.counts["requests"]
+    budget("millionverifier", 1).acquire()
+    budget("neverbounce", 0)
+
+    results = verifier_client.verify_bulk(["first@example.com"], [])
+
+    assert millionverifier.counts["requests"] == requests_before
+    assert results["millionverifier"]["first@example.com"]["deferred"] is True
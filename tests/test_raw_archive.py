@@ -0,0 +1,95 @@
+import gzip
+import json
+import subprocess
+
+import pytest
+
+from core.archive import RawArchive
+
+
+@pytest.fixture
+def archive(tmp_path):
+    """An archive that only writes when flushed or once 1000 records are pending."""
+    return RawArchive("pdl", directory=str(tmp_path), flush_size=1000, flush_interval=3600)
+
+
+def operations(records):
+    return [record["operation"] for record in records]
+
+
+def test_records_are_found_by_each_index_field(archive):
+    archive.record_call("enrich", request={"name": "Jane"}, response={"likelihood": 9}, status_code=200,
+                        person_key="p1", radar_id="R1", email="Jane@Example.com")
+    archive.record_call("enrich", request={"name": "John"}, status_code=404, person_key="p2", radar_id="R1")
+
+    found = list(archive.find(email=" jane@example.COM "))
+    assert len(found) == 1
+    assert found[0]["request"] == {"name": "Jane"}
+    assert found[0]["response"] == {"likelihood": 9}
+    assert found[0]["status_code"] == 200
+    assert [record["status_code"] for record in archive.find(radar_id="R1")] == [200, 404]
+    assert [record["status_code"] for record in archive.find(radar_id="R1", person_key="p2")] == [404]
+    assert list(archive.find(person_key="nobody")) == []
+
+
+def test_a_record_can_be_indexed_under_many_values(archive):
+    archive.append({"operation": "verify"}, email=["first@example.com", "second@example.com", None, ""],
+                   person_key=None)
+
+    assert operations(archive.find(email="second@example.com")) == ["verify"]
+    assert operations(archive.find(email="first@example.com")) == ["verify"]
+
+
+def test_lookups_decompress_only_the_matching_blocks(archive):
+    for number in range(3):
+        archive.append({"operation": f"call-{number}"}, person_key=f"p{number}")
+        archive.flush()
+
+    segment, = archive.segments()
+    entries = [json.loads(line) for line in open(segment + ".idx")]
+    assert [entry[:2] for entry in entries] == [["person_key", "p0"], ["person_key", "p1"], ["person_key", "p2"]]
+    assert len({(offset, length) for _, _, offset, length, _ in entries}) == 3
+
+    with open(segment, "rb") as f:
+        data = f.read()
+    _, _, offset, length, number = entries[1]
+    assert json.loads(gzip.decompress(data[offset:offset + length]).splitlines()[number]) == {"operation": "call-1"}
+    assert operations(archive.find(person_key="p1")) == ["call-1"]
+
+
+def test_segments_rotate_and_read_back_in_order(tmp_path):
+    archive = RawArchive("pdl", directory=str(tmp_path), segment_bytes=1, flush_size=1, flush_interval=3600)
+    for number in range(3):
+        archive.append({"operation": f"call-{number}"}, radar_id="R1")
+
+    assert len(archive.segments()) == 3
+    assert operations(archive.find(radar_id="R1")) == ["call-0", "call-1", "call-2"]
+    assert operations(archive.iter_records()) == ["call-0", "call-1", "call-2"]
+
+
+def test_buffered_records_are_flushed_before_reading(archive):
+    archive.append({"operation": "pending"}, radar_id="R1")
+    assert archive.segments() == []
+
+    assert operations(archive.find(radar_id="R1")) == ["pending"]
+    assert operations(archive.iter_records()) == ["pending"]
+
+
+def test_a_segment_reads_back_as_one_gzip_stream(archive):
+    archive.append({"operation": "first"}, radar_id="R1")
+    archive.flush()
+    archive.append({"operation": "second"}, radar_id="R2")
+    archive.flush()
+
+    segment, = archive.segments()
+    output = subprocess.run(["zcat", segment], capture_output=True, text=True, check=True).stdout
+    assert operations(json.loads(line) for line in output.splitlines()) == ["first", "second"]
+
+
+def test_only_index_fields_are_accepted(archive):
+    with pytest.raises(ValueError):
+        archive.append({}, address="1 Main St")
+    with pytest.raises(ValueError):
+        list(archive.find(address="1 Main St"))
+    with pytest.raises(ValueError):
+        list(archive.find())
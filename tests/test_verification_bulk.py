@@ -0,0 +1,151 @@
+import functools
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from core import work_queue
+from core.api_clients import verifier_client
+from core.cache import DiskCache
+from workers import verification_worker
+
+CACHED_VERDICT = {"success": True, "data": {"result": "invalid", "subresult": "invalid"}}
+
+
+@pytest.fixture
+def verdict_cache(tmp_path, monkeypatch):
+    cache = DiskCache(str(tmp_path / "verdicts.sqlite3"), ttl=3600, max_entries=1000, name="verification")
+    monkeypatch.setattr(verification_worker, "verdict_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def result_buffer(storage, monkeypatch):
+    """A write buffer journaling into the test's own directory."""
+    buffer = work_queue.ResultWriteBuffer("verification")
+    monkeypatch.setattr(verification_worker, "result_buffer", buffer)
+    return buffer
+
+
+@pytest.fixture
+def bulk_calls(monkeypatch):
+    """Records the email lists each verify_bulk call hands to the vendors."""
+    calls = []
+    verify_bulk = verifier_client.verify_bulk
+
+    def recording_verify_bulk(mv_emails, nb_emails, **kwargs):
+        calls.append({"millionverifier": sorted(mv_emails), "neverbounce": sorted(nb_emails)})
+        return verify_bulk(mv_emails, nb_emails, **kwargs)
+
+    monkeypatch.setattr(verifier_client, "verify_bulk", recording_verify_bulk)
+    return calls
+
+
+def vendor_credits(simulator):
+    return {vendor: simulator.vendors[vendor].counts["credits_used"] for vendor in ("millionverifier", "neverbounce")}
+
+
+def claim_owners(seed_owner, emails):
+    for number, email in enumerate(emails):
+        seed_owner(f"p{number}", "pending_verification", original_email=email)
+    return work_queue.claim_owners(["pending_verification"], 10, 60)
+
+
+def test_each_vendor_is_only_sent_emails_it_has_no_verdict_for(storage, seed_owner, simulator, verdict_cache,
+                                                                 result_buffer, bulk_calls):
+    owners = claim_owners(seed_owner, ["cached@example.com", "fresh@example.com"])
+    verdict_cache.set("millionverifier:cached@example.com", dict(CACHED_VERDICT))
+    credits_before = vendor_credits(simulator)
+
+    assert verification_worker.verify_owners_bulk(owners) == []
+    result_buffer.flush()
+
+    assert bulk_calls == [{"millionverifier": ["fresh@example.com"],
+                           "neverbounce": ["cached@example.com", "fresh@example.com"]}]
+    credits_after = vendor_credits(simulator)
+    assert credits_after["millionverifier"] - credits_before["millionverifier"] == 1
+    assert credits_after["neverbounce"] - credits_before["neverbounce"] == 2
+
+    # The cached verdict is used and recorded as such, and the fresh ones are cached for next time
+    rows = storage.scan("verification_results", ["person_key", "vendor", "cached"])
+    assert {(row["person_key"], row["vendor"]): bool(row["cached"]) for row in rows} == {
+        ("p0", "millionverifier"): True, ("p0", "neverbounce"): False,
+        ("p1", "millionverifier"): False, ("p1", "neverbounce"): False,
+    }
+    assert verdict_cache.get("millionverifier:fresh@example.com") is not None
+    assert verdict_cache.get("neverbounce:cached@example.com") is not None
+    statuses = storage.fetch("owners", ["p0", "p1"], ["processing_status"])
+    assert all(row["processing_status"] in ("complete", "failed_verification") for row in statuses)
+
+
+def test_a_vendor_with_every_verdict_cached_gets_no_job(storage, seed_owner, simulator, verdict_cache, result_buffer,
+                                                        bulk_calls):
+    owners = claim_owners(seed_owner, ["first@example.com", "second@example.com"])
+    for email in ("first@example.com", "second@example.com"):
+        verdict_cache.set(f"millionverifier:{email}", dict(CACHED_VERDICT))
+    millionverifier = simulator.vendors["millionverifier"]
+    requests_before = millionverifier.counts["requests"]
+
+    verification_worker.verify_owners_bulk(owners)
+    result_buffer.flush()
+
+    assert bulk_calls[0]["millionverifier"] == []
+    assert millionverifier.counts["requests"] == requests_before
+    statuses = storage.fetch("owners", ["p0", "p1"], ["processing_status"])
+    assert all(row["processing_status"] != "pending_verification" for row in statuses)
+
+
+@pytest.fixture
+def slow_jobs(simulator, monkeypatch):
+    """`slow_jobs(True)` makes bulk jobs outlast a short verify_bulk timeout; `slow_jobs(False)` lets them finish."""
+    monkeypatch.setattr(verifier_client, "verify_bulk", functools.partial(verifier_client.verify_bulk, timeout=0.2))
+
+    def set_slow(slow):
+        for vendor in ("millionverifier", "neverbounce"):
+            monkeypatch.setitem(simulator.vendors[vendor].profile, "bulk_job_seconds", 3600 if slow else 0)
+    return set_slow
+
+
+def job_rows(storage):
+    return storage.scan("verification_jobs", ["job_email_key", "job_id", "settled_at"])
+
+
+def test_a_job_that_times_out_is_polled_again_instead_of_resubmitted(storage, seed_owner, simulator, verdict_cache,
+                                                                      result_buffer, slow_jobs):
+    owners = claim_owners(seed_owner, ["first@example.com", "second@example.com"])
+    slow_jobs(True)
+    credits_before = vendor_credits(simulator)
+
+    assert sorted(verification_worker.verify_owners_bulk(owners)) == ["p0", "p1"]
+
+    rows = job_rows(storage)
+    assert len(rows) == 4 # Both emails at both vendors
+    assert all(row["settled_at"] is None for row in rows)
+    credits_submitted = vendor_credits(simulator)
+    assert credits_submitted["millionverifier"] - credits_before["millionverifier"] == 2
+
+    slow_jobs(False)
+    assert verification_worker.verify_owners_bulk(owners) == []
+    result_buffer.flush()
+
+    assert vendor_credits(simulator) == credits_submitted # Nothing bought twice
+    assert {row["job_id"] for row in job_rows(storage)} == {row["job_id"] for row in rows}
+    assert all(row["settled_at"] is not None for row in job_rows(storage))
+    statuses = storage.fetch("owners", ["p0", "p1"], ["processing_status"])
+    assert all(row["processing_status"] in ("complete", "failed_verification") for row in statuses)
+
+
+def test_a_job_older_than_the_max_age_is_given_up_on(storage, seed_owner, simulator, verdict_cache, result_buffer):
+    owners = claim_owners(seed_owner, ["first@example.com"])
+    submitted_at = (datetime.now(timezone.utc) - timedelta(days=30)).isoformat()
+    storage.upsert("verification_jobs", [
+        {"job_email_key": f"{vendor}:first@example.com", "vendor": vendor, "email": "first@example.com",
+         "job_id": "1", "submitted_at": submitted_at, "settled_at": None}
+        for vendor in ("millionverifier", "neverbounce")])
+    credits_before = vendor_credits(simulator)
+
+    assert verification_worker.verify_owners_bulk(owners) == []
+
+    credits_after = vendor_credits(simulator)
+    assert credits_after["millionverifier"] - credits_before["millionverifier"] == 1
+    assert credits_after["neverbounce"] - credits_before["neverbounce"] == 1
+    assert all(row["job_id"] != "1" for row in job_rows(storage))
@@ -0,0 +1,217 @@
+import fcntl
+import json
+import os
+
+import pytest
+
+from core import work_queue
+
+ENRICHED = {"processing_status": "pending_post_enrichment_verification", "enriched_emails": ["jane@example.com"]}
+
+
+def owner_row(storage, person_key):
+    return storage.fetch("owners", [person_key], ["processing_status", "claimed_by", "lease_expires_at"])[0]
+
+
+def journal_entries(buffer):
+    if not os.path.exists(buffer.journal_path):
+        return []
+    with open(buffer.journal_path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class DatabaseDown(Exception):
+    pass
+
+
+@pytest.fixture
+def database_down(storage, monkeypatch):
+    """`database_down(True)` makes every write fail, as if the database were unreachable; `database_down(False)` undoes it."""
+    backend = storage.backend
+    originals = {name: getattr(backend, name) for name in ("apply_owner_updates", "update_owner", "upsert")}
+
+    def fail(*args, **kwargs):
+        raise DatabaseDown("database unreachable")
+
+    def set_down(down):
+        for name, original in originals.items():
+            monkeypatch.setattr(backend, name, fail if down else original)
+    return set_down
+
+
+# --- ResultWriteBuffer ---
+
+def test_flush_writes_results_and_releases_leases(storage, seed_owner):
+    seed_owner("p1")
+    seed_owner("p2")
+    work_queue.claim_owners(["pending_enrichment"], 10, 60)
+    flushed = []
+    buffer = work_queue.ResultWriteBuffer("test-flush", flush_size=100, on_flushed=flushed.extend)
+
+    buffer.add("p1", ENRICHED, expected_status="pending_enrichment")
+    buffer.add("p2", {"processing_status": "failed_enrichment"}, expected_status="pending_enrichment")
+    assert len(journal_entries(buffer)) == 2 # Journaled before anything is written
+
+    assert buffer.flush() == 2
+    assert owner_row(storage, "p1") == {"processing_status": "pending_post_enrichment_verification",
+                                        "claimed_by": None, "lease_expires_at": None}
+    assert owner_row(storage, "p2")["processing_status"] == "failed_enrichment"
+    assert sorted(entry["person_key"] for entry in flushed) == ["p1", "p2"]
+    assert journal_entries(buffer) == []
+
+
+def test_flush_keeps_results_the_database_did_not_take(storage, seed_owner, database_down):
+    seed_owner("p1")
+    work_queue.claim_owners(["pending_enrichment"], 10, 60)
+    database_down(True)
+    buffer = work_queue.ResultWriteBuffer("test-down", flush_size=100)
+    buffer.add("p1", ENRICHED, expected_status="pending_enrichment")
+
+    assert buffer.flush() == 0
+    assert [entry["person_key"] for entry in journal_entries(buffer)] == ["p1"]
+
+    # Results buffered while the database is down are journaled behind the kept one
+    buffer.add("p1", ENRICHED, expected_status="pending_enrichment")
+    assert len(journal_entries(buffer)) == 2
+
+    database_down(False)
+    assert buffer.flush() == 1
+    assert owner_row(storage, "p1")["processing_status"] == "pending_post_enrichment_verification"
+    assert journal_entries(buffer) == []
+
+
+def test_flush_drops_results_whose_lease_was_lost(storage, seed_owner):
+    seed_owner("p1")
+    work_queue.claim_owners(["pending_enrichment"], 10, 60)
+    # Another worker reclaimed the row after this one's lease expired
+    storage.update("owners", ["p1"], {"claimed_by": "another-worker"})
+    flushed = []
+    buffer = work_queue.ResultWriteBuffer("test-lost", flush_size=100, on_flushed=flushed.extend)
+    buffer.add("p1", ENRICHED, expected_status="pending_enrichment")
+
+    assert buffer.flush() == 0
+    assert owner_row(storage, "p1")["processing_status"] == "pending_enrichment"
+    assert flushed == []
+    assert journal_entries(buffer) == [] # Settled: retrying cannot succeed
+
+
+def test_flush_keeps_results_whose_related_rows_failed(storage, seed_owner, monkeypatch):
+    seed_owner("p1", "pending_verification")
+    work_queue.claim_owners(["pending_verification"], 10, 60)
+    row = {"result_key": "p1:millionverifier:jane@example.com", "person_key": "p1", "email": "jane@example.com",
+           "vendor": "millionverifier", "verdict": "ok"}
+    upsert = storage.backend.upsert
+
+    def failing_upsert(table, records):
+        raise DatabaseDown("verification_results unavailable")
+
+    monkeypatch.setattr(storage.backend, "upsert", failing_upsert)
+    buffer = work_queue.ResultWriteBuffer("test-related", flush_size=100)
+    buffer.add("p1", {"processing_status": "complete"}, expected_status="pending_verification",
+               related_rows={"verification_results": [row]})
+
+    assert buffer.flush() == 1 # The owner row itself was written
+    assert [entry["person_key"] for entry in journal_entries(buffer)] == ["p1"]
+
+    monkeypatch.setattr(storage.backend, "upsert", upsert)
+    buffer.flush()
+    assert storage.fetch("verification_results", [row["result_key"]], ["verdict"]) == [{"verdict": "ok"}]
+    assert owner_row(storage, "p1")["processing_status"] == "complete"
+    assert journal_entries(buffer) == []
+
+
+# --- Crash recovery ---
+
+def write_orphan_journal(name, entries):
+    os.makedirs(work_queue.RESULT_JOURNAL_DIR, exist_ok=True)
+    path = os.path.join(work_queue.RESULT_JOURNAL_DIR, f"{name}-crashed-worker.jsonl")
+    with open(path, "w") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+    return path
+
+
+def test_recover_replays_and_removes_orphan_journals(storage, seed_owner):
+    seed_owner("p1")
+    seed_owner("p2", "failed_enrichment") # Moved on since the crash
+    path = write_orphan_journal("test-recover", [
+        {"person_key": "p1", "update": ENRICHED, "expected_status": "pending_enrichment"},
+        {"person_key": "p2", "update": ENRICHED, "expected_status": "pending_enrichment"},
+    ])
+
+    work_queue.ResultWriteBuffer("test-recover").recover()
+
+    assert owner_row(storage, "p1")["processing_status"] == "pending_post_enrichment_verification"
+    assert owner_row(storage, "p2")["processing_status"] == "failed_enrichment"
+    assert not os.path.exists(path)
+
+
+def test_recover_keeps_the_journal_when_the_replay_fails(storage, seed_owner, database_down):
+    seed_owner("p1")
+    entry = {"person_key": "p1", "update": ENRICHED, "expected_status": "pending_enrichment"}
+    path = write_orphan_journal("test-recover-down", [entry])
+    database_down(True)
+
+    work_queue.ResultWriteBuffer("test-recover-down").recover()
+    with open(path) as f:
+        assert [json.loads(line) for line in f] == [entry]
+
+    database_down(False)
+    work_queue.ResultWriteBuffer("test-recover-down").recover()
+    assert owner_row(storage, "p1")["processing_status"] == "pending_post_enrichment_verification"
+    assert not os.path.exists(path)
+
+
+def test_recover_skips_journals_of_running_workers(storage, seed_owner):
+    seed_owner("p1")
+    path = write_orphan_journal("test-running", [
+        {"person_key": "p1", "update": ENRICHED, "expected_status": "pending_enrichment"},
+    ])
+    with open(path) as journal:
+        fcntl.flock(journal, fcntl.LOCK_EX) # As a live worker holds its own journal
+        work_queue.ResultWriteBuffer("test-running").recover()
+
+    assert owner_row(storage, "p1")["processing_status"] == "pending_enrichment"
+    assert os.path.exists(path)
+
+
+# --- Write guards ---
+
+def test_write_entries_counts_only_rows_the_guard_let_through(storage, seed_owner, monkeypatch):
+    seed_owner("p1")
+    seed_owner("p2", "failed_enrichment")
+
+    def bulk_write_rejected(*args, **kwargs):
+        raise DatabaseDown("bulk write rejected")
+
+    # Exercise the row-by-row fallback
+    monkeypatch.setattr(storage.backend, "apply_owner_updates", bulk_write_rejected)
+    entries = [{"person_key": key, "update": ENRICHED, "expected_status": "pending_enrichment"}
+               for key in ("p1", "p2", "missing")]
+
+    applied, failed = work_queue._write_entries(entries, worker_id=None)
+
+    assert applied == {"p1"}
+    assert failed == []
+    assert owner_row(storage, "p2")["processing_status"] == "failed_enrichment"
+
+
+def test_write_entries_with_a_worker_id_requires_the_lease(storage, seed_owner):
+    seed_owner("mine")
+    work_queue.claim_owners(["pending_enrichment"], 10, 60)
+    seed_owner("unclaimed")
+    entries = [{"person_key": key, "update": ENRICHED, "expected_status": "pending_enrichment"}
+               for key in ("mine", "unclaimed")]
+
+    applied, failed = work_queue._write_entries(entries, worker_id=work_queue.WORKER_ID)
+
+    assert applied == {"mine"}
+    assert failed == []
+    assert owner_row(storage, "unclaimed")["processing_status"] == "pending_enrichment"
+
+
+def test_update_claimed_owner_reports_whether_it_wrote(storage, seed_owner):
+    seed_owner("p1")
+    assert work_queue.update_claimed_owner("p1", ENRICHED) is False
+    work_queue.claim_owners(["pending_enrichment"], 10, 60)
+    assert work_queue.update_claimed_owner("p1", ENRICHED) is True
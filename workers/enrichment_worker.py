@@ -1,8 +1,18 @@
 import time
+import asyncio
+import httpx
 
 # Import shared components
-from core.database import supabase, check_db_connection
-from core.api_clients import pdl_client
+from core.database import check_db_connection
+from core.api_clients import pdl_client, http_session
+from core.rate_limiter import AdaptiveConcurrencyLimiter, vendor_limiter
+from core.circuit_breaker import vendor_breaker, vendor_retry_budget
+from core import work_queue, wakeup, metrics
+from core.logger import get_logger
+from config import (ENRICHMENT_MODE, ENRICHMENT_CONCURRENCY, ENRICHMENT_MAX_CONCURRENCY, ENRICHMENT_LEASE_SECONDS,
+                    HTTP_POOL_SIZE, HTTP_MAX_RETRIES, HTTP_BACKOFF_MAX, CIRCUIT_RESET_TIMEOUT)
+
+log = get_logger("enrichment")
 
 # A list of common role-based email prefixes to deprioritize
 ROLE_BASED_PREFIXES = ['info@', 'contact@', 'admin@', 'support@', 'sales@', 'hello@', 'team@']
@@ -43,82 +53,234 @@ def extract_and_rank_emails(pdl_data):
     return ranked_emails
 
 
-def run_enrichment_worker():
-    """Main orchestration function for the enrichment worker."""
+def build_enrichment_params(owner):
+    """Maps an owner row to the keyword arguments for `pdl_client.enrich_person`."""
+    return {
+        'first_name': owner.get('first_name'),
+        'last_name': owner.get('last_name'),
+        'street_address': owner.get('mail_street_address'),
+        'locality': owner.get('mail_city'),
+        'region': owner.get('mail_state'),
+        'postal_code': owner.get('mail_zip_code'),
+        'email': owner.get('original_email'),
+        'phone': owner.get('original_phone')
+    }
+
+def build_enrichment_update(enrichment_response):
+    """Turns a PDL client result into the owner's update payload, including the new status."""
+    new_status = 'failed_enrichment'
+    update_data = {}
+
+    if enrichment_response["success"]:
+        # Get the ranked list of all emails
+        all_ranked_emails = extract_and_rank_emails(enrichment_response["data"])
+        
+        if all_ranked_emails:
+            log.info("Enrichment found emails", extra={"emails": len(all_ranked_emails), "best_email": all_ranked_emails[0]})
+            new_status = 'pending_post_enrichment_verification'
+            # Store the entire list in the new JSONB column
+            update_data['enriched_emails'] = all_ranked_emails
+        else:
+            log.info("Enrichment successful, but no usable emails were found.")
+    else:
+        log.warning("Enrichment API call failed", extra={"error": enrichment_response["error"]})
+
+    update_data['processing_status'] = new_status
+    return update_data
+
+# Results are journaled locally and written back in bulk
+result_buffer = work_queue.ResultWriteBuffer("enrichment")
+
+def write_enrichment_update(person_key, update_data):
+    """Queues one owner's enrichment result for the next bulk write-back."""
+    result_buffer.add(person_key, update_data, expected_status='pending_enrichment')
+
+def record_enrichment_result(person_key, enrichment_response):
+    """
+    Queues the owner's result for write-back and returns its new status, or
+    returns 'deferred' without writing anything if PDL was down (the caller
+    defers those owners rather than marking them failed).
+    """
+    if enrichment_response.get("deferred"):
+        log.warning("PDL unavailable, deferring owner",
+                    extra={"person_key": person_key, "error": enrichment_response["error"]})
+        return 'deferred'
+    update_data = build_enrichment_update(enrichment_response)
+    write_enrichment_update(person_key, update_data)
+    return update_data['processing_status']
+
+def defer_enrichment(person_keys):
+    """
+    Hands owners a PDL outage kept from being enriched back to the queue until
+    the circuit may close, or until the daily credit budget resets if it is used up.
+    """
+    delay = max(vendor_breaker("pdl").retry_in(), CIRCUIT_RESET_TIMEOUT, vendor_limiter("pdl").budget_resets_in())
+    work_queue.defer_owners("enrichment", person_keys, delay)
+
+
+# --- Asyncio Enrichment Engine ---
+
+async def _enrich_owner_async(client, limiter, owner):
+    """
+    Enriches one owner with the shared async client and queues the result for
+    write-back as soon as it arrives. Throttled (429) and 5xx responses shrink the limiter
+    and are retried with backoff, within PDL's retry budget, before the owner is deferred.
+    """
+    person_key = owner['person_key']
+    enrichment_params = build_enrichment_params(owner)
+
+    retry_budget = vendor_retry_budget("pdl")
+    retry_budget.record_call()
+    enrichment_response = None
+    for attempt in range(HTTP_MAX_RETRIES + 1):
+        async with limiter:
+            log.info("Processing owner", extra={"person_key": person_key, "concurrency_limit": limiter.limit})
+            enrichment_response = await pdl_client.enrich_person_async(client, person_key=person_key,
+                                                                       **enrichment_params)
+
+        status_code = enrichment_response.get("status_code")
+        if status_code is None and enrichment_response.get("deferred"):
+            break # Circuit open or transport error; nothing learned about PDL's rate limit
+        if status_code not in http_session.RETRYABLE_STATUSES:
+            limiter.on_success(enrichment_response.get("rate_limit_remaining"))
+            break
+
+        if status_code == 429:
+            limiter.on_throttle()
+        if attempt < HTTP_MAX_RETRIES:
+            if not retry_budget.try_spend():
+                break
+            metrics.record_retry("pdl", status_code)
+            retry_after = enrichment_response.get("retry_after")
+            delay = min(HTTP_BACKOFF_MAX, retry_after) if retry_after is not None else http_session.backoff_delay(attempt)
+            await asyncio.sleep(delay)
+
+    # Journaling (and any flush it triggers) is blocking; keep it off the event loop
+    return await asyncio.to_thread(record_enrichment_result, person_key, enrichment_response)
+
+async def enrich_owners_async(owners, limiter):
+    """
+    Enriches a batch of owners concurrently. Returns {person_key: resulting
+    status}, with 'deferred' for owners PDL being down kept from being enriched.
+    """
+    pool_limits = httpx.Limits(max_connections=max(HTTP_POOL_SIZE, limiter.maximum))
+    async with httpx.AsyncClient(limits=pool_limits) as client:
+        tasks = [_enrich_owner_async(client, limiter, owner) for owner in owners]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    statuses = {}
+    for owner, result in zip(owners, results):
+        if isinstance(result, Exception):
+            # Leave the owner pending; it is reclaimed once its lease expires
+            log.error("Unexpected error while enriching owner",
+                      extra={"person_key": owner["person_key"], "error": repr(result)})
+            continue
+        statuses[owner["person_key"]] = result
+    return statuses
+
+
+# --- Bulk Enrichment ---
+
+def enrich_owners_bulk(owners):
+    """
+    Enriches a batch of owners through PDL's bulk endpoint and writes each
+    result back. Returns {person_key: resulting status}.
+    """
+    people = {owner['person_key']: build_enrichment_params(owner) for owner in owners}
+    results = pdl_client.bulk_enrich_people(people)
+
+    statuses = {}
+    for person_key, enrichment_response in results.items():
+        log.info("Processing owner", extra={"person_key": person_key})
+        statuses[person_key] = record_enrichment_result(person_key, enrichment_response)
+    return statuses
+
+
+def run_enrichment_worker(mode=ENRICHMENT_MODE, exit_when_idle=False):
+    """
+    Main orchestration function for the enrichment worker.
+
+    `mode="serial"` enriches one owner at a time. `mode="async"` keeps up to
+    ENRICHMENT_CONCURRENCY PDL requests in flight, adapting between 1 and
+    ENRICHMENT_MAX_CONCURRENCY based on 429s and rate-limit headers.
+    `mode="bulk"` sends each batch through PDL's bulk endpoint, 100 people per call.
+    With `exit_when_idle=True` the worker returns once the queue is empty
+    instead of waiting for more work.
+    """
     if not check_db_connection():
         return
 
-    print("--- Starting Enrichment Worker ---")
-    BATCH_SIZE = 50
+    log.info("Starting enrichment worker", extra={"mode": mode, "worker_id": work_queue.WORKER_ID})
+    if mode == 'bulk':
+        BATCH_SIZE = pdl_client.BULK_MAX_REQUESTS
+    elif mode == 'async':
+        BATCH_SIZE = max(50, ENRICHMENT_MAX_CONCURRENCY * 4)
+    else:
+        BATCH_SIZE = 50
+    result_buffer.recover()
+    idle_backoff = wakeup.IdleBackoff()
+    listener = wakeup.WakeupListener("enrichment")
+    # One limiter for the whole run so learned concurrency carries over between batches
+    limiter = AdaptiveConcurrencyLimiter(ENRICHMENT_CONCURRENCY, maximum=ENRICHMENT_MAX_CONCURRENCY)
 
     while True:
+        retry_in = vendor_breaker("pdl").retry_in()
+        if retry_in > 0:
+            # Claiming now would only defer the batch again
+            log.info("PDL circuit open, pausing before the next batch", extra={"retry_in_s": round(retry_in)})
+            time.sleep(retry_in)
+
         try:
-            response = supabase.table("owners") \
-                .select("person_key, first_name, last_name, mail_street_address, mail_city, mail_state, mail_zip_code, original_email, original_phone") \
-                .eq("processing_status", "pending_enrichment") \
-                .limit(BATCH_SIZE) \
-                .execute()
-            
-            owners_to_process = response.data
+            # Claim the batch so other enrichment processes skip these owners
+            owners_to_process = work_queue.claim_owners(['pending_enrichment'], BATCH_SIZE, ENRICHMENT_LEASE_SECONDS)
         except Exception as e:
-            print(f"Error fetching owners from database: {e}")
+            log.error("Error fetching owners from database", extra={"error": str(e)})
             time.sleep(60)
             continue
         
         if not owners_to_process:
-            print("No owners found for enrichment. Worker sleeping for 5 minutes...")
-            time.sleep(300)
+            if exit_when_idle:
+                log.info("No owners left to enrich. Exiting.")
+                return
+            wakeup.idle_wait(idle_backoff, listener, "enrichment")
             continue
-            
-        print(f"\nFound {len(owners_to_process)} owners to enrich in this batch.")
 
-        for owner in owners_to_process:
-            person_key = owner['person_key']
-            print(f"Processing owner with PersonKey: {person_key}")
-            
-            enrichment_params = {
-                'first_name': owner.get('first_name'),
-                'last_name': owner.get('last_name'),
-                'street_address': owner.get('mail_street_address'),
-                'locality': owner.get('mail_city'),
-                'region': owner.get('mail_state'),
-                'postal_code': owner.get('mail_zip_code'),
-                'email': owner.get('original_email'),
-                'phone': owner.get('original_phone')
-            }
-
-            enrichment_response = pdl_client.enrich_person(**enrichment_params)
+        idle_backoff.reset()
             
-            new_status = 'failed_enrichment'
-            update_data = {}
-
-            if enrichment_response["success"]:
-                # --- THIS IS THE KEY CHANGE ---
-                # Get the ranked list of all emails
-                all_ranked_emails = extract_and_rank_emails(enrichment_response["data"])
-                
-                if all_ranked_emails:
-                    print(f"    -> Success! Found {len(all_ranked_emails)} emails. Best one: {all_ranked_emails[0]}")
-                    new_status = 'pending_post_enrichment_verification'
-                    # Store the entire list in the new JSONB column
-                    update_data['enriched_emails'] = all_ranked_emails
-                else:
-                    print("    -! Enrichment successful, but no usable emails were found.")
-            else:
-                print(f"    -! Enrichment API call failed: {enrichment_response['error']}")
-
-            update_data['processing_status'] = new_status
-            try:
-                supabase.table("owners") \
-                    .update(update_data) \
-                    .eq("person_key", person_key) \
-                    .execute()
-            except Exception as e:
-                print(f"    -! CRITICAL: Failed to update status for {person_key}. Error: {e}")
-            
-            time.sleep(1.5)
+        log.info("Claimed a batch of owners to enrich", extra={"owners": len(owners_to_process)})
+
+        if mode == 'async':
+            started_at = time.monotonic()
+            statuses = asyncio.run(enrich_owners_async(owners_to_process, limiter))
+            elapsed = time.monotonic() - started_at
+            log.info("Enriched batch", extra={"owners": len(statuses), "elapsed_s": round(elapsed, 1),
+                                              "concurrency_limit": limiter.limit})
+        elif mode == 'bulk':
+            statuses = enrich_owners_bulk(owners_to_process)
+        else:
+            statuses = {}
+            for owner in owners_to_process:
+                person_key = owner['person_key']
+                log.info("Processing owner", extra={"person_key": person_key})
+
+                enrichment_response = pdl_client.enrich_person(person_key=person_key, **build_enrichment_params(owner))
+                statuses[person_key] = record_enrichment_result(person_key, enrichment_response)
+
+        # Owners a PDL outage kept from being enriched go back to the queue, not to failed_enrichment
+        deferred = [person_key for person_key, status in statuses.items() if status == 'deferred']
+        if deferred:
+            defer_enrichment(deferred)
+
+        if result_buffer.flush():
+            # Some of these owners may now be waiting on the verification worker
+            wakeup.notify("verification")
+
+        if pdl_client.enrichment_cache is not None:
+            cache_stats = pdl_client.enrichment_cache.stats()
+            log.info("Enrichment cache", extra={"hits": cache_stats["hits"], "misses": cache_stats["misses"],
+                                                "entries": cache_stats["size"]})
 
-        print("\nBatch finished. Fetching next batch...")
+        log.info("Batch finished. Fetching next batch...")
 
 if __name__ == "__main__":
     run_enrichment_worker()
\ No newline at end of file
@@ -1,86 +1,37 @@
+import os
 import time
 import json
-from datetime import datetime
+import hashlib
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 import pytz
 
 # Import shared components
-from core.database import supabase, check_db_connection
+from core.database import storage, check_db_connection
+from core.storage.base import PRIMARY_KEYS
 from core.api_clients import property_radar_client
-from config import PROPERTY_RADAR_LIST_ID, INGEST_BATCH_LIMIT
+from core import wakeup, metrics
+from core.logger import get_logger
+from core.address_parser import parse_mail_addresses
+from config import (PROPERTY_RADAR_LIST_ID, INGEST_BATCH_LIMIT, INGEST_PAGE_SIZE, INGEST_CURSOR_PATH, INGEST_CONCURRENCY,
+                    INGEST_FLUSH_SIZE, INGEST_FLUSH_INTERVAL, INGEST_INCREMENTAL, INGEST_MAX_AGE_DAYS)
 
 UTC = pytz.UTC
 
+log = get_logger("ingest")
+
 # --- Data Transformation & Database Functions ---
 # These functions are now part of the worker's responsibility, transforming API
 # data into a format ready for the database.
 
-def parse_mail_address(mail_address_list):
-    """
-    Parses a complex 'MailAddress' field from the PropertyRadar person object.
-    It robustly handles different address formats (e.g., "City, ST ZIP" and "City ST ZIP")
-    and correctly removes trailing commas from the city name.
-    """
-    # Initial checks for valid input data structure
-    if not mail_address_list or not isinstance(mail_address_list, list):
-        return {"street": None, "city": None, "state": None, "zip": None}
-        
-    first_address_obj = mail_address_list[0]
-    if not isinstance(first_address_obj, dict) or "Address" not in first_address_obj:
-        return {"street": None, "city": None, "state": None, "zip": None}
-
-    full_address = first_address_obj.get("Address", "")
-    if not full_address:
-        return {"street": None, "city": None, "state": None, "zip": None}
-
-    # Split the full address string by commas
-    parts = full_address.split(',')
-    
-    # The first part is always assumed to be the street address
-    street = parts[0].strip()
-    city, state, zip_code = None, None, None
-
-    # Process the remaining parts of the address if they exist
-    if len(parts) > 1:
-        # Re-join everything after the street address to handle the rest as a single block.
-        # This makes the logic consistent for different comma placements.
-        city_state_zip_str = ",".join(parts[1:]).strip()
-
-        # We work backwards from the end of the string, which is generally more reliable.
-        # Find the last space, which typically separates the zip code.
-        last_space_index = city_state_zip_str.rfind(' ')
-        
-        if last_space_index != -1:
-            # Assume everything after the last space is the zip code
-            zip_code_candidate = city_state_zip_str[last_space_index + 1:].strip()
-            
-            # The part before the zip code contains the city and state
-            state_city_part = city_state_zip_str[:last_space_index].strip()
-            
-            # Find the last space in the remaining part to separate state from city
-            second_last_space_index = state_city_part.rfind(' ')
-
-            if second_last_space_index != -1:
-                # Everything after this space is the state
-                state = state_city_part[second_last_space_index + 1:].strip()
-                # Everything before it is the city
-                city_raw = state_city_part[:second_last_space_index].strip()
-                city = city_raw.rstrip(',').strip()
-
-            else:
-                state = state_city_part.rstrip(',').strip()
-
-            # Assign the zip code if it looks valid (e.g., is a digit)
-            if zip_code_candidate.isdigit():
-                zip_code = zip_code_candidate
-
-    return {"street": street, "city": city, "state": state, "zip": zip_code}
-
-def upsert_property_to_supabase(property_data):
-    """Transforms and upserts a single property's data into the 'properties' table."""
+def transform_property(property_data):
+    """Transforms a PropertyRadar property object into a 'properties' table record."""
     def to_bool(value):
         return True if value == 1 else False if value == 0 else None
 
-    record = {
+    return {
         "radar_id": property_data.get("RadarID"),
         "address": property_data.get("Address"),
         "city": property_data.get("City"),
@@ -109,23 +60,11 @@ def upsert_property_to_supabase(property_data):
         "last_fetched_at": datetime.now(UTC).isoformat()
     }
 
-    if not record["radar_id"]:
-        print(f"    -! ERROR: Missing RadarID. Cannot upsert. Data: {property_data}")
-        return False
-
-    print(f"    -> Upserting property record for RadarID {record['radar_id']}...")
-    try:
-        supabase.table("properties").upsert(record, on_conflict="radar_id").execute()
-        return True
-    except Exception as e:
-        print(f"    -! Supabase Error (Property): {e}")
-        return False
-
-def upsert_owners_to_supabase(owners_data, radar_id):
-    """Transforms and upserts a list of owner data into the 'owners' table."""
-    records_to_upsert = []
-    for person in owners_data:
-        address_parts = parse_mail_address(person.get("MailAddress"))
+def transform_owners(owners_data, radar_id):
+    """Transforms a list of PropertyRadar person objects into 'owners' table records."""
+    records = []
+    parsed_addresses = parse_mail_addresses(person.get("MailAddress") for person in owners_data)
+    for person, address_parts in zip(owners_data, parsed_addresses):
         initial_email = person.get("Email")
         status = 'pending_verification' if initial_email else 'pending_enrichment'
         is_primary_raw = person.get("isPrimaryContact")
@@ -158,67 +97,518 @@ def upsert_owners_to_supabase(owners_data, radar_id):
             "mail_state": address_parts["state"],
             "mail_zip_code": address_parts["zip"]
         }
-        records_to_upsert.append(record)
+        records.append(record)
+    return records
 
-    if not records_to_upsert:
-        return
-        
-    print(f"    -> Upserting {len(records_to_upsert)} owner records for RadarID {radar_id}...")
+def compute_record_hash(record):
+    """Hashes a transformed record's content, ignoring bookkeeping fields such as `last_fetched_at`."""
+    content = {key: value for key, value in record.items() if key not in ("last_fetched_at", "content_hash")}
+    encoded = json.dumps(content, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+def fetch_property_freshness(radar_ids):
+    """
+    Looks up `last_fetched_at` and `content_hash` for many RadarIDs at once.
+    Returns {radar_id: row} for the properties that already exist.
+    """
     try:
-        supabase.table("owners").upsert(records_to_upsert, on_conflict="person_key").execute()
-        print("    -> Supabase upsert for owners successful!")
+        rows = storage.fetch("properties", radar_ids, ["radar_id", "last_fetched_at", "content_hash"])
     except Exception as e:
-        print(f"    -! Supabase Error (Owners): {e}")
+        # Without freshness data every property is simply refetched
+        log.warning("Could not look up existing properties", extra={"error": str(e)})
+        return {}
+    return {row["radar_id"]: row for row in rows}
 
+def _is_fresh(known_row, max_age_days=INGEST_MAX_AGE_DAYS):
+    last_fetched_at = known_row.get("last_fetched_at") if known_row else None
+    if not last_fetched_at:
+        return False
+    try:
+        fetched_at = datetime.fromisoformat(last_fetched_at.replace("Z", "+00:00"))
+    except ValueError:
+        return False
+    if fetched_at.tzinfo is None:
+        fetched_at = UTC.localize(fetched_at)
+    return datetime.now(UTC) - fetched_at < timedelta(days=max_age_days)
 
-def run_ingestion_worker():
-    """Main orchestration function for the ingestion worker."""
-    if not check_db_connection():
-        return
+# --- Batched Writes ---
 
-    # 1. Get a batch of RadarIDs from the specified list
-    id_response = property_radar_client.get_radar_ids_from_list(PROPERTY_RADAR_LIST_ID, INGEST_BATCH_LIMIT)
+def _bulk_upsert(table, records):
+    """
+    Upserts `records` in one round-trip, falling back to one row at a time if the
+    batch is rejected so a single bad record cannot drop the rest.
+
+    Returns the list of records that were written.
+    """
+    if not records:
+        return []
+    try:
+        storage.upsert(table, records)
+        return records
+    except Exception as e:
+        log.warning("Bulk upsert failed, retrying row by row",
+                    extra={"table": table, "rows": len(records), "error": str(e)})
+
+    written = []
+    for record in records:
+        try:
+            storage.upsert(table, [record])
+            written.append(record)
+        except Exception as e:
+            key_column = PRIMARY_KEYS[table]
+            log.error("Database error while upserting a row",
+                      extra={"table": table, key_column: record.get(key_column), "error": str(e)})
+    return written
+
+
+# Statuses an owner has while it is still only "ingested"; anything else means a
+# later stage has already worked on it and ingestion must not reset it.
+INGESTION_STATUSES = ('pending_enrichment', 'pending_verification')
 
-    if not id_response["success"] or not id_response["data"]:
-        print("Failed to retrieve item summaries or list is empty. Worker finished.")
-        return
 
-    item_summaries = id_response["data"]
-    print(f"\nFound {len(item_summaries)} records to process. Starting ingestion...")
-
-    # 2. Process each RadarID
-    for item in item_summaries:
-        radar_id = item.get("RadarID")
-        if not radar_id:
-            print("  -! WARNING: Item found with no 'RadarID'. Skipping.")
-            continue
-        
-        print(f"\n--- Processing RadarID: {radar_id} ---")
-
-        # 2a. Fetch and save property details
-        property_response = property_radar_client.get_property_details(radar_id)
-
-        if not property_response["success"]:
-            print(f"Failed to get property details for {radar_id}. Error: {property_response['error']}. Skipping.")
-            continue
-
-        property_save_success = upsert_property_to_supabase(property_response["data"])
-        
-        # 2b. If property saved, fetch and save associated owners
-        if property_save_success:
-            persons_response = property_radar_client.get_persons_for_property(radar_id)
-            if persons_response["success"] and persons_response["data"]:
-                upsert_owners_to_supabase(persons_response["data"], radar_id)
+def _upsert_owners(records):
+    """
+    Writes owner records in one round-trip: new owners are inserted and existing
+    ones rewritten only while they are still in INGESTION_STATUSES. Falls back to
+    one row at a time if the batch is rejected.
+
+    Returns (written, failed): the records that were written and the person_keys
+    whose write raised. Any other record belongs to an owner a later stage had
+    already moved on, which was left as it is.
+    """
+    if not records:
+        return [], set()
+    failed = set()
+    try:
+        written_keys = storage.upsert_owners(records, INGESTION_STATUSES)
+    except Exception as e:
+        log.warning("Bulk owner upsert failed, retrying row by row", extra={"rows": len(records), "error": str(e)})
+        written_keys = set()
+        for record in records:
+            try:
+                written_keys |= storage.upsert_owners([record], INGESTION_STATUSES)
+            except Exception as e:
+                failed.add(record["person_key"])
+                log.error("Database error while upserting an owner",
+                          extra={"person_key": record["person_key"], "error": str(e)})
+    return [record for record in records if record["person_key"] in written_keys], failed
+
+
+def _attach_owner_radar_ids(attachments):
+    """Adds RadarIDs to existing owners in one call, leaving every other column alone."""
+    links = [{"person_key": key, "radar_ids": sorted(radar_ids)} for key, radar_ids in attachments.items()]
+    try:
+        storage.attach_owner_radar_ids(links)
+        log.info("Attached extra properties to already-known owners", extra={"owners": len(links)})
+    except Exception as e:
+        log.warning("Could not attach extra RadarIDs to owners", extra={"owners": len(links), "error": str(e)})
+
+
+class OwnerIndex:
+    """
+    In-run index of every PersonKey the ingest worker has seen.
+
+    The same owner (an LLC, an investor) often appears on many properties of a
+    list. The index makes sure each person gets at most one full write per run:
+    later sightings only attach the extra RadarID to `radar_ids`. Owners that
+    already exist in the `owners` table are loaded in bulk the first time they
+    are seen; if a later stage has moved them past ingestion their record is
+    never rewritten, so their `processing_status` cannot regress. The write is
+    guarded as well (see _upsert_owners), for owners a later stage claims
+    between the preload and the flush.
+    """
+
+    def __init__(self):
+        # person_key -> {"radar_id", "radar_ids", "status", "written"}
+        self._owners = {}
+        self.duplicates = 0
+
+    def preload(self, person_keys):
+        """Loads the stored state of any not-yet-indexed owners in as few queries as possible."""
+        unknown = [key for key in dict.fromkeys(person_keys) if key not in self._owners]
+        if unknown:
+            try:
+                rows = storage.fetch("owners", unknown, ["person_key", "radar_id", "radar_ids", "processing_status"])
+            except Exception as e:
+                # Unknown owners are treated as new, which is what the worker did before the index existed
+                log.warning("Could not preload existing owners", extra={"error": str(e)})
+                rows = []
+            for row in rows:
+                radar_ids = set(row.get("radar_ids") or ([row["radar_id"]] if row.get("radar_id") else []))
+                self._owners[row["person_key"]] = {
+                    "radar_id": row.get("radar_id"),
+                    "radar_ids": radar_ids,
+                    "status": row.get("processing_status"),
+                    "written": False,
+                }
+
+    def plan(self, owner_records):
+        """
+        Splits a batch of transformed owner records into full records to upsert
+        and RadarID attachments ({person_key: {radar_id, ...}}) for owners that
+        must not be rewritten.
+        """
+        self.preload(record["person_key"] for record in owner_records)
+
+        full_records = {}
+        attachments = {}
+        for record in owner_records:
+            key, radar_id = record["person_key"], record["radar_id"]
+            entry = self._owners.get(key)
+
+            if entry is None:
+                self._owners[key] = {"radar_id": radar_id, "radar_ids": {radar_id},
+                                     "status": record["processing_status"], "written": True}
+                record["radar_ids"] = [radar_id]
+                full_records[key] = record
+                continue
+
+            is_new_link = radar_id not in entry["radar_ids"]
+            entry["radar_ids"].add(radar_id)
+
+            if not entry["written"] and entry["status"] in INGESTION_STATUSES:
+                # Still waiting for enrichment/verification; refresh its data once this run
+                entry["written"] = True
+                record["radar_id"] = entry["radar_id"] or radar_id
+                record["radar_ids"] = sorted(entry["radar_ids"])
+                full_records[key] = record
+            elif key in full_records:
+                # Seen twice within this batch; fold the extra property into the pending write
+                self.duplicates += 1
+                full_records[key]["radar_ids"] = sorted(entry["radar_ids"])
             else:
-                print(f"    -! Could not fetch owners for {radar_id}. Reason: {persons_response.get('error', 'No owners found')}")
+                if entry["written"]:
+                    self.duplicates += 1
+                entry["written"] = True
+                if is_new_link:
+                    attachments.setdefault(key, set()).add(radar_id)
+
+        return list(full_records.values()), attachments
+
+    def forget(self, person_keys):
+        """Drops owners whose write failed so a later sighting tries again."""
+        for key in person_keys:
+            self._owners.pop(key, None)
+
+
+class IngestWriteBuffer:
+    """
+    Collects transformed property and owner records and writes them in bulk.
+
+    A flush is triggered once `max_records` properties are pending or
+    `max_interval` seconds have passed since the last flush. Properties are
+    always written first; owners are only written for properties that were
+    actually saved, so an owner row never precedes its property row.
+    Safe to share between the ingest thread pool's workers. `on_owners_saved`,
+    if given, is called with the owner records written by each flush.
+
+    A property queued with `unchanged=True` is not rewritten (its content hash
+    matched the stored row); only its `last_fetched_at` is touched, in one bulk
+    update per flush, and its owners are written as usual.
+    """
+
+    def __init__(self, max_records=INGEST_FLUSH_SIZE, max_interval=INGEST_FLUSH_INTERVAL, on_owners_saved=None):
+        self.max_records = max_records
+        self.max_interval = max_interval
+        self.on_owners_saved = on_owners_saved
+        self.owner_index = OwnerIndex()
+        self._properties = []
+        self._unchanged_radar_ids = []
+        self._owners = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self.properties_written = 0
+        self.owners_written = 0
+
+    def add(self, property_record, owner_records, unchanged=False):
+        """Queues one property together with its owners, flushing if a threshold is hit."""
+        with self._lock:
+            if unchanged:
+                self._unchanged_radar_ids.append(property_record["radar_id"])
+            else:
+                self._properties.append(property_record)
+            self._owners.extend(owner_records)
+            should_flush = (
+                len(self._properties) + len(self._unchanged_radar_ids) >= self.max_records
+                or time.monotonic() - self._last_flush >= self.max_interval
+            )
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        """Writes everything buffered so far. Returns (properties_written, owners_written)."""
+        # Only one flush at a time keeps the property-before-owner ordering across batches
+        with self._flush_lock:
+            with self._lock:
+                properties, unchanged, owners = self._properties, self._unchanged_radar_ids, self._owners
+                self._properties, self._unchanged_radar_ids, self._owners = [], [], []
+                self._last_flush = time.monotonic()
+
+            if not properties and not unchanged:
+                return 0, 0
+
+            log.info("Flushing properties and owners to the database",
+                     extra={"properties": len(properties), "owners": len(owners)})
+            saved_properties = _bulk_upsert("properties", properties)
+            saved_radar_ids = {record["radar_id"] for record in saved_properties}
+
+            # Unchanged properties already exist, so their owners are safe to write
+            if unchanged:
+                saved_radar_ids.update(unchanged)
+                try:
+                    storage.update("properties", unchanged, {"last_fetched_at": datetime.now(UTC).isoformat()})
+                except Exception as e:
+                    log.warning("Could not touch last_fetched_at for unchanged properties",
+                                extra={"properties": len(unchanged), "error": str(e)})
+
+            owners_to_write = [record for record in owners if record["radar_id"] in saved_radar_ids]
+            skipped = len(owners) - len(owners_to_write)
+            if skipped:
+                log.warning("Skipping owners whose property could not be saved", extra={"owners": skipped})
+
+            # One write per person per run; repeat sightings only attach their RadarID
+            full_records, attachments = self.owner_index.plan(owners_to_write)
+            saved_owners, failed_keys = _upsert_owners(full_records)
+            self.owner_index.forget(failed_keys)
+            saved_keys = {record["person_key"] for record in saved_owners}
+            for record in full_records:
+                if record["person_key"] not in saved_keys | failed_keys:
+                    # Moved on since the preload; it keeps its data but still gains the new properties
+                    attachments.setdefault(record["person_key"], set()).update(record["radar_ids"])
+            if attachments:
+                _attach_owner_radar_ids(attachments)
+            if saved_owners:
+                # New owners are waiting; wake idle downstream workers instead of letting them poll
+                wakeup.notify("enrichment")
+                wakeup.notify("verification")
+                if self.on_owners_saved is not None:
+                    self.on_owners_saved(saved_owners)
+
+            with self._lock:
+                self.properties_written += len(saved_properties)
+                self.owners_written += len(saved_owners)
+            return len(saved_properties), len(saved_owners)
+
+
+# --- List Cursor Persistence ---
+# The cursor records, per list, the offset of the first item that has not been
+# fully processed yet. It lives in a small local JSON file so an interrupted
+# full-list run picks up where it stopped instead of re-reading the head.
+
+def _read_cursor_file():
+    if not os.path.exists(INGEST_CURSOR_PATH):
+        return {}
+    try:
+        with open(INGEST_CURSOR_PATH, 'r') as f:
+            return json.load(f)
+    except (IOError, ValueError) as e:
+        log.warning("Could not read the cursor file. Starting from 0.", extra={"path": INGEST_CURSOR_PATH, "error": str(e)})
+        return {}
+
+def _write_cursor_file(cursors):
+    # Write to a temp file first so a crash never leaves a half-written cursor
+    tmp_path = f"{INGEST_CURSOR_PATH}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(cursors, f)
+    os.replace(tmp_path, INGEST_CURSOR_PATH)
+
+def load_list_cursor(list_id):
+    """Returns the saved start offset for a list, or 0 if there is none."""
+    return int(_read_cursor_file().get(str(list_id), 0))
+
+def save_list_cursor(list_id, offset):
+    """Persists the offset of the next unprocessed item for a list."""
+    cursors = _read_cursor_file()
+    cursors[str(list_id)] = offset
+    _write_cursor_file(cursors)
+
+def clear_list_cursor(list_id):
+    """Removes a list's cursor once the whole list has been walked."""
+    cursors = _read_cursor_file()
+    if cursors.pop(str(list_id), None) is not None:
+        _write_cursor_file(cursors)
+
+
+def process_radar_id(radar_id, write_buffer, known_row=None, incremental=False):
+    """
+    Fetches one property and its owners and queues them on `write_buffer`.
+
+    In incremental mode, `known_row` is the property's stored freshness data:
+    properties fetched within INGEST_MAX_AGE_DAYS are skipped without buying
+    anything, and refetched properties whose content hash is unchanged are not rewritten.
+
+    Returns the outcome: "new", "refreshed", "unchanged", "skipped_fresh" or "failed".
+    """
+    if incremental and _is_fresh(known_row):
+        log.debug("RadarID was fetched recently. Skipping.", extra={"radar_id": radar_id})
+        return "skipped_fresh"
+
+    log.info("Processing RadarID", extra={"radar_id": radar_id})
+
+    # 1. Fetch and transform property details
+    property_response = property_radar_client.get_property_details(radar_id)
+
+    if not property_response["success"]:
+        log.error("Failed to get property details. Skipping.",
+                  extra={"radar_id": radar_id, "error": property_response["error"]})
+        return "failed"
+
+    property_record = transform_property(property_response["data"])
+    if not property_record["radar_id"]:
+        log.error("Missing RadarID. Cannot upsert.", extra={"data": property_response["data"]})
+        return "failed"
+    property_record["content_hash"] = compute_record_hash(property_record)
+    unchanged = bool(known_row) and known_row.get("content_hash") == property_record["content_hash"]
+
+    # 2. Fetch and transform the associated owners
+    owner_records = []
+    persons_response = property_radar_client.get_persons_for_property(radar_id)
+    if persons_response["success"] and persons_response["data"]:
+        owner_records = [r for r in transform_owners(persons_response["data"], radar_id) if r["person_key"]]
+    else:
+        log.warning("Could not fetch owners",
+                    extra={"radar_id": radar_id, "reason": persons_response.get("error", "No owners found")})
+
+    # 3. Queue both; the buffer writes the property before its owners
+    write_buffer.add(property_record, owner_records, unchanged=unchanged)
+    if not known_row:
+        return "new"
+    return "unchanged" if unchanged else "refreshed"
+
+
+def iter_list_radar_id_pages(list_id, page_size=INGEST_PAGE_SIZE):
+    """
+    Streams the whole list one page of RadarIDs at a time, resuming at the saved cursor.
+
+    Pages are fetched lazily as the caller asks for them. The cursor is only
+    advanced when the caller comes back for the next page, i.e. once every
+    RadarID of the previous page has been processed. It is cleared at the end of the list.
+    """
+    start = load_list_cursor(list_id)
+    if start:
+        log.info("Resuming list from the saved cursor", extra={"list_id": list_id, "offset": start})
+
+    for page in property_radar_client.iter_list_pages(list_id, page_size=page_size, start=start):
+        if not page["success"]:
+            log.error("Failed to fetch list page. Cursor kept for the next run.",
+                      extra={"list_id": list_id, "offset": page["start"]})
+            return
+
+        items = page["data"]
+        log.info("Fetched list page", extra={"list_id": list_id, "offset": page["start"], "items": len(items)})
+        radar_ids = []
+        for item in items:
+            radar_id = item.get("RadarID")
+            if not radar_id:
+                log.warning("Item found with no RadarID. Skipping.")
+                continue
+            radar_ids.append(radar_id)
+        yield radar_ids
+
+        # Every RadarID on this page has been processed by the caller
+        if page["is_last"]:
+            clear_list_cursor(list_id)
+            log.info("Reached the end of the list. Cursor cleared.", extra={"list_id": list_id})
         else:
-            print(f"    -! Skipping owners since property upsert failed for {radar_id}.")
-            
-        time.sleep(0.5)  # Rate limiting to be kind to the API
+            save_list_cursor(list_id, page["start"] + len(items))
+
+
+def process_radar_ids_concurrently(radar_ids, write_buffer, max_workers=INGEST_CONCURRENCY, incremental=INGEST_INCREMENTAL):
+    """
+    Processes a batch of RadarIDs on a bounded thread pool.
+
+    Each RadarID is fetched start-to-finish by one worker thread and queued on
+    the shared write buffer, which keeps the property-before-owners ordering.
+    Request pacing is left to the PropertyRadar client's shared token bucket.
+    In incremental mode the stored freshness of the whole batch is looked up in
+    one query first. Returns a Counter of outcomes (see `process_radar_id`).
+    """
+    if not radar_ids:
+        return Counter()
+    known = fetch_property_freshness(radar_ids) if incremental else {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(
+            lambda radar_id: _safe_process_radar_id(radar_id, write_buffer, known.get(radar_id), incremental),
+            radar_ids))
+    return Counter(results)
+
+def _safe_process_radar_id(radar_id, write_buffer, known_row, incremental):
+    # An unexpected exception in one RadarID must not take the whole pool down
+    try:
+        outcome = process_radar_id(radar_id, write_buffer, known_row=known_row, incremental=incremental)
+    except Exception:
+        log.exception("Unexpected error while processing RadarID", extra={"radar_id": radar_id})
+        outcome = "failed"
+    metrics.record_processed("ingest", outcome)
+    return outcome
+
 
-    print("\n" + "="*50)
-    print("   INGESTION SCRIPT COMPLETE   ")
-    print("="*50)
+def run_ingestion_worker(stream_all=False, incremental=INGEST_INCREMENTAL):
+    """
+    Main orchestration function for the ingestion worker.
+
+    By default only the first INGEST_BATCH_LIMIT items are processed. With
+    `stream_all=True` the whole list is walked in pages of INGEST_PAGE_SIZE,
+    with a resumable cursor saved after every completed page. RadarIDs are
+    processed INGEST_CONCURRENCY at a time in both modes. With
+    `incremental=True`, recently fetched properties are skipped and unchanged
+    ones are not rewritten.
+    """
+    if not check_db_connection():
+        return
+
+    started_at = time.monotonic()
+    attempted = 0
+    outcomes = Counter()
+    write_buffer = IngestWriteBuffer()
+
+    if stream_all:
+        for radar_ids in iter_list_radar_id_pages(PROPERTY_RADAR_LIST_ID):
+            attempted += len(radar_ids)
+            outcomes += process_radar_ids_concurrently(radar_ids, write_buffer, incremental=incremental)
+            # Everything from this page must be in the DB before the cursor moves past it
+            write_buffer.flush()
+    else:
+        # 1. Get a batch of RadarIDs from the specified list
+        id_response = property_radar_client.get_radar_ids_from_list(PROPERTY_RADAR_LIST_ID, INGEST_BATCH_LIMIT)
+
+        if not id_response["success"] or not id_response["data"]:
+            log.error("Failed to retrieve item summaries or list is empty. Worker finished.")
+            return
+
+        item_summaries = id_response["data"]
+        log.info("Starting ingestion", extra={"records": len(item_summaries)})
+
+        # 2. Process the RadarIDs in parallel
+        radar_ids = []
+        for item in item_summaries:
+            radar_id = item.get("RadarID")
+            if not radar_id:
+                log.warning("Item found with no RadarID. Skipping.")
+                continue
+            radar_ids.append(radar_id)
+
+        attempted = len(radar_ids)
+        outcomes += process_radar_ids_concurrently(radar_ids, write_buffer, incremental=incremental)
+        write_buffer.flush()
+
+    saved = write_buffer.properties_written
+    elapsed = time.monotonic() - started_at
+    per_minute = saved / elapsed * 60 if elapsed > 0 else 0.0
+
+    summary = {
+        "properties_saved": saved,
+        "attempted": attempted,
+        "elapsed_s": round(elapsed, 1),
+        "properties_per_minute": round(per_minute, 1),
+        "owners_saved": write_buffer.owners_written,
+        "duplicate_sightings": write_buffer.owner_index.duplicates,
+    }
+    if incremental:
+        summary.update({"new": outcomes["new"], "refreshed": outcomes["refreshed"],
+                        "unchanged": outcomes["unchanged"], "skipped_fresh": outcomes["skipped_fresh"]})
+    log.info("Ingestion complete", extra=summary)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,204 @@
+import time
+import queue
+import threading
+
+# Import shared components
+from core.database import check_db_connection
+from core.api_clients import pdl_client
+from core import work_queue
+from core.logger import get_logger
+from workers.ingest_worker import IngestWriteBuffer, iter_list_radar_id_pages, process_radar_ids_concurrently
+from workers.enrichment_worker import build_enrichment_params, build_enrichment_update
+from workers.verification_worker import get_emails_to_verify, verify_owner, record_verification_checks
+from config import (PROPERTY_RADAR_LIST_ID, PIPELINE_INGEST_CONCURRENCY, PIPELINE_ENRICH_CONCURRENCY,
+                    PIPELINE_VERIFY_CONCURRENCY, PIPELINE_QUEUE_SIZE, RESULT_FLUSH_INTERVAL)
+
+log = get_logger("pipeline")
+
+# --- Streaming Pipeline (`main.py run-all`) ---
+# Runs ingest, enrichment and verification in one process as streaming stages
+# joined by bounded in-memory queues. An owner moves to the next stage as soon
+# as its previous stage's result is in the database (which stays the audit
+# trail and the source of truth), and a full queue blocks the stage feeding it,
+# so a slow vendor throttles everything upstream instead of piling up memory.
+#
+# Owners are not leased in this mode; every write is guarded by the status the
+# owner was read in instead. Don't run standalone enrich/verify workers against
+# the same list at the same time or the same owner may be paid for twice.
+# Owners a vendor outage kept from being processed are not written at all;
+# they stay in their pending status for the next run (or the standalone workers).
+
+_STOP = object() # Queue sentinel that tells a stage thread to exit
+
+
+class PipelineStats:
+    """Thread-safe per-stage counters for the end-of-run report."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {}
+
+    def increment(self, key, amount=1):
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + amount
+
+
+def _verification_item(person_key, processing_status, original_email=None, enriched_emails=None):
+    return {
+        "person_key": person_key,
+        "processing_status": processing_status,
+        "original_email": original_email,
+        "enriched_emails": enriched_emails,
+    }
+
+
+def _enrichment_stage(enrich_queue, result_buffer, stats):
+    while True:
+        owner = enrich_queue.get()
+        if owner is _STOP:
+            return
+        try:
+            log.info("Enriching owner", extra={"person_key": owner["person_key"]})
+            enrichment_response = pdl_client.enrich_person(person_key=owner['person_key'],
+                                                           **build_enrichment_params(owner))
+            if enrichment_response.get("deferred"):
+                log.warning("PDL unavailable, leaving owner pending",
+                            extra={"person_key": owner["person_key"], "error": enrichment_response["error"]})
+                stats.increment("enrichment_deferred")
+                continue
+            update_data = build_enrichment_update(enrichment_response)
+            result_buffer.add(owner['person_key'], update_data, expected_status='pending_enrichment')
+            stats.increment("enriched")
+        except Exception:
+            # The owner stays pending_enrichment in the DB for a later run to pick up
+            log.exception("Unexpected error while enriching owner", extra={"person_key": owner["person_key"]})
+            stats.increment("enrichment_errors")
+
+
+def _verification_stage(verify_queue, result_buffer, stats):
+    while True:
+        owner = verify_queue.get()
+        if owner is _STOP:
+            return
+        try:
+            log.info("Verifying owner", extra={"person_key": owner["person_key"]})
+            emails_to_verify = get_emails_to_verify(owner)
+            if emails_to_verify:
+                update_data, checks = verify_owner(emails_to_verify)
+            else:
+                update_data, checks = {"processing_status": "failed_verification"}, []
+            if update_data is None:
+                stats.increment("verification_deferred")
+                continue
+            result_buffer.add(owner['person_key'], update_data, expected_status=owner['processing_status'],
+                              related_rows={"verification_results": record_verification_checks(owner['person_key'], checks)})
+            stats.increment(update_data['processing_status'])
+        except Exception:
+            log.exception("Unexpected error while verifying owner", extra={"person_key": owner["person_key"]})
+            stats.increment("verification_errors")
+
+
+def _periodic_flush(buffers, stop_event):
+    # Results trickle in unevenly; make sure none sit in a buffer longer than the flush interval
+    while not stop_event.wait(RESULT_FLUSH_INTERVAL):
+        for buffer in buffers:
+            buffer.flush()
+
+
+def _start_threads(count, target, *args):
+    threads = [threading.Thread(target=target, args=args, daemon=True) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def run_pipeline(list_id=PROPERTY_RADAR_LIST_ID,
+                 ingest_concurrency=PIPELINE_INGEST_CONCURRENCY,
+                 enrich_concurrency=PIPELINE_ENRICH_CONCURRENCY,
+                 verify_concurrency=PIPELINE_VERIFY_CONCURRENCY,
+                 queue_size=PIPELINE_QUEUE_SIZE):
+    """
+    Streams a whole PropertyRadar list through ingest, enrichment and verification.
+
+    The list is walked with the same resumable cursor as `ingest --all`. Each
+    stage runs on its own pool of threads; owners are handed on through bounded
+    queues only after the previous stage's write has been applied.
+    """
+    if not check_db_connection():
+        return
+
+    log.info("Starting streaming pipeline", extra={"ingest_concurrency": ingest_concurrency,
+                                                   "enrich_concurrency": enrich_concurrency,
+                                                   "verify_concurrency": verify_concurrency})
+    started_at = time.monotonic()
+    stats = PipelineStats()
+    enrich_queue = queue.Queue(maxsize=queue_size)
+    verify_queue = queue.Queue(maxsize=queue_size)
+
+    def on_owners_saved(owner_records):
+        # Blocking puts give backpressure: ingestion waits while downstream is full
+        for record in owner_records:
+            stats.increment("owners_ingested")
+            if record['processing_status'] == 'pending_verification':
+                verify_queue.put(_verification_item(record['person_key'], 'pending_verification',
+                                                    original_email=record['original_email']))
+            else:
+                enrich_queue.put(record)
+
+    def on_enrichment_flushed(entries):
+        for entry in entries:
+            update_data = entry["update"]
+            if update_data['processing_status'] == 'pending_post_enrichment_verification':
+                verify_queue.put(_verification_item(entry["person_key"], 'pending_post_enrichment_verification',
+                                                    enriched_emails=update_data['enriched_emails']))
+
+    enrichment_results = work_queue.ResultWriteBuffer("pipeline-enrichment", worker_id=None,
+                                                      on_flushed=on_enrichment_flushed)
+    verification_results = work_queue.ResultWriteBuffer("pipeline-verification", worker_id=None)
+    enrichment_results.recover()
+    verification_results.recover()
+
+    enrich_threads = _start_threads(enrich_concurrency, _enrichment_stage, enrich_queue, enrichment_results, stats)
+    verify_threads = _start_threads(verify_concurrency, _verification_stage, verify_queue, verification_results, stats)
+    stop_flushing = threading.Event()
+    flusher = threading.Thread(target=_periodic_flush, args=([enrichment_results, verification_results], stop_flushing),
+                               daemon=True)
+    flusher.start()
+
+    # Stage 1: ingest, on the calling thread's pool
+    write_buffer = IngestWriteBuffer(on_owners_saved=on_owners_saved)
+    for radar_ids in iter_list_radar_id_pages(list_id):
+        stats.increment("radar_ids", len(radar_ids))
+        process_radar_ids_concurrently(radar_ids, write_buffer, max_workers=ingest_concurrency)
+        write_buffer.flush()
+
+    # Drain the stages in order so nothing is handed to a stage that has already stopped
+    for _ in enrich_threads:
+        enrich_queue.put(_STOP)
+    for thread in enrich_threads:
+        thread.join()
+    enrichment_results.flush()
+
+    for _ in verify_threads:
+        verify_queue.put(_STOP)
+    for thread in verify_threads:
+        thread.join()
+    stop_flushing.set()
+    flusher.join()
+    verification_results.flush()
+
+    elapsed = time.monotonic() - started_at
+    counts = stats.counts
+    log.info("Streaming pipeline complete", extra={
+        "radar_ids": counts.get("radar_ids", 0),
+        "owners_ingested": counts.get("owners_ingested", 0),
+        "enriched": counts.get("enriched", 0),
+        "complete": counts.get("complete", 0),
+        "failed_verification": counts.get("failed_verification", 0),
+        "deferred": counts.get("enrichment_deferred", 0) + counts.get("verification_deferred", 0),
+        "elapsed_s": round(elapsed, 1),
+    })
+
+
+if __name__ == "__main__":
+    run_pipeline()
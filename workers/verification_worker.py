@@ -1,9 +1,21 @@
 import time
-import json
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 # Import shared components
-from core.database import supabase, check_db_connection
+from core.database import storage, check_db_connection
 from core.api_clients import verifier_client
+from core.cache import DiskCache
+from core.circuit_breaker import vendor_breaker
+from core.rate_limiter import vendor_limiter
+from core import work_queue, wakeup
+from core.logger import get_logger
+from config import (VERIFICATION_CACHE_ENABLED, VERIFICATION_CACHE_PATH, VERIFICATION_CACHE_TTL,
+                    VERIFICATION_CACHE_MAX_ENTRIES, VERIFICATION_MODE, VERIFICATION_BULK_BATCH_SIZE,
+                    VERIFICATION_LEASE_SECONDS, VERIFICATION_BULK_TIMEOUT, VERIFICATION_BULK_JOB_MAX_AGE,
+                    PIPELINE_VERIFY_CONCURRENCY, CIRCUIT_RESET_TIMEOUT)
+
+log = get_logger("verification")
 
 # --- Define what constitutes a "good" or "bad" result from each service ---
 # We are more lenient with "good" statuses to maximize accepted emails.
@@ -14,112 +26,439 @@ NB_GOOD_STATUSES = ['valid', 'catchall', 'unknown'] # 'unknown' can be risky, bu
 MV_BAD_STATUSES = ['invalid']
 NB_BAD_STATUSES = ['invalid', 'disposable']
 
+# Verdicts are cached per vendor and lowercased email, so co-owners sharing an
+# address (or the same PDL email coming back for relatives) are only paid for once.
+verdict_cache = DiskCache(VERIFICATION_CACHE_PATH, VERIFICATION_CACHE_TTL, VERIFICATION_CACHE_MAX_ENTRIES,
+                          name="verification") if VERIFICATION_CACHE_ENABLED else None
+
+
+def _cached_verify(vendor, verify_func, email):
+    """
+    Returns `verify_func(email)`, served from the verdict cache when possible.
+    Only successful responses are cached; cached ones are marked `"cached": True`
+    so the stored logs show which verdicts were not freshly bought.
+    """
+    if verdict_cache is None:
+        return verify_func(email)
+
+    key = f"{vendor}:{email.strip().lower()}"
+    cached = verdict_cache.get(key)
+    if cached is not None:
+        log.debug("Verdict served from cache", extra={"vendor": vendor})
+        cached["cached"] = True
+        return cached
+
+    response = verify_func(email)
+    if response.get("success"):
+        verdict_cache.set(key, response)
+    return response
+
+# Both vendors are queried at the same time. Extra threads leave room for calls
+# whose result was no longer needed but are still finishing in the background,
+# and for the streaming pipeline verifying several owners at once.
+_verification_executor = ThreadPoolExecutor(max_workers=max(8, 4 * PIPELINE_VERIFY_CONCURRENCY),
+                                            thread_name_prefix="verify")
+
+def _is_good(vendor, response):
+    good_statuses = MV_GOOD_STATUSES if vendor == "millionverifier" else NB_GOOD_STATUSES
+    return bool(response.get("success")) and response["data"].get("result") in good_statuses
+
+def verify_email(email):
+    """
+    Runs both verification services for one email concurrently.
+    Returns (mv_response, nb_response).
+
+    Since an email is accepted if either vendor calls it good, the first decisive
+    "good" verdict ends the check: the other call is cancelled if it has not
+    started, or its result is ignored, and its log entry records that it was skipped.
+    """
+    futures = {
+        _verification_executor.submit(_cached_verify, "millionverifier", verifier_client.verify_millionverifier, email): "millionverifier",
+        _verification_executor.submit(_cached_verify, "neverbounce", verifier_client.verify_neverbounce, email): "neverbounce",
+    }
+    responses = {}
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            vendor = futures[future]
+            try:
+                responses[vendor] = future.result()
+            except Exception as err:
+                responses[vendor] = {"success": False, "error": str(err)}
+
+        if pending and any(_is_good(vendor, response) for vendor, response in responses.items()):
+            for future in pending:
+                future.cancel()
+                decided_by = next(v for v, r in responses.items() if _is_good(v, r))
+                responses[futures[future]] = {
+                    "success": False,
+                    "skipped": True,
+                    "error": f"Not needed: {decided_by} already accepted this email.",
+                }
+            break
+
+    return responses["millionverifier"], responses["neverbounce"]
+
+
+def get_emails_to_verify(owner):
+    """Determines which emails to verify based on the owner's current status."""
+    if owner['processing_status'] == 'pending_verification' and owner.get('original_email'):
+        return [owner['original_email']]
+    elif owner['processing_status'] == 'pending_post_enrichment_verification' and owner.get('enriched_emails'):
+        return owner['enriched_emails']
+    return []
+
+def verify_owner(emails_to_verify, verify_func=verify_email):
+    """
+    Walks an owner's ranked emails until one is accepted and builds the update payload.
+
+    `verify_func(email)` must return `(mv_response, nb_response)`; the per-email
+    path calls the vendors live, the bulk path looks up precomputed results.
+    Returns `(update_data, checks)`, where `checks` lists every
+    `(email, vendor, response)` consulted, for record_verification_checks().
+    If no email was accepted and a vendor outage left any check undecided,
+    `update_data` is None: the owner should be deferred, not failed.
+    """
+    final_status = 'failed_verification'
+    # The full history of all attempts for this owner
+    checks = []
+
+    # Iterate through the ranked list of emails
+    for email in emails_to_verify:
+        log.info("Verifying email", extra={"email": email})
+
+        mv_response, nb_response = verify_func(email)
+        checks.append((email, "millionverifier", mv_response))
+        checks.append((email, "neverbounce", nb_response))
+
+        # Check if the email is considered valid
+        mv_is_good = mv_response.get("success") and mv_response["data"].get("result") in MV_GOOD_STATUSES
+        nb_is_good = nb_response.get("success") and nb_response["data"].get("result") in NB_GOOD_STATUSES
+        
+        # Check for strictly invalid results
+        mv_is_bad = mv_response.get("success") and mv_response["data"].get("result") in MV_BAD_STATUSES
+        nb_is_bad = nb_response.get("success") and nb_response["data"].get("result") in NB_BAD_STATUSES
+
+        # --- Verification Logic ---
+        if mv_is_good or nb_is_good:
+            log.info("Email passed verification", extra={"email": email})
+            final_status = 'complete'
+            break # Exit the loop, we found a good email
+        
+        elif mv_is_bad or nb_is_bad:
+            log.info("Email is invalid. Trying next email if available.", extra={"email": email})
+            # Continue to the next email in the list
+        else:
+            log.info("Email gave an uncertain result. Trying next email if available.", extra={"email": email})
+
+    if final_status != 'complete' and any(response.get("deferred") for _, _, response in checks):
+        log.warning("A verification vendor is unavailable. Deferring owner.", extra={"emails": len(emails_to_verify)})
+        return None, checks
+
+    # After checking all emails for an owner, build their update.
+    # For easy filtering, we also store the final status of the primary email.
+    primary = {vendor: response for email, vendor, response in checks if email == emails_to_verify[0]}
+    update_data = {
+        "processing_status": final_status,
+        "millionverifier_status": primary.get("millionverifier", {}).get("data", {}).get("result"),
+        "neverbounce_status": primary.get("neverbounce", {}).get("data", {}).get("result"),
+    }
+    return update_data, checks
+
+
+# --- Verification Records ---
+# Each vendor check is stored as one compact row in `verification_results`
+# (see migrations/005_verification_results.sql): the verdict and sub-status
+# the decision was based on. The full vendor responses are kept by the
+# clients in the raw archive (core/archive.py), indexed by email.
+
+# Error texts are kept short in the table; the archive has the full response
+MAX_ERROR_LENGTH = 200
+
+def summarize_verification(vendor, response):
+    """Reduces a vendor response to the (verdict, sub_status) stored in `verification_results`."""
+    if response.get("success"):
+        data = response.get("data") or {}
+        sub_status = data.get("subresult") if vendor == "millionverifier" else None
+        return data.get("result"), sub_status
+    if response.get("skipped"):
+        return "skipped", None
+    return "error", str(response.get("error", ""))[:MAX_ERROR_LENGTH]
+
+def verification_result_row(person_key, email, vendor, verdict, sub_status, cached, checked_at):
+    return {
+        "result_key": f"{person_key}:{vendor}:{email.strip().lower()}",
+        "person_key": person_key,
+        "email": email,
+        "vendor": vendor,
+        "verdict": verdict,
+        "sub_status": sub_status,
+        "cached": cached,
+        "checked_at": checked_at,
+    }
+
+def record_verification_checks(person_key, checks):
+    """Returns the `verification_results` rows for an owner's `checks`."""
+    checked_at = datetime.now(timezone.utc).isoformat()
+    rows = []
+    for email, vendor, response in checks:
+        verdict, sub_status = summarize_verification(vendor, response)
+        rows.append(verification_result_row(person_key, email, vendor, verdict, sub_status,
+                                            bool(response.get("cached")), checked_at))
+    return rows
+
+# Results are journaled locally and written back in bulk
+result_buffer = work_queue.ResultWriteBuffer("verification")
+
+def write_verification_update(owner, update_data, checks=()):
+    """Queues one owner's verification result, and its per-check records, for the next bulk write-back."""
+    result_buffer.add(owner['person_key'], update_data, expected_status=owner['processing_status'],
+                      related_rows={"verification_results": record_verification_checks(owner['person_key'], checks)})
+    log.info("Final verification status",
+             extra={"person_key": owner["person_key"], "status": update_data["processing_status"]})
+
+
+def verification_retry_in():
+    """Seconds until either vendor's circuit lets calls through again; 0 while one of them is closed."""
+    return min(vendor_breaker("millionverifier").retry_in(), vendor_breaker("neverbounce").retry_in())
+
+def defer_verification(person_keys):
+    """
+    Hands owners a vendor outage kept from being verified back to the queue
+    until a circuit may close, or until a used-up daily credit budget resets.
+    """
+    budget_resets_in = max(vendor_limiter(vendor).budget_resets_in() for vendor in ("millionverifier", "neverbounce"))
+    work_queue.defer_owners("verification", person_keys,
+                            max(verification_retry_in(), CIRCUIT_RESET_TIMEOUT, budget_resets_in))
 
-def run_verification_worker():
-    """Main orchestration function for the verification worker."""
+
+# --- Bulk Job Records ---
+# A bulk job is paid for when it is submitted, so every submitted email is
+# recorded in `verification_jobs` (see migrations/007_verification_jobs.sql)
+# before the job is polled. A job that is not collected in its batch (it ran
+# past VERIFICATION_BULK_TIMEOUT, or the worker stopped) defers its owners,
+# and whichever worker claims them next polls the same job instead of buying
+# the emails again.
+
+def _job_email_key(vendor, email):
+    return f"{vendor}:{email.strip().lower()}"
+
+def load_running_jobs(to_submit):
+    """
+    Looks up the uncollected jobs earlier batches submitted any of `to_submit`
+    ({vendor: [email]}) in. Returns {vendor: {email: job_id}}. Jobs older than
+    VERIFICATION_BULK_JOB_MAX_AGE are given up on, so their emails are submitted again.
+    """
+    keys = {_job_email_key(vendor, email): (vendor, email) for vendor, emails in to_submit.items() for email in emails}
+    running = {vendor: {} for vendor in to_submit}
+    if not keys:
+        return running
+    try:
+        rows = storage.fetch("verification_jobs", list(keys), ["job_email_key", "job_id", "submitted_at", "settled_at"])
+    except Exception as e:
+        log.warning("Could not look up running bulk jobs", extra={"error": str(e)})
+        return running
+    oldest = datetime.now(timezone.utc) - timedelta(seconds=VERIFICATION_BULK_JOB_MAX_AGE)
+    for row in rows:
+        if row["settled_at"] is None and datetime.fromisoformat(row["submitted_at"]) > oldest:
+            vendor, email = keys[row["job_email_key"]]
+            running[vendor][email] = row["job_id"]
+    return running
+
+def record_bulk_job(vendor, job_id, emails):
+    """Records a job that was just submitted, so its emails are not paid for again if it is not collected now."""
+    submitted_at = datetime.now(timezone.utc).isoformat()
+    rows = [{"job_email_key": _job_email_key(vendor, email), "vendor": vendor, "email": email, "job_id": str(job_id),
+             "submitted_at": submitted_at, "settled_at": None} for email in emails]
+    try:
+        storage.upsert("verification_jobs", rows)
+    except Exception as e:
+        log.error("Could not record a submitted bulk job",
+                  extra={"vendor": vendor, "job_id": job_id, "emails": len(emails), "error": str(e)})
+
+def settle_bulk_jobs(vendor_emails):
+    """Marks the recorded jobs of `vendor_emails` ({vendor: [email]}) as collected."""
+    keys = [_job_email_key(vendor, email) for vendor, emails in vendor_emails.items() for email in emails]
+    if not keys:
+        return
+    try:
+        storage.update("verification_jobs", keys, {"settled_at": datetime.now(timezone.utc).isoformat()})
+    except Exception as e:
+        # An unsettled job is polled again next time, which costs a status check, not credits
+        log.warning("Could not mark bulk jobs as collected", extra={"emails": len(keys), "error": str(e)})
+
+
+# --- Bulk Verification ---
+
+def verify_owners_bulk(owners):
+    """
+    Verifies a batch of owners through the vendors' bulk job APIs.
+
+    Every candidate email of every owner is collected, deduplicated, checked
+    against the verdict cache and submitted as one job per vendor, each holding
+    only the emails that vendor has no cached verdict for. The per-email
+    results are then fed through the same owner-level decision logic as the
+    per-email path. If every submitted job fails outright the owners are left pending.
+    Returns the person_keys of owners to defer because a vendor was down or a
+    job was not collected in time; that job is polled again when they are
+    claimed next (see load_running_jobs).
+    """
+    owner_emails = {owner['person_key']: get_emails_to_verify(owner) for owner in owners}
+
+    # Deduplicate case-insensitively, keeping the first spelling seen
+    unique_emails = {}
+    for emails in owner_emails.values():
+        for email in emails:
+            unique_emails.setdefault(email.strip().lower(), email)
+
+    responses = {"millionverifier": {}, "neverbounce": {}}
+    to_submit = {"millionverifier": [], "neverbounce": []}
+    for key, email in unique_emails.items():
+        for vendor in responses:
+            cached = verdict_cache.get(f"{vendor}:{key}") if verdict_cache is not None else None
+            if cached is not None:
+                cached["cached"] = True
+                responses[vendor][key] = cached
+            else:
+                to_submit[vendor].append(email)
+
+    log.info("Collected emails for bulk verification",
+             extra={"unique_emails": len(unique_emails),
+                    "uncached_millionverifier": len(to_submit["millionverifier"]),
+                    "uncached_neverbounce": len(to_submit["neverbounce"])})
+    if to_submit["millionverifier"] or to_submit["neverbounce"]:
+        running_jobs = load_running_jobs(to_submit)
+        in_jobs = {vendor: set(emails) for vendor, emails in running_jobs.items()}
+
+        def on_submitted(vendor, job_id, emails):
+            in_jobs[vendor].update(emails)
+            record_bulk_job(vendor, job_id, emails)
+
+        bulk_results = verifier_client.verify_bulk(to_submit["millionverifier"], to_submit["neverbounce"],
+                                                   running_jobs=running_jobs, on_submitted=on_submitted)
+        settle_bulk_jobs({vendor: [email for email in emails if "bulk_job_id" not in bulk_results[vendor][email]]
+                          for vendor, emails in in_jobs.items()})
+        vendor_succeeded = {vendor: False for vendor in responses if to_submit[vendor]}
+        for vendor, results in bulk_results.items():
+            for email, response in results.items():
+                key = email.strip().lower()
+                responses[vendor][key] = response
+                if response.get("success"):
+                    vendor_succeeded[vendor] = True
+                    if verdict_cache is not None:
+                        verdict_cache.set(f"{vendor}:{key}", response)
+        if not any(vendor_succeeded.values()):
+            if any(response.get("deferred") for results in bulk_results.values() for response in results.values()):
+                log.error("The verification vendors are unavailable. Deferring this batch.")
+                return list(owner_emails)
+            log.error("Every bulk verification job failed. Leaving this batch pending until its lease expires.")
+            return []
+
+    def lookup(email):
+        key = email.strip().lower()
+        return responses["millionverifier"][key], responses["neverbounce"][key]
+
+    deferred = []
+    for owner in owners:
+        person_key = owner['person_key']
+        log.info("Processing owner", extra={"person_key": person_key})
+        emails_to_verify = owner_emails[person_key]
+        if not emails_to_verify:
+            log.warning("No emails found to verify. Marking as failed.", extra={"person_key": person_key})
+            write_verification_update(owner, {"processing_status": "failed_verification"})
+            continue
+        update_data, checks = verify_owner(emails_to_verify, verify_func=lookup)
+        if update_data is None:
+            deferred.append(person_key)
+            continue
+        write_verification_update(owner, update_data, checks)
+    return deferred
+
+
+def run_verification_worker(mode=VERIFICATION_MODE, exit_when_idle=False):
+    """
+    Main orchestration function for the verification worker.
+
+    `mode="serial"` verifies one email at a time through the single-check APIs.
+    `mode="bulk"` collects up to VERIFICATION_BULK_BATCH_SIZE owners and verifies
+    their emails through the vendors' bulk job APIs. With `exit_when_idle=True`
+    the worker returns once the queue is empty instead of waiting for more work.
+    """
     if not check_db_connection():
         return
 
-    print("--- Starting Verification Worker ---")
-    BATCH_SIZE = 50
+    log.info("Starting verification worker", extra={"mode": mode, "worker_id": work_queue.WORKER_ID})
+    BATCH_SIZE = VERIFICATION_BULK_BATCH_SIZE if mode == 'bulk' else 50
+    result_buffer.recover()
+    idle_backoff = wakeup.IdleBackoff()
+    listener = wakeup.WakeupListener("verification")
+    # A bulk batch is held while the vendor jobs run, so its lease must outlast the polling timeout
+    lease_seconds = VERIFICATION_BULK_TIMEOUT + VERIFICATION_LEASE_SECONDS if mode == 'bulk' else VERIFICATION_LEASE_SECONDS
 
     while True:
+        retry_in = verification_retry_in()
+        if retry_in > 0:
+            # Both vendors are down; claiming now would only defer the batch again
+            log.info("Both verification circuits open, pausing before the next batch",
+                     extra={"retry_in_s": round(retry_in)})
+            time.sleep(retry_in)
+
         try:
-            # Query for owners in either pending verification state
-            response = supabase.table("owners") \
-                .select("person_key, processing_status, original_email, enriched_emails") \
-                .in_("processing_status", ['pending_verification', 'pending_post_enrichment_verification']) \
-                .limit(BATCH_SIZE) \
-                .execute()
-            owners_to_process = response.data
+            # Claim owners in either pending verification state so other processes skip them
+            owners_to_process = work_queue.claim_owners(
+                ['pending_verification', 'pending_post_enrichment_verification'], BATCH_SIZE, lease_seconds)
         except Exception as e:
-            print(f"Error fetching owners from database: {e}")
+            log.error("Error fetching owners from database", extra={"error": str(e)})
             time.sleep(60)
             continue
 
         if not owners_to_process:
-            print("No owners found for verification. Worker sleeping for 5 minutes...")
-            time.sleep(300)
+            if exit_when_idle:
+                log.info("No owners left to verify. Exiting.")
+                return
+            wakeup.idle_wait(idle_backoff, listener, "verification")
             continue
 
-        print(f"\nFound {len(owners_to_process)} owners to verify in this batch.")
-
-        for owner in owners_to_process:
-            person_key = owner['person_key']
-            print(f"Processing owner with PersonKey: {person_key}")
-
-            # Determine which emails to verify based on the current status
-            emails_to_verify = []
-            if owner['processing_status'] == 'pending_verification' and owner.get('original_email'):
-                emails_to_verify = [owner['original_email']]
-            elif owner['processing_status'] == 'pending_post_enrichment_verification' and owner.get('enriched_emails'):
-                emails_to_verify = owner['enriched_emails']
-
-            if not emails_to_verify:
-                print("    -! No emails found to verify. Marking as failed.")
-                supabase.table("owners").update({"processing_status": "failed_verification"}).eq("person_key", person_key).execute()
-                continue
-
-            final_status = 'failed_verification'
-            is_verified = False
-            # These logs will store the full history of all attempts for this owner
-            verification_logs = {"millionverifier": {}, "neverbounce": {}}
-
-            # Iterate through the ranked list of emails
-            for email in emails_to_verify:
-                print(f"  -> Verifying email: {email}")
-
-                # Call both verification services
-                mv_response = verifier_client.verify_millionverifier(email)
-                nb_response = verifier_client.verify_neverbounce(email)
-
-                # Log the full raw responses, keyed by the email address
-                verification_logs["millionverifier"][email] = mv_response
-                verification_logs["neverbounce"][email] = nb_response
-
-                # Check if the email is considered valid
-                mv_is_good = mv_response.get("success") and mv_response["data"].get("result") in MV_GOOD_STATUSES
-                nb_is_good = nb_response.get("success") and nb_response["data"].get("result") in NB_GOOD_STATUSES
-                
-                # Check for strictly invalid results
-                mv_is_bad = mv_response.get("success") and mv_response["data"].get("result") in MV_BAD_STATUSES
-                nb_is_bad = nb_response.get("success") and nb_response["data"].get("result") in NB_BAD_STATUSES
-
-                # --- Verification Logic ---
-                if mv_is_good or nb_is_good:
-                    print(f"    -> SUCCESS: Email '{email}' passed verification.")
-                    final_status = 'complete'
-                    is_verified = True
-                    break # Exit the loop, we found a good email
-                
-                elif mv_is_bad or nb_is_bad:
-                    print(f"    -> FAILED: Email '{email}' is invalid. Trying next email if available.")
-                    # Continue to the next email in the list
-                else:
-                    print(f"    -> UNCERTAIN: Email '{email}' gave an uncertain result. Trying next email if available.")
-
-            # After checking all emails for an owner, update their record
-            update_data = {
-                "processing_status": final_status,
-                "millionverifier_response": json.dumps(verification_logs["millionverifier"]),
-                "neverbounce_response": json.dumps(verification_logs["neverbounce"]),
-                # For easy filtering, we can also store the final status of the primary email
-                "millionverifier_status": verification_logs["millionverifier"].get(emails_to_verify[0], {}).get("data", {}).get("result"),
-                "neverbounce_status": verification_logs["neverbounce"].get(emails_to_verify[0], {}).get("data", {}).get("result")
-            }
-            
-            try:
-                supabase.table("owners").update(update_data).eq("person_key", person_key).execute()
-                print(f"  -> Database updated for {person_key} with final status: {final_status}")
-            except Exception as e:
-                print(f"    -! CRITICAL: Failed to update status for {person_key}. Error: {e}")
-            
-            time.sleep(1) # Brief pause between owners
+        idle_backoff.reset()
 
-        print("\nBatch finished. Fetching next batch...")
+        log.info("Claimed a batch of owners to verify", extra={"owners": len(owners_to_process)})
 
+        if mode == 'bulk':
+            deferred = verify_owners_bulk(owners_to_process)
+        else:
+            deferred = []
+            for owner in owners_to_process:
+                person_key = owner['person_key']
+                log.info("Processing owner", extra={"person_key": person_key})
 
-if __name__ == "__main__":
-    run_verification_worker()
+                emails_to_verify = get_emails_to_verify(owner)
+                if not emails_to_verify:
+                    log.warning("No emails found to verify. Marking as failed.", extra={"person_key": person_key})
+                    write_verification_update(owner, {"processing_status": "failed_verification"})
+                    continue
+
+                # Call both verification services (or reuse cached verdicts)
+                update_data, checks = verify_owner(emails_to_verify)
+                if update_data is None:
+                    deferred.append(person_key)
+                    continue
+                write_verification_update(owner, update_data, checks)
+
+        # Owners a vendor outage or an uncollected bulk job kept from being verified go back to the queue,
+        # not to failed_verification
+        if deferred:
+            defer_verification(deferred)
+
+        result_buffer.flush()
 
-    
\ No newline at end of file
+        if verdict_cache is not None:
+            cache_stats = verdict_cache.stats()
+            log.info("Verification cache", extra={"hits": cache_stats["hits"], "misses": cache_stats["misses"],
+                                                  "entries": cache_stats["size"]})
+
+        log.info("Batch finished. Fetching next batch...")
+
+
+if __name__ == "__main__":
+    run_verification_worker()
\ No newline at end of file